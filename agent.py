@@ -7,14 +7,33 @@ Author: Kumar Kshitij
 Purpose: AI for India's informal economy - thinks in rupees, not just data points
 """
 
-import json
+import copy
 import datetime
-from typing import Dict, List, Optional, Tuple
-import os
-import csv
-from dataclasses import dataclass
+import math
+from typing import Dict, Iterable, List, Optional, Tuple, Union
+import threading
+import time
+from dataclasses import dataclass, fields
 from enum import Enum
 
+import numpy as np
+
+from memory_store import BackgroundWriter, MemoryStore, SynchronizedStore, open_store
+from prediction_cache import PredictionCache
+from pattern_index import WEEKEND_DAYS, PatternIndex, bucket_key, temperature_band, temperature_band_codes
+from online_stats import stats_from_history, summarize_performance, update_sales_stats
+from metrics import AgentMetrics
+from prediction_journal import PredictionJournal
+from prompt_store import PromptStore
+from item_taxonomy import ItemTaxonomy
+from calendar_table import CalendarTable
+from vendor_index import VendorIndex
+from calibration import (DEFAULT_LOG_SIGMA, calibration_stats, copy_calibration_stats, day_factor, day_factor_array,
+                         fit_priors, fit_targets, normal_equations, prior_vector)
+from simulation import quantiles, scenario_draws
+from inventory_optimizer import plan_inventory, salvage_values
+from retention import RetentionPolicy, plan_compaction
+
 class WeatherCondition(Enum):
     SUNNY = "sunny"
     RAINY = "rainy"
@@ -28,6 +47,13 @@ class LocationType(Enum):
     TRANSPORT_HUB = "transport_hub"
     COLLEGE = "college"
 
+def make_vendor_id(name: str, location: str) -> str:
+    """Memory key of a vendor"""
+    return f"{name}_{location}".replace(" ", "_")
+
+def _is_number(value) -> bool:
+    return isinstance(value, (int, float)) and not isinstance(value, bool)
+
 @dataclass
 class VendorProfile:
     name: str
@@ -36,6 +62,25 @@ class VendorProfile:
     items_sold: List[str]
     avg_daily_revenue: float
     peak_hours: List[int]
+    # Roster details (data/sample_vendors.csv); unknown for vendors created ad hoc
+    operating_days: Optional[List[str]] = None
+    investment_capacity: Optional[float] = None
+    years_experience: Optional[int] = None
+    customer_base_size: Optional[int] = None
+    seasonal_variation: Optional[str] = None
+    competition_level: Optional[str] = None
+
+    @classmethod
+    def from_dict(cls, profile: Dict) -> "VendorProfile":
+        """Rebuild a profile stored in memory"""
+        known = {f.name for f in fields(cls)}
+        values = {key: value for key, value in profile.items() if key in known}
+        values["location_type"] = LocationType(profile["location_type"])
+        return cls(**values)
+
+    @property
+    def vendor_id(self) -> str:
+        return make_vendor_id(self.name, self.location)
 
 @dataclass
 class DayContext:
@@ -53,46 +98,215 @@ class PredictionOutput:
     peak_hours: List[int]
     special_notes: List[str]
     confidence_level: float
+    # Set when the agent runs simulations: {"p10", "p50", "p90"} of revenue and of each item's demand
+    revenue_quantiles: Optional[Dict[str, int]] = None
+    item_quantiles: Optional[Dict[str, Dict[str, int]]] = None
+    # Set when the agent optimizes inventory: expected ₹ margin of recommended_items
+    expected_margin: Optional[int] = None
+
+@dataclass
+class HorizonForecast:
+    vendor_id: str
+    days: List[DayContext]
+    daily: List[PredictionOutput]
+    # Whole-horizon procurement plan
+    total_items: Dict[str, int]
+    expected_revenue: Tuple[int, int]
+    confidence_level: float
+
+# Demand multipliers per location type
+LOCATION_MULTIPLIERS = {
+    LocationType.OFFICE_AREA: {
+        "lunch_demand": 1.5,
+        "evening_snacks": 1.2,
+        "price_tolerance": 1.3,
+        "payday_boost": 1.8
+    },
+    LocationType.RESIDENTIAL: {
+        "lunch_demand": 0.8,
+        "evening_snacks": 1.4,
+        "price_tolerance": 0.9,
+        "weekend_boost": 1.6
+    },
+    LocationType.COLLEGE: {
+        "lunch_demand": 1.8,
+        "evening_snacks": 1.6,
+        "price_tolerance": 0.7,
+        "exam_period_drop": 0.4
+    },
+    LocationType.TRANSPORT_HUB: {
+        "morning_rush": 1.9,
+        "evening_rush": 1.7,
+        "price_tolerance": 1.1,
+        "weather_sensitivity": 1.4
+    },
+    LocationType.MARKET: {
+        "all_day_steady": 1.2,
+        "festival_boost": 2.5,
+        "price_tolerance": 0.8,
+        "competition_factor": 0.9
+    }
+}
+
+# Base weather impact on footfall; HOT is resolved against temperature separately
+WEATHER_BASE_IMPACT = {
+    WeatherCondition.SUNNY: 1.0,
+    WeatherCondition.CLOUDY: 0.9,
+    WeatherCondition.RAINY: 0.3,
+    WeatherCondition.HOT: 0.8
+}
+HOT_WEATHER_IMPACT_ABOVE_35 = 0.7
+# Footfall factor per temperature band (pattern_index.temperature_band); other bands are 1.0
+TEMPERATURE_FACTORS = {"extreme": 0.5, "hot": 0.7, "cold": 0.6}
+
+# Day-level boosts
+FESTIVAL_DEMAND_BOOST = 1.5
+FESTIVAL_REVENUE_BOOST = 1.8
+PAYDAY_REVENUE_BOOST = 1.3
+
+# Stable integer codes for vectorized weather lookups
+WEATHER_CODES = {condition: code for code, condition in enumerate(WeatherCondition)}
+
+# Horizon forecasts: days without a forecast entry
+DEFAULT_FORECAST = {"weather": WeatherCondition.SUNNY, "temperature": 32}
+
+# Cold start: vendors with little history borrow demand from similar, well-observed vendors
+COLD_START_DAYS = 7
+WELL_OBSERVED_DAYS = 14
+COLD_START_NEIGHBOURS = 5
+NEIGHBOUR_CONFIDENCE = 0.5  # historical_data confidence when every neighbour is a perfect match
+
+# Skip reasons ingest_sales() reports back
+MAX_INGEST_ERRORS = 5
+
+# Calibration: the tables above in log space, the prior that fitted multipliers are shrunk toward
+CALIBRATION_TABLE_PRIORS = {
+    "revenue": prior_vector({condition.value: impact for condition, impact in WEATHER_BASE_IMPACT.items()},
+                            TEMPERATURE_FACTORS, FESTIVAL_REVENUE_BOOST, PAYDAY_REVENUE_BOOST),
+    "items": prior_vector({condition.value: impact for condition, impact in WEATHER_BASE_IMPACT.items()},
+                          TEMPERATURE_FACTORS, FESTIVAL_DEMAND_BOOST, 1.0)
+}
 
 class SVDPAgent:
-    def __init__(self, memory_file: str = "memory.json", prompts_file: str = "prompts/prompt_templates.txt"):
+    def __init__(self, memory_file: str = "memory.json", prompts_file: str = "prompts/prompt_templates.txt",
+                 store: Optional[MemoryStore] = None, cache_size: int = 1024, cache_ttl: float = 300.0,
+                 background_writer: bool = False, flush_interval: float = 1.0, flush_batch: int = 500,
+                 read_only: bool = False, metrics_sample_rate: float = 1.0, journal_dir: Optional[str] = None,
+                 taxonomy_file: Optional[str] = None, calendar_file: Optional[str] = None, simulations: int = 0,
+                 optimize_inventory: bool = False, retention: Optional[RetentionPolicy] = None):
         self.memory_file = memory_file
         self.prompts_file = prompts_file
+        # JSON snapshot + journal by default; memory files ending in .db use SQLite
+        self.store = SynchronizedStore(store if store is not None else open_store(memory_file))
         self.memory = self._load_memory()
-        self.prompt_templates = self._load_prompts()
+        # Per-vendor locks: requests for different vendors never wait on each other
+        self._vendor_locks: Dict[str, threading.RLock] = {}
+        self._vendor_locks_guard = threading.Lock()
+        self._online_stats: Dict[str, Dict] = {}
+        # Read-only agents (e.g. batch workers) never write memory back
+        self.read_only = read_only
+        # With a background writer, saves only mark memory dirty and the
+        # writer thread coalesces them into periodic flushes
+        self.writer = None
+        if background_writer and not read_only:
+            self.writer = BackgroundWriter(self.store, flush_interval, flush_batch)
+            self.writer.start()
+        # Parsed once into (section, key) blocks; edits to the file are picked up by mtime
+        self.prompts = PromptStore(prompts_file, defaults=self._get_default_prompts())
+        # Category / meal slot / demand factors per menu item, classified once per distinct name
+        self.taxonomy = ItemTaxonomy.from_file(taxonomy_file) if taxonomy_file else ItemTaxonomy()
+        # Weekday, festival and payday flags per date, precomputed for the supported years
+        self.calendar = CalendarTable.from_file(calendar_file) if calendar_file else CalendarTable()
+        # Identical requests for an unchanged vendor skip Layers 2-4; cache_size=0 disables
+        self.prediction_cache = PredictionCache(cache_size, cache_ttl)
+        self.pattern_index = PatternIndex(self.store)
+        # Built on the first cold-start vendor, then kept current as vendors and sales arrive
+        self._vendor_index: Optional[VendorIndex] = None
+        self._vendor_index_guard = threading.Lock()
+        self._demand_ratios: Dict[str, Dict] = {}
+        # Layer timings for a sample of predictions; counters are always kept
+        self.metrics = AgentMetrics(metrics_sample_rate)
+        # Every prediction is appended to a day-rotated journal under journal_dir when set
+        self.journal = PredictionJournal(journal_dir) if journal_dir else None
+        # Monte Carlo scenarios per vendor-day for quantile ranges; 0 disables
+        self.simulations = simulations
+        # Newsvendor quantities within the vendor's investment_capacity instead of per-item point forecasts
+        self.optimize_inventory = optimize_inventory
+        # Vendors whose raw history outgrows the policy's window are compacted as their sales are ingested
+        self.retention = retention
 
     def _load_memory(self) -> Dict:
-        if os.path.exists(self.memory_file):
-            with open(self.memory_file, 'r', encoding='utf-8') as f:
-                return json.load(f)
-        return {"vendors": {}, "patterns": {}, "last_updated": ""}
+        return self.store.load()
 
     def _save_memory(self):
-        def convert(obj):
-            if isinstance(obj, Enum):
-                return obj.value
-            if isinstance(obj, dict):
-                return {k: convert(v) for k, v in obj.items()}
-            if isinstance(obj, list):
-                return [convert(i) for i in obj]
-            return obj
-
-        self.memory["last_updated"] = datetime.datetime.now().isoformat()
-        serializable_memory = convert(self.memory)
-        with open(self.memory_file, 'w', encoding='utf-8') as f:
-            json.dump(serializable_memory, f, indent=2, ensure_ascii=False)
+        # Only the changes since the last save are written - see memory_store
+        if self.read_only:
+            return
+        self.metrics.inc("memory_saves")
+        if self.writer is not None:
+            self.writer.mark_dirty()
+        else:
+            self.metrics.inc("memory_bytes_written", self.store.flush() or 0)
+
+    def save(self):
+        """Write memory changes since the last save, e.g. after bulk writes straight to the store"""
+        self._save_memory()
+
+    def profiles_changed(self):
+        """Forget what was derived from stored profiles after they were written straight to the store"""
+        with self._vendor_index_guard:
+            # Rebuilt from every stored profile on the next cold-start lookup
+            self._vendor_index = None
+        self._demand_ratios.clear()
+
+    def close(self):
+        """Shutdown hook: flush everything pending and release the memory store"""
+        if self.writer is not None:
+            self.writer.stop()
+            self.writer = None
+        if self.journal is not None:
+            self.journal.close()
+        if not self.read_only:
+            self.store.close()
+
+    def _vendor_lock(self, vendor_id: str) -> threading.RLock:
+        lock = self._vendor_locks.get(vendor_id)
+        if lock is None:
+            with self._vendor_locks_guard:
+                lock = self._vendor_locks.setdefault(vendor_id, threading.RLock())
+        return lock
+
+    def list_vendors(self) -> Dict[str, Dict]:
+        """Vendor id -> stored profile, for vendor menus"""
+        return self.store.list_profiles()
+
+    def get_vendor_profile(self, vendor_id: str) -> VendorProfile:
+        """Stored profile of a known vendor"""
+        return VendorProfile.from_dict(self.store.get_vendor(vendor_id)["profile"])
+
+    @property
+    def prompt_templates(self) -> Dict[str, str]:
+        return self._load_prompts()
 
     def _load_prompts(self) -> Dict[str, str]:
-        try:
-            with open(self.prompts_file, 'r', encoding='utf-8') as f:
-                content = f.read()
-                return {
-                    "demand_analysis": content,
-                    "inventory_optimization": "Optimize inventory based on Indian street vendor context",
-                    "revenue_prediction": "Predict revenue in rupees and paise"
-                }
-        except FileNotFoundError:
+        if not self.prompts.exists:
             return self._get_default_prompts()
+        return {
+            "demand_analysis": self.prompts.text,
+            "inventory_optimization": "Optimize inventory based on Indian street vendor context",
+            "revenue_prediction": "Predict revenue in rupees and paise"
+        }
+
+    def prompts_for(self, vendor_profile: VendorProfile, day_context: DayContext) -> Dict[str, str]:
+        """Prompt blocks relevant to one vendor-day (weather, location, economy, season)"""
+        return self.prompts.for_context(
+            vendor_profile.location_type.value,
+            day_context.weather.value,
+            day_context.temperature,
+            day_context.date,
+            day_context.is_festival,
+            day_context.is_payday
+        )
 
     def _get_default_prompts(self) -> Dict[str, str]:
         return {
@@ -127,13 +341,14 @@ class SVDPAgent:
         Layer 1: Process and normalize input data
         Converts real-world vendor context into structured data
         """
+        vendor_id = vendor_profile.vendor_id
         processed_input = {
-            "vendor_id": f"{vendor_profile.name}_{vendor_profile.location}".replace(" ", "_"),
+            "vendor_id": vendor_id,
             "location_factors": self._analyze_location_factors(vendor_profile.location_type),
             "weather_impact": self._calculate_weather_impact(day_context.weather, day_context.temperature),
             "time_factors": self._get_time_factors(day_context),
             "item_categories": self._categorize_items(vendor_profile.items_sold),
-            "historical_context": self._get_historical_patterns(vendor_profile.name)
+            "historical_context": self._get_historical_patterns(vendor_id, day_context)
         }
         
         self._log_input_processing(processed_input)
@@ -141,62 +356,29 @@ class SVDPAgent:
     
     def _analyze_location_factors(self, location_type: LocationType) -> Dict:
         """Analyze location-specific demand factors"""
-        location_multipliers = {
-            LocationType.OFFICE_AREA: {
-                "lunch_demand": 1.5,
-                "evening_snacks": 1.2,
-                "price_tolerance": 1.3,
-                "payday_boost": 1.8
-            },
-            LocationType.RESIDENTIAL: {
-                "lunch_demand": 0.8,
-                "evening_snacks": 1.4,
-                "price_tolerance": 0.9,
-                "weekend_boost": 1.6
-            },
-            LocationType.COLLEGE: {
-                "lunch_demand": 1.8,
-                "evening_snacks": 1.6,
-                "price_tolerance": 0.7,
-                "exam_period_drop": 0.4
-            },
-            LocationType.TRANSPORT_HUB: {
-                "morning_rush": 1.9,
-                "evening_rush": 1.7,
-                "price_tolerance": 1.1,
-                "weather_sensitivity": 1.4
-            },
-            LocationType.MARKET: {
-                "all_day_steady": 1.2,
-                "festival_boost": 2.5,
-                "price_tolerance": 0.8,
-                "competition_factor": 0.9
-            }
-        }
-        return location_multipliers.get(location_type, {"default": 1.0})
+        return dict(LOCATION_MULTIPLIERS.get(location_type, {"default": 1.0}))
     
     def _calculate_weather_impact(self, weather: WeatherCondition, temperature: int) -> Dict:
         """Calculate weather impact on sales"""
-        base_impact = {
-            WeatherCondition.SUNNY: 1.0,
-            WeatherCondition.CLOUDY: 0.9,
-            WeatherCondition.RAINY: 0.3,
-            WeatherCondition.HOT: 0.7 if temperature > 35 else 0.8
-        }
+        weather_multiplier = WEATHER_BASE_IMPACT.get(weather, 1.0)
+        if weather == WeatherCondition.HOT and temperature > 35:
+            weather_multiplier = HOT_WEATHER_IMPACT_ABOVE_35
         
         # Temperature adjustments
         temp_factor = 1.0
         if temperature > 40:
-            temp_factor = 0.5  # Extreme heat
+            temp_factor = TEMPERATURE_FACTORS["extreme"]
         elif temperature > 35:
-            temp_factor = 0.7  # Very hot
+            temp_factor = TEMPERATURE_FACTORS["hot"]  # Very hot
         elif temperature < 10:
-            temp_factor = 0.6  # Too cold for street food
+            temp_factor = TEMPERATURE_FACTORS["cold"]  # Too cold for street food
             
         return {
-            "weather_multiplier": base_impact.get(weather, 1.0),
+            "weather": weather.value,
+            "temperature": temperature,
+            "weather_multiplier": weather_multiplier,
             "temperature_factor": temp_factor,
-            "combined_impact": base_impact.get(weather, 1.0) * temp_factor
+            "combined_impact": weather_multiplier * temp_factor
         }
     
     # LAYER 2: STATE MANAGEMENT  
@@ -208,32 +390,47 @@ class SVDPAgent:
         vendor_id = processed_input["vendor_id"]
         
         # Initialize vendor memory if new
-        if vendor_id not in self.memory["vendors"]:
-            self.memory["vendors"][vendor_id] = {
+        vendor_memory = self.store.get_vendor(vendor_id)
+        if vendor_memory is None:
+            vendor_memory = self.store.put_vendor(vendor_id, {
                 "profile": vendor_profile.__dict__,
                 "sales_history": [],
                 "learned_patterns": {},
                 "performance_metrics": {}
-            }
+            })
         
+            if self._vendor_index is not None:
+                self._vendor_index.add(vendor_id, vendor_memory["profile"])
+        borrowed_demand = self._borrowed_demand(vendor_id, vendor_memory)
+        # Cold-start vendors borrow from neighbours; the rest use multipliers fitted to their own sales when present
+        calibration = None
+        if borrowed_demand is None:
+            calibration = vendor_memory.get("learned_patterns", {}).get("calibration")
+
         # Update state with current context
         current_state = {
-            "vendor_memory": self.memory["vendors"][vendor_id],
+            "vendor_memory": vendor_memory,
             "processed_input": processed_input,
-            "confidence_factors": self._calculate_confidence_factors(vendor_id, processed_input),
-            "pattern_matches": self._find_pattern_matches(vendor_id, processed_input)
+            "confidence_factors": self._calculate_confidence_factors(vendor_id, processed_input, borrowed_demand),
+            "pattern_matches": self._find_pattern_matches(vendor_id, processed_input),
+            "borrowed_demand": borrowed_demand,
+            "calibration": calibration
         }
         
         self._log_state_update(current_state)
         return current_state
     
-    def _calculate_confidence_factors(self, vendor_id: str, processed_input: Dict) -> Dict:
+    def _calculate_confidence_factors(self, vendor_id: str, processed_input: Dict,
+                                      borrowed_demand: Optional[Dict] = None) -> Dict:
         """Calculate prediction confidence based on available data"""
-        vendor_data = self.memory["vendors"].get(vendor_id, {})
-        history_length = len(vendor_data.get("sales_history", []))
+        history_length = self._observed_days(vendor_id)
+        historical_data = min(history_length / 30, 1.0)  # 30 days for full confidence
+        if borrowed_demand is not None:
+            # Neighbours' history counts for part of the confidence, by how alike they are
+            historical_data = max(historical_data, NEIGHBOUR_CONFIDENCE * borrowed_demand["similarity"])
         
         confidence_factors = {
-            "historical_data": min(history_length / 30, 1.0),  # 30 days for full confidence
+            "historical_data": historical_data,
             "weather_data": 0.8,  # Assume good weather data
             "location_knowledge": 0.9,  # Good location understanding
             "seasonal_patterns": 0.6 if history_length < 90 else 0.9
@@ -252,66 +449,109 @@ class SVDPAgent:
         processed_input = current_state["processed_input"]
         
         # Core prediction logic
-        demand_prediction = self._predict_item_demand(vendor_memory, processed_input, day_context)
-        revenue_prediction = self._predict_revenue(vendor_memory, processed_input, day_context)
+        borrowed_demand = current_state.get("borrowed_demand")
+        calibration = current_state.get("calibration")
+        item_levels = self._item_demand_levels(vendor_memory, processed_input, day_context, borrowed_demand,
+                                               calibration)
+        demand_prediction = self._predict_item_demand(item_levels)
+        revenue_prediction = self._predict_revenue(vendor_memory, processed_input, day_context, borrowed_demand,
+                                                   calibration)
         timing_prediction = self._predict_optimal_timing(vendor_memory, processed_input, day_context)
         
         # Combine predictions
         task_result = {
+            "item_levels": item_levels,
             "item_demand": demand_prediction,
             "revenue_forecast": revenue_prediction,
             "timing_optimization": timing_prediction,
             "risk_factors": self._identify_risk_factors(processed_input, day_context),
             "opportunities": self._identify_opportunities(processed_input, day_context)
         }
+        if self.simulations:
+            items = vendor_memory.get("profile", {}).get("items_sold", [])
+            item_factors = (calibration or {}).get("items", {})
+            task_result["quantiles"] = self._simulate_day(
+                processed_input["vendor_id"], day_context, items,
+                [self._item_base_demand(item, processed_input["location_factors"], borrowed_demand) for item in items],
+                [item_factors.get(item) for item in items],
+                self._revenue_base(vendor_memory, processed_input, borrowed_demand, calibration),
+                (calibration or {}).get("revenue")
+            )
         
         self._log_task_execution(task_result)
         return task_result
     
-    def _predict_item_demand(self, vendor_memory: Dict, processed_input: Dict, day_context: DayContext) -> Dict:
-        """Predict demand for specific items"""
+    def _item_demand_levels(self, vendor_memory: Dict, processed_input: Dict, day_context: DayContext,
+                            borrowed_demand: Optional[Dict] = None, calibration: Optional[Dict] = None) -> Dict:
+        """Predict demand for specific items, as unrounded levels"""
         # Simplified demand prediction logic
         base_items = vendor_memory.get("profile", {}).get("items_sold", [])
         location_factors = processed_input["location_factors"]
         weather_impact = processed_input["weather_impact"]["combined_impact"]
+        item_factors = (calibration or {}).get("items", {})
         
         item_predictions = {}
         for item in base_items:
-            # Base demand calculation
-            base_demand = 50  # Base quantity
-            
-            # Apply location multipliers
-            if "lunch_demand" in location_factors and "rice" in item.lower():
-                base_demand *= location_factors["lunch_demand"]
-            if "evening_snacks" in location_factors and any(snack in item.lower() for snack in ["samosa", "pakora", "chai"]):
-                base_demand *= location_factors["evening_snacks"]
-                
-            # Apply weather impact
-            base_demand *= weather_impact
-            
-            # Festival boost
-            if day_context.is_festival:
-                base_demand *= 1.5
-                
-            item_predictions[item] = max(int(base_demand), 10)  # Minimum 10 items
+            base_demand = self._item_base_demand(item, location_factors, borrowed_demand)
+            factors = item_factors.get(item)
+            if factors is not None:
+                # Fitted multipliers replace the weather, temperature and festival tables
+                base_demand *= day_factor(factors, *self._calibration_day(day_context))
+            else:
+                # Apply weather impact
+                base_demand *= weather_impact
+
+                # Festival boost
+                if day_context.is_festival:
+                    base_demand *= FESTIVAL_DEMAND_BOOST
+
+            item_predictions[item] = base_demand
             
         return item_predictions
+
+    def _predict_item_demand(self, item_levels: Dict[str, float]) -> Dict[str, int]:
+        """Units to stock per item"""
+        return {item: max(int(level), 10) for item, level in item_levels.items()}  # Minimum 10 items
     
-    def _predict_revenue(self, vendor_memory: Dict, processed_input: Dict, day_context: DayContext) -> Tuple[int, int]:
-        """Predict revenue range in rupees"""
+    def _item_base_demand(self, item: str, location_factors: Dict, borrowed_demand: Optional[Dict] = None) -> float:
+        """Day-independent demand for an item: base quantity with location multipliers"""
+        base_demand = 50  # Base quantity
+        for factor in self.taxonomy.classify(item).demand_factors:
+            if factor in location_factors:
+                base_demand *= location_factors[factor]
+        if borrowed_demand is not None:
+            base_demand *= borrowed_demand["items"].get(item, 1.0)
+        return base_demand
+    
+    def _revenue_base(self, vendor_memory: Dict, processed_input: Dict, borrowed_demand: Optional[Dict] = None,
+                      calibration: Optional[Dict] = None) -> float:
+        """Day-independent revenue level: average revenue scaled by location impact"""
         profile = vendor_memory.get("profile", {})
         base_revenue = profile.get("avg_daily_revenue", 800)
-        
-        # Apply various factors
+        if calibration is not None and calibration.get("revenue") is not None:
+            # The fitted level is relative to the stated average, replacing the location impact
+            return base_revenue
         location_impact = sum(processed_input["location_factors"].values()) / len(processed_input["location_factors"])
+        if borrowed_demand is not None and borrowed_demand["revenue"] is not None:
+            return base_revenue * location_impact * borrowed_demand["revenue"]
+        return base_revenue * location_impact
+    
+    def _predict_revenue(self, vendor_memory: Dict, processed_input: Dict, day_context: DayContext,
+                         borrowed_demand: Optional[Dict] = None, calibration: Optional[Dict] = None) -> Tuple[int, int]:
+        """Predict revenue range in rupees"""
+        # Apply various factors
         weather_impact = processed_input["weather_impact"]["combined_impact"]
+        revenue_factors = (calibration or {}).get("revenue")
         
-        adjusted_revenue = base_revenue * location_impact * weather_impact
-        
-        if day_context.is_festival:
-            adjusted_revenue *= 1.8
-        if day_context.is_payday:
-            adjusted_revenue *= 1.3
+        adjusted_revenue = self._revenue_base(vendor_memory, processed_input, borrowed_demand, calibration)
+        if revenue_factors is not None:
+            adjusted_revenue *= day_factor(revenue_factors, *self._calibration_day(day_context))
+        else:
+            adjusted_revenue *= weather_impact
+            if day_context.is_festival:
+                adjusted_revenue *= FESTIVAL_REVENUE_BOOST
+            if day_context.is_payday:
+                adjusted_revenue *= PAYDAY_REVENUE_BOOST
             
         # Return range (min 80%, max 120% of prediction)
         min_revenue = int(adjusted_revenue * 0.8)
@@ -336,6 +576,8 @@ class SVDPAgent:
             special_notes.append("Carry plastic covers for rain protection")
         if overall_confidence < 0.6:
             special_notes.append("Prediction confidence low - start with smaller inventory")
+        if task_result.get("budget_limited"):
+            special_notes.append(self._budget_note(task_result["investment_capacity"]))
             
         # Create structured output
         output = PredictionOutput(
@@ -345,6 +587,10 @@ class SVDPAgent:
             special_notes=special_notes,
             confidence_level=overall_confidence
         )
+        if "quantiles" in task_result:
+            output.revenue_quantiles, output.item_quantiles = task_result["quantiles"]
+        if "expected_margin" in task_result:
+            output.expected_margin = task_result["expected_margin"]
         
         self._log_output_generation(output)
         return output
@@ -361,26 +607,105 @@ class SVDPAgent:
     
     def _categorize_items(self, items: List[str]) -> Dict:
         """Categorize food items"""
-        categories = {"main": [], "snacks": [], "beverages": []}
-        for item in items:
-            if any(main in item.lower() for main in ["rice", "roti", "dal", "curry"]):
-                categories["main"].append(item)
-            elif any(snack in item.lower() for snack in ["samosa", "pakora", "vada", "bhel"]):
-                categories["snacks"].append(item)
-            elif any(bev in item.lower() for bev in ["chai", "coffee", "lassi", "juice"]):
-                categories["beverages"].append(item)
-            else:
-                categories["snacks"].append(item)  # Default to snacks
-        return categories
+        return self.taxonomy.categorize(items)
     
-    def _get_historical_patterns(self, vendor_name: str) -> Dict:
-        """Get historical patterns for vendor"""
-        # Simplified - in real implementation, this would analyze past data
-        return {"patterns_found": 0, "confidence": 0.5}
+    def _get_historical_patterns(self, vendor_id: str, day_context: DayContext) -> Dict:
+        """Locate today's pattern bucket in the vendor's history"""
+        key = bucket_key(day_context.weather.value, day_context.day_of_week,
+                         day_context.is_festival, day_context.is_payday, day_context.temperature)
+        patterns = self.pattern_index.vendor(vendor_id)
+        bucket = patterns.buckets.get(key)
+        return {
+            "patterns_found": len(patterns.buckets) + len(patterns.rolled_up),
+            "days_observed": patterns.total_days,
+            "bucket": list(key),
+            "bucket_days": bucket["days"] if bucket else 0,
+            "confidence": min(bucket["days"] / 5, 1.0) if bucket else 0.5 * min(patterns.total_days / 30, 1.0)
+        }
     
     def _find_pattern_matches(self, vendor_id: str, processed_input: Dict) -> List:
-        """Find matching patterns from historical data"""
-        return []  # Simplified for prototype
+        """Find past days like today: exact bucket, else the nearest buckets"""
+        return self.pattern_index.match(vendor_id, tuple(processed_input["historical_context"]["bucket"]))
+
+    def _calibration_day(self, day_context: DayContext) -> Tuple[str, str, bool, bool, bool]:
+        """Weather, temperature band and festival/payday/weekend flags that calibrated multipliers key on"""
+        return (day_context.weather.value, temperature_band(day_context.temperature), bool(day_context.is_festival),
+                bool(day_context.is_payday), day_context.day_of_week in WEEKEND_DAYS)
+
+    # COLD START
+    @property
+    def vendor_index(self) -> VendorIndex:
+        """Similarity index over every stored vendor profile, built on first use"""
+        if self._vendor_index is None:
+            with self._vendor_index_guard:
+                if self._vendor_index is None:
+                    index = VendorIndex(self.taxonomy)
+                    for vendor_id, profile in self.store.list_profiles().items():
+                        index.add(vendor_id, profile, self._observed_days(vendor_id))
+                    self._vendor_index = index
+        return self._vendor_index
+
+    def _borrowed_demand(self, vendor_id: str, vendor_memory: Dict) -> Optional[Dict]:
+        """
+        Demand multipliers for a cold-start vendor, borrowed from its nearest well-observed neighbours
+        Each neighbour contributes how its observed sales compare with what the
+        model alone predicts for it (per item, else per item category, else
+        overall, and for revenue), weighted by similarity. None when the
+        vendor has enough history of its own or no neighbour qualifies.
+        """
+        if self._observed_days(vendor_id) >= COLD_START_DAYS:
+            return None
+        profile = vendor_memory.get("profile", {})
+        neighbours = self.vendor_index.neighbours(profile, COLD_START_NEIGHBOURS, WELL_OBSERVED_DAYS, exclude=vendor_id)
+        ratios = [(self._neighbour_ratios(neighbour_id), similarity) for neighbour_id, similarity in neighbours]
+        ratios = [(ratio, similarity) for ratio, similarity in ratios if ratio is not None and similarity > 0]
+        if not ratios:
+            return None
+
+        def blend(values: List[Tuple[Optional[float], float]]) -> Optional[float]:
+            values = [(value, weight) for value, weight in values if value is not None]
+            total = sum(weight for _, weight in values)
+            return sum(value * weight for value, weight in values) / total if total else None
+
+        items = {}
+        for item in profile.get("items_sold", []):
+            category = self.taxonomy.classify(item).category
+            multiplier = blend([(ratio["items"].get(item, ratio["categories"].get(category, ratio["overall"])),
+                                 similarity) for ratio, similarity in ratios])
+            if multiplier is not None:
+                items[item] = multiplier
+        return {
+            "neighbours": [neighbour_id for neighbour_id, _ in neighbours],
+            "similarity": sum(similarity for _, similarity in ratios) / len(ratios),
+            "items": items,
+            "revenue": blend([(ratio["revenue"], similarity) for ratio, similarity in ratios])
+        }
+
+    def _neighbour_ratios(self, vendor_id: str) -> Optional[Dict]:
+        """Observed / modelled demand of a well-observed vendor, cached until its next ingested sale"""
+        ratios = self._demand_ratios.get(vendor_id)
+        if ratios is not None:
+            return ratios
+        with self._vendor_lock(vendor_id):
+            vendor_memory = self.store.get_vendor(vendor_id)
+            if vendor_memory is None:
+                return None
+            stats = self._online_stats_for(vendor_id)
+            location_factors = self._analyze_location_factors(LocationType(vendor_memory["profile"]["location_type"]))
+        items, by_category = {}, {}
+        for item, acc in stats.get("items", {}).items():
+            items[item] = acc["mean"] / self._item_base_demand(item, location_factors)
+            by_category.setdefault(self.taxonomy.classify(item).category, []).append(items[item])
+        revenue = stats.get("revenue")
+        modelled_revenue = self._revenue_base(vendor_memory, {"location_factors": location_factors})
+        ratios = {
+            "items": items,
+            "categories": {category: sum(values) / len(values) for category, values in by_category.items()},
+            "overall": sum(items.values()) / len(items) if items else None,
+            "revenue": revenue["mean"] / modelled_revenue if revenue and modelled_revenue else None
+        }
+        self._demand_ratios[vendor_id] = ratios
+        return ratios
     
     def _predict_optimal_timing(self, vendor_memory: Dict, processed_input: Dict, day_context: DayContext) -> Dict:
         """Predict optimal operating hours"""
@@ -417,40 +742,51 @@ class SVDPAgent:
     # LOGGING METHODS
     def _log_input_processing(self, processed_input: Dict):
         """Log input processing for debugging"""
-        pass  # Implement logging as needed
+        self.metrics.lap("input_processing")
     
     def _log_state_update(self, current_state: Dict):
         """Log state updates"""
-        pass
+        self.metrics.lap("state_update")
     
     def _log_task_execution(self, task_result: Dict):
         """Log task execution"""
-        pass
+        self.metrics.lap("task_execution")
     
     def _log_output_generation(self, output: PredictionOutput):
         """Log output generation"""
-        pass
+        self.metrics.lap("output_generation")
+
+    def metrics_report(self) -> Dict:
+        """Layer histograms and counters plus cache and writer figures, for export"""
+        report = self.metrics.snapshot()
+        cache = self.prediction_cache.stats()
+        report["counters"].update(cache_hits=cache["hits"], cache_misses=cache["misses"],
+                                  cache_evictions=cache["evictions"])
+        gauges = {"cache_size": cache["size"], "cache_hit_rate": cache["hit_rate"],
+                  "uptime_seconds": report.pop("uptime_seconds")}
+        if self.writer is not None:
+            report["counters"]["memory_flushes"] = self.writer.flushes
+            report["counters"]["memory_bytes_written"] = (
+                report["counters"].get("memory_bytes_written", 0) + self.writer.bytes_written
+            )
+        report["gauges"] = gauges
+        return report
     
     
-    def _log_to_csv(self, vendor_profile: VendorProfile, day_context: DayContext, output: PredictionOutput):
-        os.makedirs("logs", exist_ok=True)
-        csv_file = os.path.join("logs", "predictions.csv")
-        is_new_file = not os.path.exists(csv_file)
-        with open(csv_file, "a", newline="", encoding="utf-8") as f:
-            writer = csv.writer(f)
-            if is_new_file:
-                writer.writerow(["Date", "Vendor", "Location", "Items", "RevenueMin", "RevenueMax", "PeakHours", "Confidence"])
-            items_str = "; ".join([f"{item}: {qty}" for item, qty in output.recommended_items.items()])
-            writer.writerow([
-                day_context.date,
-                vendor_profile.name,
-                vendor_profile.location,
-                items_str,
-                output.expected_revenue[0],
-                output.expected_revenue[1],
-                ", ".join(map(str, output.peak_hours)),
-                f"{output.confidence_level:.2f}"
-            ])
+    def _log_prediction(self, vendor_profile: VendorProfile, day_context: DayContext, output: PredictionOutput):
+        """Buffer a prediction into the journal; see prediction_journal for rotation and reading"""
+        if self.journal is None:
+            return
+        self.journal.record(
+            vendor_profile.vendor_id,
+            vendor_profile.name,
+            vendor_profile.location,
+            day_context.date,
+            output.recommended_items,
+            output.expected_revenue,
+            output.peak_hours,
+            output.confidence_level
+        )
 
 
 # MAIN PREDICTION METHOD
@@ -458,22 +794,589 @@ class SVDPAgent:
         """
         Main prediction method - orchestrates all 4 layers
         """
-        # Layer 1: Process Input
-        processed_input = self.process_input(vendor_profile, day_context)
+        self.metrics.inc("predictions")
+        self.metrics.start()
+        with self._vendor_lock(vendor_profile.vendor_id):
+            # Layer 1: Process Input
+            processed_input = self.process_input(vendor_profile, day_context)
+            vendor_id = processed_input["vendor_id"]
+            cached = self.prediction_cache.get(self._cache_key(vendor_id, processed_input, day_context))
+            if cached is not None:
+                self._log_prediction(vendor_profile, day_context, cached)
+                self.metrics.finish()
+                return cached
         
-        # Layer 2: Update State
-        current_state = self.update_state(processed_input, vendor_profile)
+            # Layer 2: Update State
+            current_state = self.update_state(processed_input, vendor_profile)
         
-        # Layer 3: Execute Task
-        task_result = self.execute_prediction_task(current_state, day_context)
+            # Layer 3: Execute Task
+            task_result = self.execute_prediction_task(current_state, day_context)
+            if self.optimize_inventory:
+                task_result = self.optimize_inventory_task(current_state, task_result)
         
-        # Layer 4: Generate Output
-        output = self.generate_output(task_result, current_state)
+            # Layer 4: Generate Output
+            output = self.generate_output(task_result, current_state)
         
-        # Save updated memory
-        self._save_memory()
+            # Save updated memory
+            self._save_memory()
+            self._log_prediction(vendor_profile, day_context, output)
         
-        return output
+            # Keyed on the version after Layer 2, which may have created the vendor
+            self.prediction_cache.put(self._cache_key(vendor_id, processed_input, day_context), output)
+            self.metrics.finish()
+            return output
+
+    def _cache_key(self, vendor_id: str, processed_input: Dict, day_context: DayContext) -> Tuple:
+        # Simulated quantiles are seeded by date, so days sharing processed_input differ once simulating
+        if self.simulations:
+            processed_input = dict(processed_input, date=day_context.date)
+        return PredictionCache.make_key(vendor_id, self.store.vendor_version(vendor_id), processed_input)
+
+    # BATCH PREDICTION
+    def predict_batch(self, vendor_profiles: List[VendorProfile], day_contexts: List[DayContext]) -> List[List[PredictionOutput]]:
+        """
+        Predict every vendor × day combination in one pass
+        Vendor-level work (Layers 1-2) runs once per vendor, the per-day
+        Layer 3-4 math runs as array operations, and memory is saved once.
+        Returns results indexed as [vendor][day], identical to predict().
+        """
+        if not vendor_profiles:
+            return []
+        if not day_contexts:
+            return [[] for _ in vendor_profiles]
+        started = time.perf_counter()
+
+        # Per-day factors shared by every vendor
+        weather_impact = self._weather_impact_array(day_contexts)
+        festival_demand = np.where([c.is_festival for c in day_contexts], FESTIVAL_DEMAND_BOOST, 1.0)
+        festival_revenue = np.where([c.is_festival for c in day_contexts], FESTIVAL_REVENUE_BOOST, 1.0)
+        payday_revenue = np.where([c.is_payday for c in day_contexts], PAYDAY_REVENUE_BOOST, 1.0)
+        is_rainy = [c.weather == WeatherCondition.RAINY for c in day_contexts]
+        calibration_days = self._calibration_day_arrays(day_contexts)
+
+        # Vendor-level Layers 1-2, once per vendor
+        item_names, item_owner, item_base, item_factors = [], [], [], []
+        revenue_base, revenue_factors, confidence, peak_hours, vendor_ids, budgets = [], [], [], [], [], []
+        for v, vendor_profile in enumerate(vendor_profiles):
+            with self._vendor_lock(vendor_profile.vendor_id):
+                processed_input = self.process_input(vendor_profile, day_contexts[0])
+                current_state = self.update_state(processed_input, vendor_profile)
+            vendor_memory = current_state["vendor_memory"]
+            borrowed_demand = current_state["borrowed_demand"]
+            calibration = current_state["calibration"] or {}
+            location_factors = processed_input["location_factors"]
+            items = vendor_memory.get("profile", {}).get("items_sold", [])
+            item_names.append(items)
+            vendor_ids.append(processed_input["vendor_id"])
+            budgets.append(vendor_memory.get("profile", {}).get("investment_capacity"))
+            for item in items:
+                item_owner.append(v)
+                item_base.append(self._item_base_demand(item, location_factors, borrowed_demand))
+                item_factors.append(calibration.get("items", {}).get(item))
+            revenue_base.append(self._revenue_base(vendor_memory, processed_input, borrowed_demand,
+                                                   current_state["calibration"]))
+            revenue_factors.append(calibration.get("revenue"))
+            confidence_factors = current_state["confidence_factors"]
+            confidence.append(sum(confidence_factors.values()) / len(confidence_factors))
+            peak_hours.append(self._predict_optimal_timing(vendor_memory, processed_input, day_contexts[0])["peak_hours"])
+
+        # Layer 3: items × days and vendors × days
+        demand = np.asarray(item_base, dtype=float)[:, None] * weather_impact[None, :]
+        demand = demand * festival_demand[None, :]
+        revenue = np.asarray(revenue_base, dtype=float)[:, None] * weather_impact[None, :]
+        revenue = revenue * festival_revenue[None, :] * payday_revenue[None, :]
+        # Calibrated items and vendors: fitted multipliers instead of the tables
+        for row, factors in enumerate(item_factors):
+            if factors is not None:
+                demand[row] = item_base[row] * day_factor_array(factors, *calibration_days)
+        for v, factors in enumerate(revenue_factors):
+            if factors is not None:
+                revenue[v] = revenue_base[v] * day_factor_array(factors, *calibration_days)
+        if self.optimize_inventory:
+            demand, margin, budget_limited = self._inventory_plan(
+                demand, [item for items in item_names for item in items], item_factors, np.asarray(item_owner, dtype=int),
+                budgets
+            )
+        else:
+            demand = np.maximum(np.trunc(demand), 10).astype(int)
+        revenue_min = np.trunc(revenue * 0.8).astype(int)
+        revenue_max = np.trunc(revenue * 1.2).astype(int)
+
+        results = []
+        offset = 0
+        for v, items in enumerate(item_names):
+            rows = demand[offset:offset + len(items)].T.tolist()
+            vendor_item_base = item_base[offset:offset + len(items)]
+            vendor_item_factors = item_factors[offset:offset + len(items)]
+            offset += len(items)
+            vendor_confidence = confidence[v]
+            vendor_results = []
+            for d, quantities in enumerate(rows):
+                expected_revenue = (int(revenue_min[v, d]), int(revenue_max[v, d]))
+                special_notes = []
+                if expected_revenue[0] < 300:
+                    special_notes.append("Low revenue day predicted - consider reducing inventory by 30%")
+                if is_rainy[d]:
+                    special_notes.append("Carry plastic covers for rain protection")
+                if vendor_confidence < 0.6:
+                    special_notes.append("Prediction confidence low - start with smaller inventory")
+                if self.optimize_inventory and budget_limited[v, d]:
+                    special_notes.append(self._budget_note(budgets[v]))
+                output = PredictionOutput(
+                    recommended_items=dict(zip(items, quantities)),
+                    expected_revenue=expected_revenue,
+                    peak_hours=list(peak_hours[v]),
+                    special_notes=special_notes,
+                    confidence_level=vendor_confidence
+                )
+                if self.optimize_inventory:
+                    output.expected_margin = int(margin[v, d])
+                if self.simulations:
+                    output.revenue_quantiles, output.item_quantiles = self._simulate_day(
+                        vendor_ids[v], day_contexts[d], items, vendor_item_base, vendor_item_factors,
+                        revenue_base[v], revenue_factors[v]
+                    )
+                vendor_results.append(output)
+            results.append(vendor_results)
+            if self.journal is not None:
+                for context, output in zip(day_contexts, vendor_results):
+                    self._log_prediction(vendor_profiles[v], context, output)
+
+        self._save_memory()
+        self.metrics.inc("predictions", len(vendor_profiles) * len(day_contexts))
+        self.metrics.observe("predict_batch", time.perf_counter() - started)
+        return results
+
+    # HORIZON FORECAST
+    def forecast_horizon(self, vendor_profile: VendorProfile, start_date: Union[str, datetime.date], days: int = 7,
+                         weather_forecast: Optional[List[Dict]] = None, festivals: Iterable[str] = (),
+                         state: Optional[str] = None) -> HorizonForecast:
+        """
+        Plan `days` consecutive days for one vendor, e.g. a week of procurement
+        weather_forecast holds one {"weather", "temperature"} entry per day
+        (missing days are sunny/32°C); an entry may also set is_festival or
+        is_payday. Otherwise weekday, payday windows and festivals (national,
+        plus `state`'s regional ones and the given YYYY-MM-DD dates) come from
+        the calendar. The days run through predict_batch, so vendor-level
+        work and the memory save happen once.
+        """
+        contexts = self.horizon_contexts(start_date, days, weather_forecast, festivals, state)
+        daily = self.predict_batch([vendor_profile], contexts)[0] if contexts else []
+        total_items: Dict[str, int] = {}
+        for output in daily:
+            for item, quantity in output.recommended_items.items():
+                total_items[item] = total_items.get(item, 0) + quantity
+        return HorizonForecast(
+            vendor_id=vendor_profile.vendor_id,
+            days=contexts,
+            daily=daily,
+            total_items=total_items,
+            expected_revenue=(sum(o.expected_revenue[0] for o in daily), sum(o.expected_revenue[1] for o in daily)),
+            confidence_level=daily[0].confidence_level if daily else 0.0
+        )
+
+    def horizon_contexts(self, start_date: Union[str, datetime.date], days: int,
+                         weather_forecast: Optional[List[Dict]] = None, festivals: Iterable[str] = (),
+                         state: Optional[str] = None) -> List[DayContext]:
+        """DayContexts for consecutive days, calendar fields read from one slice of the calendar table"""
+        table = self.calendar.days(start_date, days, state)
+        weather_forecast = weather_forecast or []
+        festivals = set(festivals)
+        contexts = []
+        for offset, date in enumerate(table["date"]):
+            forecast = dict(DEFAULT_FORECAST, **(weather_forecast[offset] if offset < len(weather_forecast) else {}))
+            contexts.append(DayContext(
+                date=date,
+                day_of_week=table["day_of_week"][offset],
+                weather=WeatherCondition(forecast["weather"]),
+                is_festival=bool(forecast.get("is_festival", table["is_festival"][offset] or date in festivals)),
+                is_payday=bool(forecast.get("is_payday", table["is_payday"][offset])),
+                temperature=int(forecast["temperature"])
+            ))
+        return contexts
+
+    def day_context(self, date: Union[str, datetime.date], weather: WeatherCondition, temperature: int,
+                    is_festival: Optional[bool] = None, is_payday: Optional[bool] = None,
+                    state: Optional[str] = None) -> DayContext:
+        """DayContext for one date; festival/payday flags left as None come from the calendar"""
+        features = self.calendar.features(date, state)
+        return DayContext(
+            date=features["date"],
+            day_of_week=features["day_of_week"],
+            weather=weather,
+            is_festival=features["is_festival"] if is_festival is None else is_festival,
+            is_payday=features["is_payday"] if is_payday is None else is_payday,
+            temperature=temperature
+        )
+
+    def _weather_impact_array(self, day_contexts: List[DayContext]) -> np.ndarray:
+        """Vectorized combined_impact of _calculate_weather_impact for many days"""
+        return self._weather_impact_codes(np.array([WEATHER_CODES[c.weather] for c in day_contexts]),
+                                          np.array([c.temperature for c in day_contexts]))
+
+    def _weather_impact_codes(self, codes: np.ndarray, temperature: np.ndarray) -> np.ndarray:
+        """combined_impact for arrays of weather codes and temperatures"""
+        base_lookup = np.array([WEATHER_BASE_IMPACT[condition] for condition in WeatherCondition])
+        weather_multiplier = base_lookup[codes]
+        hot = (codes == WEATHER_CODES[WeatherCondition.HOT]) & (temperature > 35)
+        weather_multiplier = np.where(hot, HOT_WEATHER_IMPACT_ABOVE_35, weather_multiplier)
+        temp_factor = np.select([temperature > 40, temperature > 35, temperature < 10],
+                                [TEMPERATURE_FACTORS["extreme"], TEMPERATURE_FACTORS["hot"], TEMPERATURE_FACTORS["cold"]], 1.0)
+        return weather_multiplier * temp_factor
+
+    def _calibration_day_arrays(self, day_contexts: List[DayContext]) -> Tuple[np.ndarray, ...]:
+        """Vectorized _calibration_day as code arrays for day_factor_array"""
+        return (
+            np.array([WEATHER_CODES[c.weather] for c in day_contexts]),
+            temperature_band_codes(np.array([c.temperature for c in day_contexts], dtype=float)),
+            np.array([bool(c.is_festival) for c in day_contexts]),
+            np.array([bool(c.is_payday) for c in day_contexts]),
+            np.array([c.day_of_week in WEEKEND_DAYS for c in day_contexts])
+        )
+
+    # SIMULATION
+    def _simulate_day(self, vendor_id: str, day_context: DayContext, items: List[str], item_base: List[float],
+                      item_factors: List[Optional[Dict]], revenue_base: float,
+                      revenue_factors: Optional[Dict]) -> Tuple[Dict[str, int], Dict[str, Dict[str, int]]]:
+        """
+        Revenue and per-item demand quantiles of one vendor-day over self.simulations scenarios
+        Each scenario re-runs the Layer 3 model (fitted multipliers where
+        calibrated, the tables otherwise) under its drawn weather and
+        temperature, then applies the target's lognormal residual.
+        """
+        scenarios = self.simulations
+        weather_codes, temperatures, noise = scenario_draws(
+            vendor_id, day_context.date, WEATHER_CODES[day_context.weather], day_context.temperature,
+            len(WeatherCondition), len(items) + 1, scenarios
+        )
+        impact = self._weather_impact_codes(weather_codes, temperatures)
+        calibration_day = (weather_codes, temperature_band_codes(temperatures),
+                           np.full(scenarios, bool(day_context.is_festival)),
+                           np.full(scenarios, bool(day_context.is_payday)),
+                           np.full(scenarios, day_context.day_of_week in WEEKEND_DAYS))
+        festival_demand = FESTIVAL_DEMAND_BOOST if day_context.is_festival else 1.0
+        festival_revenue = FESTIVAL_REVENUE_BOOST if day_context.is_festival else 1.0
+        payday_revenue = PAYDAY_REVENUE_BOOST if day_context.is_payday else 1.0
+
+        samples = np.empty((len(items) + 1, scenarios))
+        sigma = np.full(len(items) + 1, DEFAULT_LOG_SIGMA)
+        targets = [(revenue_base, revenue_factors, festival_revenue * payday_revenue)] + \
+            [(base, factors, festival_demand) for base, factors in zip(item_base, item_factors)]
+        for row, (base, factors, boost) in enumerate(targets):
+            if factors is not None:
+                samples[row] = base * day_factor_array(factors, *calibration_day)
+                sigma[row] = factors.get("sigma", DEFAULT_LOG_SIGMA)
+            else:
+                samples[row] = base * impact * boost
+        samples *= np.exp(noise * sigma[:, None])
+
+        ranges = quantiles(samples)
+        return ranges[0], dict(zip(items, ranges[1:]))
+
+    # INVENTORY OPTIMIZATION
+    def optimize_inventory_task(self, current_state: Dict, task_result: Dict) -> Dict:
+        """
+        Between Layers 3 and 4: replace per-item quantities with a newsvendor plan for the whole menu
+        Stock maximizes expected margin given each item's cost, price and
+        shelf life (from the taxonomy) within the vendor's investment_capacity.
+        """
+        items = list(task_result["item_levels"])
+        item_factors = (current_state.get("calibration") or {}).get("items", {})
+        budget = current_state["vendor_memory"].get("profile", {}).get("investment_capacity")
+        quantities, margin, budget_limited = self._inventory_plan(
+            np.array([[task_result["item_levels"][item]] for item in items], dtype=float).reshape(len(items), 1),
+            items, [item_factors.get(item) for item in items], np.zeros(len(items), dtype=int), [budget]
+        )
+        return dict(task_result, item_demand=dict(zip(items, quantities[:, 0].tolist())),
+                    expected_margin=int(margin[0, 0]), budget_limited=bool(budget_limited[0, 0]),
+                    investment_capacity=budget)
+
+    def _inventory_plan(self, levels: np.ndarray, items: List[str], item_factors: List[Optional[Dict]],
+                        owner: np.ndarray, budgets: List[Optional[float]]) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """plan_inventory for items × days demand levels; owners without investment_capacity are unconstrained"""
+        profiles = [self.taxonomy.classify(item) for item in items]
+        cost = np.array([p.unit_cost for p in profiles], dtype=float)
+        price = np.array([p.unit_price for p in profiles], dtype=float)
+        salvage = salvage_values(cost, np.array([p.shelf_life_days for p in profiles], dtype=float))
+        sigma = np.array([DEFAULT_LOG_SIGMA if f is None else f.get("sigma", DEFAULT_LOG_SIGMA) for f in item_factors],
+                         dtype=float)
+        budget = np.array([np.inf if b is None else b for b in budgets], dtype=float)
+        return plan_inventory(levels, sigma, cost, price, salvage, owner, budget)
+
+    def _budget_note(self, budget: float) -> str:
+        return f"Stock limited by ₹{budget:,.0f} investment capacity - best margin per rupee bought first"
+
+    # SALES INGESTION
+    def ingest_sales(self, records: Union[Dict, Iterable[Dict]], flush_every: int = 1000) -> Dict:
+        """
+        Record actual sales outcomes, e.g. a day-end POS export
+        Accepts one record or any iterable/generator of records shaped like a
+        sales_history entry plus "vendor_id". Each day is appended to the
+        vendor's history and folded into learned_patterns["online_stats"]
+        and performance_metrics in O(items), without rescanning history.
+        Records that can't be stored (unknown vendor, bad date, weather or
+        quantities) are skipped. Memory is saved every `flush_every` records
+        and at the end, also when the stream itself raises.
+        Returns ingested and skipped counts and sample skip reasons.
+        """
+        if isinstance(records, dict):
+            records = [records]
+
+        touched = set()
+        ingested = skipped = 0
+        errors: List[str] = []
+        try:
+            for record in records:
+                try:
+                    day = self._normalize_sale(record)
+                    vendor_id = record["vendor_id"]
+                    with self._vendor_lock(vendor_id):
+                        self._online_stats_for(vendor_id)
+                except (KeyError, ValueError) as error:
+                    skipped += 1
+                    if len(errors) < MAX_INGEST_ERRORS:
+                        errors.append(str(error.args[0]) if error.args else repr(error))
+                    continue
+                with self._vendor_lock(vendor_id):
+                    stats = self._online_stats_for(vendor_id)
+                    self.store.append_sale(vendor_id, day)
+                    self.pattern_index.add_day(vendor_id, day)
+                    update_sales_stats(stats, day)
+                touched.add(vendor_id)
+                ingested += 1
+                if ingested % flush_every == 0:
+                    self._commit_learned_patterns(touched)
+                    touched = set()
+        finally:
+            # Stored days and their online stats never drift apart, whatever stopped the stream
+            self._commit_learned_patterns(touched)
+        return {"ingested": ingested, "skipped": skipped, "errors": errors}
+
+    def _normalize_sale(self, record: Dict) -> Dict:
+        """sales_history entry from an ingested record; ValueError for a record that can't be stored"""
+        if not isinstance(record, dict) or not record.get("vendor_id"):
+            raise ValueError(f"Sales record without vendor_id: {record!r}")
+        vendor_id = record["vendor_id"]
+        day = {key: value for key, value in record.items() if key != "vendor_id"}
+        if "date" not in day:
+            raise ValueError(f"Sales record for {vendor_id} has no date")
+        try:
+            date = datetime.datetime.strptime(day["date"], "%Y-%m-%d")
+        except (TypeError, ValueError):
+            raise ValueError(f"Sales record for {vendor_id} has a bad date: {day['date']!r}")
+        try:
+            day["weather"] = WeatherCondition(day.get("weather", "sunny")).value
+        except ValueError:
+            raise ValueError(f"Sales record for {vendor_id} has unknown weather: {day.get('weather')!r}")
+        revenue = day.get("actual_revenue")
+        items_sold = day.get("items_sold") or {}
+        if (revenue is not None and not _is_number(revenue)) or not isinstance(items_sold, dict) or \
+                not all(_is_number(quantity) for quantity in items_sold.values()):
+            raise ValueError(f"Sales record for {vendor_id} on {day['date']} has non-numeric sales")
+        if not day.get("day_of_week"):
+            day["day_of_week"] = date.strftime("%A")
+        return day
+
+    def _online_stats_for(self, vendor_id: str) -> Dict:
+        """Working copy of a vendor's online stats; call with the vendor lock held"""
+        stats = self._online_stats.get(vendor_id)
+        if stats is None:
+            vendor_memory = self.store.get_vendor(vendor_id)
+            if vendor_memory is None:
+                raise KeyError(f"Unknown vendor: {vendor_id}")
+            stored = vendor_memory.get("learned_patterns", {}).get("online_stats")
+            if stored is not None:
+                stats = copy.deepcopy(stored)
+                if "calibration" not in stats:
+                    # Stored before calibration existed
+                    stats["calibration"] = calibration_stats(self.store.get_history(vendor_id))
+            else:
+                # One-time seed from days recorded before ingestion existed
+                stats = stats_from_history(self.store.get_history(vendor_id))
+            self._online_stats[vendor_id] = stats
+        return stats
+
+    def forget_learned_state(self):
+        """Drop per-vendor stats derived from history, e.g. after the store's view of history moved"""
+        self._online_stats.clear()
+        self._demand_ratios.clear()
+
+    def _commit_learned_patterns(self, touched: Iterable[str]):
+        touched = list(touched)
+        cell_stats = {}
+        for vendor_id in touched:
+            with self._vendor_lock(vendor_id):
+                cell_stats[vendor_id] = copy_calibration_stats(self._online_stats[vendor_id].get("calibration", {}))
+        calibrations = self._fit_calibration(cell_stats)
+        for vendor_id in touched:
+            self._demand_ratios.pop(vendor_id, None)
+            if self._vendor_index is not None:
+                self._vendor_index.set_observed(vendor_id, self._observed_days(vendor_id))
+            with self._vendor_lock(vendor_id):
+                stats = self._online_stats[vendor_id]
+                vendor_memory = self.store.get_vendor(vendor_id)
+                patterns = dict(vendor_memory.get("learned_patterns", {}), online_stats=stats,
+                                calibration=calibrations[vendor_id])
+                self.store.set_patterns(vendor_id, patterns)
+                metrics = dict(vendor_memory.get("performance_metrics", {}))
+                metrics.update(summarize_performance(stats))
+                self.store.set_metrics(vendor_id, metrics)
+        if self.retention is not None:
+            self._compact(touched, self.retention)
+        self._save_memory()
+
+    def _observed_days(self, vendor_id: str) -> int:
+        """Days of sales a vendor has recorded, raw or rolled up"""
+        return self.store.history_length(vendor_id) + self.store.rollup_days(vendor_id)
+
+    # RETENTION
+    def compact_history(self, vendor_ids: Optional[Iterable[str]] = None,
+                        policy: Optional[RetentionPolicy] = None) -> Dict:
+        """
+        Roll raw days older than the retention window up into per-bucket aggregates
+        Defaults to every vendor and the agent's policy (else the default
+        one). Vendors whose online stats were never stored get them seeded
+        from their full history first, so nothing derived from the dropped
+        days is lost; no calibration is fitted for them, so a vendor on the
+        hard-coded tables stays on them and predictions don't change.
+        """
+        started = time.perf_counter()
+        policy = policy or self.retention or RetentionPolicy()
+        vendor_ids = list(self.store.list_profiles()) if vendor_ids is None else list(vendor_ids)
+        candidates = [vendor_id for vendor_id in vendor_ids
+                      if self.store.history_length(vendor_id) > policy.raw_days + policy.slack_days]
+        for vendor_id in candidates:
+            with self._vendor_lock(vendor_id):
+                learned_patterns = self.store.get_vendor(vendor_id).get("learned_patterns", {})
+                stored = learned_patterns.get("online_stats")
+                if stored is None or "calibration" not in stored:
+                    stats = self._online_stats_for(vendor_id)
+                    self.store.set_patterns(vendor_id, dict(learned_patterns, online_stats=stats))
+        compacted, days_rolled_up = self._compact(candidates, policy)
+        self._save_memory()
+        return {
+            "vendors": len(vendor_ids),
+            "compacted": compacted,
+            "days_rolled_up": days_rolled_up,
+            "seconds": round(time.perf_counter() - started, 3)
+        }
+
+    def _compact(self, vendor_ids: Iterable[str], policy: RetentionPolicy) -> Tuple[int, int]:
+        """(vendors compacted, days rolled up); online stats must already be stored"""
+        compacted = days_rolled_up = 0
+        for vendor_id in vendor_ids:
+            with self._vendor_lock(vendor_id):
+                if self.store.history_length(vendor_id) <= policy.raw_days + policy.slack_days:
+                    continue
+                plan = plan_compaction(self.store.get_history(vendor_id), self.store.get_rollups(vendor_id), policy)
+                if plan is None:
+                    continue
+                before = self.store.history_length(vendor_id)
+                self.store.compact_history(vendor_id, *plan)
+                # Rebuilt from the remaining raw days plus the roll-ups on next use
+                self.pattern_index.forget(vendor_id)
+                days_rolled_up += before - self.store.history_length(vendor_id)
+                compacted += 1
+        return compacted, days_rolled_up
+
+    # CALIBRATION
+    def calibrate(self) -> Dict:
+        """
+        Refit calibrated multipliers for the whole fleet
+        Location-type priors are pooled from every vendor's cell sums, then
+        every vendor's revenue and items are refit against them, one batched
+        solve per kind. Vendors without online stats are seeded from their
+        history once; later refits only read the stored sums. Ingested sales
+        refit their vendor incrementally against these priors.
+        """
+        started = time.perf_counter()
+        vendor_ids = list(self.store.list_profiles())
+        cell_stats = {}
+        for vendor_id in vendor_ids:
+            with self._vendor_lock(vendor_id):
+                stats = self._online_stats.get(vendor_id)
+                if stats is None:
+                    stats = self.store.get_vendor(vendor_id).get("learned_patterns", {}).get("online_stats")
+                if stats is None or "calibration" not in stats:
+                    stats = self._online_stats_for(vendor_id)
+                cell_stats[vendor_id] = copy_calibration_stats(stats.get("calibration", {}))
+        fit_started = time.perf_counter()
+        calibrations = self._fit_calibration(cell_stats, pool=True)
+        fit_seconds = time.perf_counter() - fit_started
+
+        for vendor_id in vendor_ids:
+            with self._vendor_lock(vendor_id):
+                vendor_memory = self.store.get_vendor(vendor_id)
+                patterns = dict(vendor_memory.get("learned_patterns", {}), calibration=calibrations[vendor_id])
+                if vendor_id in self._online_stats:
+                    patterns["online_stats"] = self._online_stats[vendor_id]
+                self.store.set_patterns(vendor_id, patterns)
+        self._save_memory()
+        return {
+            "vendors": len(vendor_ids),
+            "calibrated": sum(calibration is not None for calibration in calibrations.values()),
+            "fit_seconds": round(fit_seconds, 3),
+            "seconds": round(time.perf_counter() - started, 3)
+        }
+
+    def _calibration_priors(self, kind: str) -> Dict[str, np.ndarray]:
+        """Location type -> prior coefficients: pooled by calibrate(), else the hard-coded tables"""
+        pooled = self.memory.get("patterns", {}).get("calibration", {}).get(kind, {})
+        return {location_type.value: np.asarray(pooled.get(location_type.value, CALIBRATION_TABLE_PRIORS[kind]))
+                for location_type in LocationType}
+
+    def _calibration_targets(self, cell_stats: Dict[str, Dict]) -> Dict[str, Dict[str, List]]:
+        """Per kind: cell sums, log base (what the multipliers scale), location type and (vendor, item) of every fit"""
+        targets = {kind: {"cells": [], "offsets": [], "groups": [], "owners": []} for kind in ("revenue", "items")}
+
+        def add(kind: str, cells: Dict, base: float, location_type: LocationType, owner: Tuple[str, Optional[str]]):
+            fits = targets[kind]
+            fits["cells"].append(cells)
+            fits["offsets"].append(math.log(base))
+            fits["groups"].append(location_type.value)
+            fits["owners"].append(owner)
+
+        for vendor_id, stats in cell_stats.items():
+            profile = self.store.get_vendor(vendor_id)["profile"]
+            location_type = LocationType(profile["location_type"])
+            base_revenue = profile.get("avg_daily_revenue", 800)
+            if stats.get("revenue") and base_revenue and base_revenue > 0:
+                add("revenue", stats["revenue"], base_revenue, location_type, (vendor_id, None))
+            location_factors = self._analyze_location_factors(location_type)
+            for item, cells in stats.get("items", {}).items():
+                add("items", cells, self._item_base_demand(item, location_factors), location_type, (vendor_id, item))
+        return targets
+
+    def _fit_calibration(self, cell_stats: Dict[str, Dict], pool: bool = False) -> Dict[str, Optional[Dict]]:
+        """
+        Calibrated multipliers of many vendors, one solve per kind; None for vendors with no usable day
+        With pool=True the location-type priors are first refit from these
+        vendors and stored in the fleet-level patterns.
+        """
+        targets = self._calibration_targets(cell_stats)
+        equations = {kind: normal_equations(fits["cells"], fits["offsets"]) for kind, fits in targets.items()}
+        if pool:
+            pooled = {kind: fit_priors(*equations[kind][:2], targets[kind]["groups"], CALIBRATION_TABLE_PRIORS[kind])
+                      for kind in targets}
+            patterns = dict(self.memory.get("patterns", {}), calibration={
+                kind: {location_type: coefficients.tolist() for location_type, coefficients in priors.items()}
+                for kind, priors in pooled.items()
+            })
+            self.store.set_global_patterns(patterns)
+            self.memory["patterns"] = patterns
+
+        calibrations: Dict[str, Dict] = {vendor_id: {"revenue": None, "items": {}} for vendor_id in cell_stats}
+        for kind, fits in targets.items():
+            fitted = fit_targets(*equations[kind], fits["groups"], self._calibration_priors(kind))
+            for (vendor_id, item), factors in zip(fits["owners"], fitted):
+                if factors is None:
+                    continue
+                if item is None:
+                    calibrations[vendor_id]["revenue"] = factors
+                else:
+                    calibrations[vendor_id]["items"][item] = factors
+        return {vendor_id: calibration if calibration["revenue"] or calibration["items"] else None
+                for vendor_id, calibration in calibrations.items()}
 
 # Example usage
 if __name__ == "__main__":
@@ -0,0 +1,303 @@
+#!/usr/bin/env python3
+"""
+Backtest the predictor against recorded sales
+Each vendor's sales_history is replayed day by day: the DayContext is
+rebuilt from what the day recorded (calendar flags fill the gaps), and
+the predictor runs against an AsOfStore that only shows days dated
+before it. Consecutive days whose Layer 2 state is identical are
+predicted in one predict_batch call. Forecasts are scored against
+actual_revenue and items_sold with array math: revenue MAPE and bias,
+per-item MAPE, and the rupee cost of waste (over-stock, at ingredient
+cost) and stock-outs (lost margin).
+
+Vendors are sharded across processes; every worker opens the memory
+read-only, so the memory file is never written.
+
+Usage: python backtest.py [--memory memory.json] [--workers 4] [--output backtest.json]
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from agent import DayContext, PredictionOutput, SVDPAgent, WeatherCondition
+from memory_store import AsOfStore, open_store
+
+# Share of an item's price that is ingredient cost: wasted stock loses
+# this much, a lost sale loses the rest (the margin)
+DEFAULT_UNIT_COST_SHARE = 0.4
+
+SUM_FIELDS = ("days", "revenue_days", "revenue_ape_sum", "revenue_error_sum", "actual_revenue_sum",
+              "item_days", "item_ape_sum", "waste_units", "stockout_units", "waste_cost", "stockout_cost")
+
+
+def context_from_day(agent: SVDPAgent, day: Dict) -> Optional[DayContext]:
+    """The DayContext a recorded day implies; None if it lacks a usable date"""
+    is_festival, is_payday = day.get("is_festival"), day.get("is_payday")
+    try:
+        context = agent.day_context(
+            day.get("date"),
+            WeatherCondition(day.get("weather") or "sunny"),
+            int(day.get("temperature") or 32),
+            None if is_festival is None else bool(is_festival),
+            None if is_payday is None else bool(is_payday)
+        )
+    except (KeyError, ValueError, TypeError):
+        return None
+    if day.get("day_of_week"):
+        context.day_of_week = day["day_of_week"]
+    return context
+
+
+def _state_key(current_state: Dict) -> str:
+    """Layer 2 outputs that predictions depend on, beyond the day itself"""
+    return json.dumps({key: value for key, value in current_state.items()
+                       if key not in ("vendor_memory", "processed_input", "pattern_matches")},
+                      sort_keys=True, default=str)
+
+
+class _Replay:
+    """Moves the view forward through one vendor's history, keeping the agent's derived state in step"""
+
+    def __init__(self, agent: SVDPAgent, view: AsOfStore, vendor_id: str, history: List[Dict]):
+        self.agent, self.view, self.vendor_id, self.history = agent, view, vendor_id, history
+        self.visible = 0
+        agent.pattern_index.forget(vendor_id)
+
+    def advance(self, date: str):
+        if date == self.view.as_of:
+            return
+        self.view.set_as_of(date)
+        # Neighbour stats were computed from a different cut of history
+        self.agent.forget_learned_state()
+        visible = self.view.history_length(self.vendor_id)
+        # Newly visible days go into the pattern buckets, as ingest_sales would add them
+        for day in self.history[self.visible:visible]:
+            self.agent.pattern_index.add_day(self.vendor_id, day)
+        self.visible = visible
+
+
+def replay_vendor(agent: SVDPAgent, view: AsOfStore, vendor_id: str) -> Tuple[List[Dict], List[PredictionOutput]]:
+    """Recorded days of a vendor (oldest first) and what the predictor said for each with only prior days visible"""
+    profile = agent.get_vendor_profile(vendor_id)
+    view.set_as_of(None)
+    history = view.get_history(vendor_id)
+    days, contexts = [], []
+    for day in history:
+        context = context_from_day(agent, day)
+        if context is not None:
+            days.append(day)
+            contexts.append(context)
+
+    # Pass 1: Layer 2 state as of each day, to find runs that predict alike
+    keys = []
+    replay = _Replay(agent, view, vendor_id, history)
+    for context in contexts:
+        replay.advance(context.date)
+        keys.append(_state_key(agent.update_state(agent.process_input(profile, context), profile)))
+
+    # Pass 2: one predict_batch per run
+    outputs: List[PredictionOutput] = []
+    replay = _Replay(agent, view, vendor_id, history)
+    start = 0
+    while start < len(contexts):
+        end = start + 1
+        while end < len(contexts) and keys[end] == keys[start]:
+            end += 1
+        replay.advance(contexts[start].date)
+        outputs += agent.predict_batch([profile], contexts[start:end])[0]
+        start = end
+    view.set_as_of(None)
+    return days, outputs
+
+
+def score_vendor(days: List[Dict], outputs: List[PredictionOutput], unit_cost_share: float) -> Dict:
+    """Error sums for one vendor, computed over days × items arrays"""
+    sums = dict.fromkeys(SUM_FIELDS, 0.0)
+    sums["days"] = len(days)
+    if not days:
+        return sums
+    items = list(outputs[0].recommended_items)
+
+    predicted_revenue = np.array([sum(output.expected_revenue) / 2 for output in outputs])
+    actual_revenue = np.array([day["actual_revenue"] if isinstance(day.get("actual_revenue"), (int, float))
+                               and not isinstance(day.get("actual_revenue"), bool) else np.nan for day in days],
+                              dtype=float)
+    has_revenue = ~np.isnan(actual_revenue)
+    error = predicted_revenue[has_revenue] - actual_revenue[has_revenue]
+    positive = actual_revenue[has_revenue] > 0
+    sums["revenue_days"] = int(positive.sum())
+    sums["revenue_ape_sum"] = float((np.abs(error[positive]) / actual_revenue[has_revenue][positive]).sum())
+    sums["revenue_error_sum"] = float(error.sum())
+    sums["actual_revenue_sum"] = float(actual_revenue[has_revenue].sum())
+
+    recorded = np.array([isinstance(day.get("items_sold"), dict) for day in days])
+    if not items or not recorded.any():
+        return sums
+    sold = [day.get("items_sold") if isinstance(day.get("items_sold"), dict) else {} for day in days]
+    predicted = np.array([[output.recommended_items.get(item, 0) for item in items] for output in outputs], dtype=float)
+    actual = np.array([[float(day_sold.get(item, 0) or 0) for item in items] for day_sold in sold])
+    predicted, actual = predicted[recorded], actual[recorded]
+
+    # Average price per unit on each day from its revenue and units sold (all items),
+    # falling back to the vendor's mean price on days that lack either
+    units = np.array([sum(q for q in day_sold.values() if isinstance(q, (int, float))) for day_sold in sold],
+                     dtype=float)[recorded]
+    revenue = np.where(has_revenue, actual_revenue, 0.0)[recorded]
+    price = np.divide(revenue, units, out=np.full(len(units), np.nan), where=(units > 0) & (revenue > 0))
+    price = np.where(np.isnan(price), np.nanmean(price) if (~np.isnan(price)).any() else 0.0, price)
+
+    sold_any = actual > 0
+    over = np.clip(predicted - actual, 0, None).sum(axis=1)
+    under = np.clip(actual - predicted, 0, None).sum(axis=1)
+    sums["item_days"] = int(sold_any.sum())
+    sums["item_ape_sum"] = float((np.abs(predicted - actual)[sold_any] / actual[sold_any]).sum())
+    sums["waste_units"] = float(over.sum())
+    sums["stockout_units"] = float(under.sum())
+    sums["waste_cost"] = float((over * price).sum() * unit_cost_share)
+    sums["stockout_cost"] = float((under * price).sum() * (1 - unit_cost_share))
+    return sums
+
+
+def summarize(sums: Dict) -> Dict:
+    """MAPE, bias and waste/stock-out cost from (possibly merged) error sums"""
+    revenue_days = sums["revenue_days"]
+    return {
+        "days": int(sums["days"]),
+        "revenue_mape": sums["revenue_ape_sum"] / revenue_days if revenue_days else None,
+        # Rupees per day; positive means the predictor over-forecast
+        "revenue_bias": sums["revenue_error_sum"] / sums["days"] if sums["days"] else None,
+        "revenue_bias_pct": sums["revenue_error_sum"] / sums["actual_revenue_sum"] if sums["actual_revenue_sum"] else None,
+        "item_mape": sums["item_ape_sum"] / sums["item_days"] if sums["item_days"] else None,
+        "waste_units": int(sums["waste_units"]),
+        "stockout_units": int(sums["stockout_units"]),
+        "waste_cost": round(sums["waste_cost"], 2),
+        "stockout_cost": round(sums["stockout_cost"], 2)
+    }
+
+
+def _merge(total: Dict, sums: Dict):
+    for field in SUM_FIELDS:
+        total[field] = total.get(field, 0.0) + sums[field]
+
+
+# WORKERS
+_worker_agent = None
+_worker_view = None
+
+
+def _init_worker(memory_file: str, columnar: bool):
+    global _worker_agent, _worker_view
+    _worker_view = AsOfStore(open_store(memory_file, columnar_history=columnar))
+    _worker_agent = SVDPAgent(memory_file=memory_file, store=_worker_view, cache_size=0, read_only=True)
+    # Cold-start neighbours are chosen by how much history they have in total
+    _ = _worker_agent.vendor_index
+
+
+def _backtest_shard(vendor_ids: List[str], unit_cost_share: float) -> List[Tuple[str, str, Optional[Dict]]]:
+    """(vendor_id, location_type, error sums) per vendor; sums are None for vendors that could not be replayed"""
+    results = []
+    for vendor_id in vendor_ids:
+        location_type = _worker_agent.store.get_vendor(vendor_id)["profile"]["location_type"]
+        try:
+            days, outputs = replay_vendor(_worker_agent, _worker_view, vendor_id)
+        except PermissionError:
+            # The stored profile maps to a different memory key, so predicting would create a vendor
+            results.append((vendor_id, location_type, None))
+            continue
+        results.append((vendor_id, location_type, score_vendor(days, outputs, unit_cost_share)))
+    return results
+
+
+def run_backtest(memory_file: str, workers: int = 1, shard_size: int = 50,
+                 unit_cost_share: float = DEFAULT_UNIT_COST_SHARE, columnar: bool = False,
+                 vendor_ids: Optional[List[str]] = None) -> Dict:
+    """Replay every (or the given) vendor's history; returns the report"""
+    if vendor_ids is None:
+        store = open_store(memory_file)
+        store.load()
+        vendor_ids = list(store.list_profiles())
+        del store
+    shards = [vendor_ids[start:start + shard_size] for start in range(0, len(vendor_ids), shard_size)]
+
+    started = time.perf_counter()
+    results = []
+    if workers <= 1:
+        _init_worker(memory_file, columnar)
+        for shard in shards:
+            results += _backtest_shard(shard, unit_cost_share)
+    else:
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                                 initargs=(memory_file, columnar)) as pool:
+            futures = [pool.submit(_backtest_shard, shard, unit_cost_share) for shard in shards]
+            for future in as_completed(futures):
+                results += future.result()
+    elapsed = time.perf_counter() - started
+
+    overall: Dict = {}
+    by_location: Dict[str, Dict] = {}
+    by_vendor = {}
+    skipped = []
+    for vendor_id, location_type, sums in sorted(results, key=lambda result: result[0]):
+        if sums is None:
+            skipped.append(vendor_id)
+            continue
+        _merge(overall, sums)
+        _merge(by_location.setdefault(location_type, {}), sums)
+        by_vendor[vendor_id] = dict(summarize(sums), location_type=location_type)
+    vendor_days = int(overall.get("days", 0))
+    return {
+        "memory_file": memory_file,
+        "vendors": len(by_vendor),
+        "skipped_vendors": skipped,
+        "vendor_days": vendor_days,
+        "seconds": round(elapsed, 3),
+        "vendor_days_per_second": round(vendor_days / elapsed) if elapsed else None,
+        "unit_cost_share": unit_cost_share,
+        "overall": summarize(overall) if overall else None,
+        "by_location_type": {location_type: summarize(sums) for location_type, sums in sorted(by_location.items())},
+        "by_vendor": by_vendor
+    }
+
+
+def _percent(value: Optional[float]) -> str:
+    return "   n/a" if value is None else f"{value:6.1%}"
+
+
+def render_report(report: Dict) -> str:
+    lines = [f"{report['vendors']} vendors, {report['vendor_days']} vendor-days in {report['seconds']}s "
+             f"({report['vendor_days_per_second'] or 0:,} /s)"]
+    if report["skipped_vendors"]:
+        lines.append(f"⚠️  skipped {len(report['skipped_vendors'])} vendor(s) whose profile maps to another memory key")
+    lines.append(f"{'':<16}{'days':>8}{'rev MAPE':>10}{'bias ₹/day':>12}{'item MAPE':>11}{'waste ₹':>12}{'stock-out ₹':>13}")
+    rows = list(report["by_location_type"].items()) + ([("all", report["overall"])] if report["overall"] else [])
+    for name, summary in rows:
+        bias = summary["revenue_bias"]
+        lines.append(f"{name:<16}{summary['days']:>8}{_percent(summary['revenue_mape']):>10}"
+                     f"{'n/a' if bias is None else f'{bias:+.0f}':>12}{_percent(summary['item_mape']):>11}"
+                     f"{summary['waste_cost']:>12,.0f}{summary['stockout_cost']:>13,.0f}")
+    return "\n".join(lines)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Backtest SVDP predictions against recorded sales")
+    parser.add_argument("--memory", default="memory.json", help="memory file, .db or shard directory (read only)")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--shard-size", type=int, default=50, help="vendors per worker task")
+    parser.add_argument("--unit-cost-share", type=float, default=DEFAULT_UNIT_COST_SHARE,
+                        help="ingredient cost as a share of price (waste vs stock-out cost)")
+    parser.add_argument("--columnar", action="store_true", help="hold history in columnar form in each worker")
+    parser.add_argument("--output", help="write the full JSON report (per vendor too) here")
+    args = parser.parse_args()
+
+    report = run_backtest(args.memory, args.workers, args.shard_size, args.unit_cost_share, args.columnar)
+    print(render_report(report), file=sys.stderr)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2, ensure_ascii=False)
@@ -0,0 +1,228 @@
+#!/usr/bin/env python3
+"""
+SVDP benchmark suite
+For each fleet size a fresh process generates a seeded synthetic memory
+file and measures:
+  - load time (SVDPAgent startup, i.e. _load_memory) vs memory size
+  - predict() latency percentiles on random vendor-days (cache off)
+  - _save_memory time for an incremental change and for a full snapshot
+  - prediction journal throughput (_log_prediction, including the final flush)
+  - peak RSS of that process
+Results are written as JSON tagged with the git commit, so two runs can
+be diffed with --compare.
+
+Usage:
+  python benchmarks/run_benchmarks.py --sizes 100,1000,10000 --output benchmarks/results/latest.json
+  python benchmarks/run_benchmarks.py --sizes 10000 --columnar --output benchmarks/results/columnar.json
+  python benchmarks/run_benchmarks.py --compare benchmarks/results/old.json benchmarks/results/latest.json
+"""
+
+import argparse
+import datetime
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Dict, List, Optional
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from agent import DayContext, SVDPAgent, WeatherCondition
+from memory_store import open_store
+from prediction_journal import PredictionJournal
+from synthetic import write_memory
+
+try:
+    import resource
+except ImportError:  # Windows: peak RSS is not reported
+    resource = None
+
+REPO_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+WEEKDAYS = ["Monday", "Tuesday", "Wednesday", "Thursday", "Friday", "Saturday", "Sunday"]
+
+# Metrics where a larger number is better; lower is better for the rest
+HIGHER_IS_BETTER = ("log_rows_per_second",)
+
+
+def peak_rss_mb() -> Optional[float]:
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is KiB on Linux and bytes on macOS
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+def percentile(sorted_values: List[float], q: float) -> float:
+    index = min(int(q * len(sorted_values)), len(sorted_values) - 1)
+    return sorted_values[index]
+
+
+def random_context(rng: random.Random) -> DayContext:
+    date = datetime.date(2025, 7, 1) + datetime.timedelta(days=rng.randint(0, 90))
+    return DayContext(
+        date=date.isoformat(),
+        day_of_week=WEEKDAYS[date.weekday()],
+        weather=rng.choice(list(WeatherCondition)),
+        is_festival=rng.random() < 0.05,
+        is_payday=rng.random() < 0.2,
+        temperature=rng.randint(18, 44)
+    )
+
+
+def bench_size(vendors: int, days: int, seed: int, predictions: int, log_rows: int, columnar: bool = False) -> Dict:
+    """Every measurement for one fleet size; meant to run in its own process"""
+    rng = random.Random(seed)
+    prompts_file = os.path.join(REPO_ROOT, "prompts", "prompt_templates.txt")
+    with tempfile.TemporaryDirectory(prefix="svdp-bench-") as workdir:
+        memory_file = os.path.join(workdir, "memory.json")
+        started = time.perf_counter()
+        memory_bytes = write_memory(memory_file, vendors, days, seed)
+        generate_seconds = time.perf_counter() - started
+
+        started = time.perf_counter()
+        agent = SVDPAgent(memory_file=memory_file, prompts_file=prompts_file, cache_size=0,
+                          store=open_store(memory_file, columnar_history=columnar))
+        load_seconds = time.perf_counter() - started
+
+        vendor_ids = list(agent.list_vendors())
+        sample = [(agent.get_vendor_profile(rng.choice(vendor_ids)), random_context(rng)) for _ in range(predictions)]
+        latencies = []
+        for profile, context in sample:
+            started = time.perf_counter()
+            agent.predict(profile, context)
+            latencies.append(time.perf_counter() - started)
+        latencies.sort()
+
+        # Incremental save: one new sales day, appended to the journal
+        agent.store.append_sale(vendor_ids[0], dict(agent.store.get_history(vendor_ids[0])[0], date="2025-07-01"))
+        started = time.perf_counter()
+        agent.save()
+        save_incremental_seconds = time.perf_counter() - started
+
+        # Full save: rewrite the whole snapshot
+        save_full_seconds = None
+        if hasattr(agent.store, "compact"):
+            started = time.perf_counter()
+            agent.store.compact()
+            save_full_seconds = time.perf_counter() - started
+
+        agent.journal = PredictionJournal(os.path.join(workdir, "logs"))
+        profile, context = sample[0]
+        output = agent.predict(profile, context)
+        started = time.perf_counter()
+        for _ in range(log_rows):
+            agent._log_prediction(profile, context, output)
+        agent.journal.flush()
+        log_seconds = time.perf_counter() - started
+        agent.close()
+
+    return {
+        "vendors": vendors,
+        "days": days,
+        "columnar": columnar,
+        "history_rows": vendors * days,
+        "memory_bytes": memory_bytes,
+        "generate_seconds": generate_seconds,
+        "load_seconds": load_seconds,
+        "predict_count": len(latencies),
+        "predict_mean_ms": 1000 * sum(latencies) / len(latencies),
+        "predict_p50_ms": 1000 * percentile(latencies, 0.50),
+        "predict_p95_ms": 1000 * percentile(latencies, 0.95),
+        "predict_p99_ms": 1000 * percentile(latencies, 0.99),
+        "save_incremental_ms": 1000 * save_incremental_seconds,
+        "save_full_seconds": save_full_seconds,
+        "log_rows_per_second": log_rows / log_seconds if log_seconds else None,
+        "peak_rss_mb": peak_rss_mb()
+    }
+
+
+def git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=REPO_ROOT, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run_suite(sizes: List[int], days: int, seed: int, predictions: int, log_rows: int,
+              columnar: bool = False) -> Dict:
+    results = []
+    for vendors in sizes:
+        # A fresh interpreter per size keeps peak RSS and caches independent
+        completed = subprocess.run(
+            [sys.executable, os.path.abspath(__file__), "--single", str(vendors), "--days", str(days),
+             "--seed", str(seed), "--predictions", str(predictions), "--log-rows", str(log_rows)]
+            + (["--columnar"] if columnar else []),
+            capture_output=True, text=True, check=True
+        )
+        result = json.loads(completed.stdout)
+        print(f"{vendors:>9} vendors  load {result['load_seconds']:.3f}s  "
+              f"predict p50 {result['predict_p50_ms']:.3f}ms p99 {result['predict_p99_ms']:.3f}ms  "
+              f"rss {result['peak_rss_mb'] or 0:.0f}MB", file=sys.stderr)
+        results.append(result)
+    return {
+        "commit": git_commit(),
+        "timestamp": datetime.datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "seed": seed,
+        "results": results
+    }
+
+
+def compare(old_file: str, new_file: str) -> str:
+    """Per-size percentage change of every numeric metric between two result files"""
+    with open(old_file, encoding='utf-8') as f:
+        old = json.load(f)
+    with open(new_file, encoding='utf-8') as f:
+        new = json.load(f)
+    old_by_size = {r["vendors"]: r for r in old["results"]}
+    lines = [f"{old.get('commit')} -> {new.get('commit')}"]
+    for result in new["results"]:
+        before = old_by_size.get(result["vendors"])
+        if before is None:
+            continue
+        lines.append(f"{result['vendors']} vendors:")
+        for metric, value in result.items():
+            if metric in ("vendors", "days", "columnar", "history_rows", "predict_count") or \
+                    not isinstance(value, (int, float)):
+                continue
+            previous = before.get(metric)
+            if not isinstance(previous, (int, float)) or not previous:
+                continue
+            change = (value - previous) / previous * 100
+            worse = change < 0 if metric in HIGHER_IS_BETTER else change > 0
+            flag = "  ⚠️" if worse and abs(change) > 10 else ""
+            lines.append(f"  {metric:<22}{previous:>14.4f} -> {value:<14.4f}{change:+7.1f}%{flag}")
+    return "\n".join(lines)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="SVDP benchmark suite")
+    parser.add_argument("--sizes", default="100,1000,10000", help="comma-separated fleet sizes (up to 1000000)")
+    parser.add_argument("--days", type=int, default=30, help="sales_history rows per vendor")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--predictions", type=int, default=2000, help="predict() calls timed per size")
+    parser.add_argument("--log-rows", type=int, default=5000, help="predictions journaled per size for the throughput figure")
+    parser.add_argument("--columnar", action="store_true", help="hold sales_history in columnar form")
+    parser.add_argument("--output", default=os.path.join("benchmarks", "results", "latest.json"))
+    parser.add_argument("--single", type=int, help=argparse.SUPPRESS)
+    parser.add_argument("--compare", nargs=2, metavar=("OLD", "NEW"), help="diff two result files")
+    args = parser.parse_args()
+
+    if args.compare:
+        print(compare(*args.compare))
+    elif args.single is not None:
+        print(json.dumps(bench_size(args.single, args.days, args.seed, args.predictions, args.log_rows,
+                                    args.columnar)))
+    else:
+        report = run_suite([int(size) for size in args.sizes.split(",")], args.days, args.seed,
+                           args.predictions, args.log_rows, args.columnar)
+        os.makedirs(os.path.dirname(args.output) or ".", exist_ok=True)
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2)
+        print(f"Results written to {args.output}", file=sys.stderr)
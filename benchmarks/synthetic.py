@@ -0,0 +1,161 @@
+#!/usr/bin/env python3
+"""
+Seeded synthetic vendor fleets for benchmarks
+Builds memory.json-shaped data for any number of vendors, with
+sales_history drawn from the same WeatherCondition / LocationType
+enums and weather impacts the agent uses, so generated memory
+exercises the same code paths as real vendors.
+
+Usage: python benchmarks/synthetic.py 10000 --days 30 --seed 42 --output /tmp/memory.json
+"""
+
+import argparse
+import datetime
+import json
+import os
+import random
+import sys
+from typing import Dict, Iterator, List, Tuple
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from agent import (HOT_WEATHER_IMPACT_ABOVE_35, LOCATION_MULTIPLIERS, WEATHER_BASE_IMPACT,
+                   LocationType, WeatherCondition, make_vendor_id)
+
+# Menus typical of each location type (taken from the sample roster and prompts)
+ITEMS_BY_LOCATION = {
+    LocationType.OFFICE_AREA: ["Chai", "Samosa", "Bread Pakora", "Biscuit", "Coffee", "Veg Thali", "Rajma Rice", "Poha"],
+    LocationType.RESIDENTIAL: ["Dosa", "Idli", "Vada", "Sambhar", "Coconut Chutney", "Pani Puri", "Bhel Puri", "Chai"],
+    LocationType.COLLEGE: ["Maggi", "Sandwich", "Cold Drink", "Chips", "Momos", "Chai", "Samosa", "Cold Coffee"],
+    LocationType.TRANSPORT_HUB: ["Chai", "Samosa", "Vada Pav", "Water Bottle", "Biscuit", "Bread Omelette", "Coffee"],
+    LocationType.MARKET: ["Chole Bhature", "Rajma Rice", "Dal Chawal", "Lassi", "Pav Bhaji", "Jalebi", "Kachori"]
+}
+
+FIRST_NAMES = ["Raman", "Sunita", "Vikram", "Priya", "Anil", "Meena", "Suresh", "Lakshmi", "Imran", "Geeta",
+               "Ravi", "Farida", "Manoj", "Kavita", "Arjun", "Rekha", "Sanjay", "Asha", "Deepak", "Nirmala"]
+STALL_NAMES = ["Chai Wala", "Tiffin Wali", "Snacks", "Dosa Corner", "Chaat Bhandar", "Bhojanalaya", "Momos Point",
+               "Juice Centre", "Sweets", "Food Stall"]
+AREAS = ["Connaught Place", "Lajpat Nagar", "DU North Campus", "BTM Layout", "Dadar Station", "Charminar",
+         "Park Street", "MG Road", "Sector 18", "Salt Lake", "Koramangala", "Andheri West", "Howrah", "Karol Bagh"]
+
+WEEKDAYS = ["Monday", "Tuesday", "Wednesday", "Thursday", "Friday", "Saturday", "Sunday"]
+MONSOON_MONTHS = (6, 7, 8, 9)
+SUMMER_MONTHS = (4, 5)
+
+
+def _day_weather(rng: random.Random, date: datetime.date) -> Tuple[WeatherCondition, int]:
+    """Weather and temperature with a rough Indian seasonal cycle"""
+    if date.month in MONSOON_MONTHS:
+        weather = rng.choices(list(WeatherCondition), weights=[2, 5, 3, 0.5])[0]
+        temperature = rng.randint(24, 34)
+    elif date.month in SUMMER_MONTHS:
+        weather = rng.choices(list(WeatherCondition), weights=[4, 0.3, 1, 5])[0]
+        temperature = rng.randint(33, 46)
+    elif date.month in (12, 1):
+        weather = rng.choices(list(WeatherCondition), weights=[5, 0.5, 3, 0])[0]
+        temperature = rng.randint(6, 24)
+    else:
+        weather = rng.choices(list(WeatherCondition), weights=[5, 1, 2, 1])[0]
+        temperature = rng.randint(20, 36)
+    return weather, temperature
+
+
+def _weather_impact(weather: WeatherCondition, temperature: int) -> float:
+    impact = WEATHER_BASE_IMPACT[weather]
+    if weather == WeatherCondition.HOT and temperature > 35:
+        impact = HOT_WEATHER_IMPACT_ABOVE_35
+    return impact
+
+
+def generate_vendor(rng: random.Random, index: int, days: int, end_date: datetime.date) -> Tuple[str, Dict]:
+    """One vendor id and memory record with `days` of sales history ending at end_date"""
+    location_type = rng.choice(list(LocationType))
+    name = f"{rng.choice(FIRST_NAMES)} {rng.choice(STALL_NAMES)} {index}"
+    location = rng.choice(AREAS)
+    items = rng.sample(ITEMS_BY_LOCATION[location_type], rng.randint(3, 6))
+    avg_daily_revenue = rng.randint(3, 30) * 50
+    peak_hours = sorted(rng.sample(range(7, 22), rng.randint(2, 5)))
+    profile = {
+        "name": name,
+        "location": location,
+        "location_type": location_type.value,
+        "items_sold": items,
+        "avg_daily_revenue": avg_daily_revenue,
+        "peak_hours": peak_hours
+    }
+
+    multipliers = LOCATION_MULTIPLIERS[location_type]
+    weekend_boost = multipliers.get("weekend_boost", 0.85)
+    festival_boost = multipliers.get("festival_boost", 1.8)
+    item_share = {item: rng.uniform(0.5, 1.5) for item in items}
+    history: List[Dict] = []
+    for offset in range(days):
+        date = end_date - datetime.timedelta(days=offset)
+        day_of_week = WEEKDAYS[date.weekday()]
+        weather, temperature = _day_weather(rng, date)
+        is_festival = rng.random() < 0.03
+        is_payday = date.day <= 3 or date.day >= 28
+        level = _weather_impact(weather, temperature) * rng.lognormvariate(0, 0.15)
+        if day_of_week in ("Saturday", "Sunday"):
+            level *= weekend_boost
+        if is_festival:
+            level *= festival_boost
+        if is_payday:
+            level *= multipliers.get("payday_boost", 1.1)
+        history.append({
+            "date": date.isoformat(),
+            "day_of_week": day_of_week,
+            "weather": weather.value,
+            "temperature": temperature,
+            "is_festival": is_festival,
+            "is_payday": is_payday,
+            "actual_revenue": round(avg_daily_revenue * level),
+            "items_sold": {item: max(int(40 * share * level), 0) for item, share in item_share.items()},
+            "peak_hours_actual": peak_hours
+        })
+
+    vendor = {
+        "profile": profile,
+        "sales_history": history,
+        "learned_patterns": {},
+        "performance_metrics": {}
+    }
+    return make_vendor_id(name, location), vendor
+
+
+def iter_fleet(vendors: int, days: int = 30, seed: int = 42,
+               end_date: datetime.date = datetime.date(2025, 6, 30)) -> Iterator[Tuple[str, Dict]]:
+    """(vendor_id, record) pairs; the same seed always yields the same fleet"""
+    rng = random.Random(seed)
+    for index in range(vendors):
+        yield generate_vendor(rng, index, days, end_date)
+
+
+def generate_memory(vendors: int, days: int = 30, seed: int = 42) -> Dict:
+    """A complete memory.json structure"""
+    return {
+        "vendors": dict(iter_fleet(vendors, days, seed)),
+        "global_patterns": {},
+        "last_updated": datetime.datetime(2025, 7, 1).isoformat()
+    }
+
+
+def write_memory(path: str, vendors: int, days: int = 30, seed: int = 42) -> int:
+    """Stream a fleet straight to a memory.json file without holding it in RAM; returns bytes written"""
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write('{"vendors": {')
+        for i, (vendor_id, record) in enumerate(iter_fleet(vendors, days, seed)):
+            f.write((", " if i else "") + json.dumps(vendor_id) + ": " + json.dumps(record, ensure_ascii=False))
+        f.write('}, "global_patterns": {}, "last_updated": "2025-07-01T00:00:00"}')
+        return f.tell()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Generate a synthetic SVDP memory file")
+    parser.add_argument("vendors", type=int)
+    parser.add_argument("--days", type=int, default=30, help="sales_history rows per vendor")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output", default="synthetic_memory.json")
+    args = parser.parse_args()
+    size = write_memory(args.output, args.vendors, args.days, args.seed)
+    print(f"Wrote {args.vendors} vendors × {args.days} days to {args.output} ({size / 1e6:.1f} MB)")
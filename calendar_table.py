@@ -0,0 +1,247 @@
+#!/usr/bin/env python3
+"""
+Precomputed calendar features for fast date lookups
+Every day of a multi-year range gets its weekday, weekend flag, national
+and per-state festival flags and payday windows, computed once with
+NumPy date arithmetic. A date is then one dict lookup (ISO string) or
+one subtraction (date) away, and a run of days is an array slice, so
+batch and horizon forecasts build DayContexts without parsing dates.
+
+Festival dates come from DEFAULT_FESTIVALS (fixed-date holidays every
+year plus dated lunar festivals) or a JSON file of the same shape. The
+default lunar dates only cover 2025 and 2026; other years warn once and
+get the fixed-date holidays alone. Dates outside the table's years are
+computed from the same rules on each lookup.
+"""
+
+import calendar
+import datetime
+import json
+import warnings
+from typing import Dict, Iterable, List, Optional, Tuple, Union
+
+import numpy as np
+
+WEEKDAYS = ["Monday", "Tuesday", "Wednesday", "Thursday", "Friday", "Saturday", "Sunday"]
+WEEKEND = (5, 6)
+PAYDAY_WEEK_DAYS = 7  # Salaries land in the first week of the month
+MONTH_END_DAYS = 3  # ...or on the last working days of the previous one
+
+# "recurring" holidays fall on the same MM-DD every year, "dated" ones
+# (lunar calendar) are listed per year. Regional entries are keyed by
+# state/UT code.
+DEFAULT_FESTIVALS = {
+    "recurring": {
+        "national": {"01-26": "Republic Day", "08-15": "Independence Day", "10-02": "Gandhi Jayanti"},
+        "regional": {
+            "TN": {"01-14": "Pongal", "01-15": "Pongal"},
+            "PB": {"04-13": "Baisakhi"},
+            "KL": {"04-14": "Vishu"},
+            "WB": {"04-15": "Poila Baishakh"},
+            "MH": {"05-01": "Maharashtra Day"},
+            "GJ": {"01-14": "Uttarayan", "05-01": "Gujarat Day"},
+            "KA": {"11-01": "Kannada Rajyotsava"}
+        }
+    },
+    "dated": {
+        "national": {
+            "2025-03-14": "Holi", "2025-03-31": "Eid ul-Fitr", "2025-10-02": "Dussehra",
+            "2025-10-20": "Diwali", "2025-10-21": "Diwali",
+            "2026-03-04": "Holi", "2026-03-20": "Eid ul-Fitr", "2026-10-20": "Dussehra",
+            "2026-11-08": "Diwali", "2026-11-09": "Diwali"
+        },
+        "regional": {
+            "MH": {"2025-08-27": "Ganesh Chaturthi", "2026-09-14": "Ganesh Chaturthi"},
+            "WB": {"2025-09-29": "Durga Puja", "2025-09-30": "Durga Puja", "2025-10-01": "Durga Puja",
+                   "2026-10-17": "Durga Puja", "2026-10-18": "Durga Puja", "2026-10-19": "Durga Puja"},
+            "KL": {"2025-09-05": "Onam", "2026-08-26": "Onam"}
+        }
+    }
+}
+
+DateLike = Union[str, datetime.date]
+
+
+def _parse_date(date: DateLike) -> datetime.date:
+    if isinstance(date, datetime.date):
+        return date
+    try:
+        return datetime.datetime.strptime(date, "%Y-%m-%d").date()
+    except (TypeError, ValueError):
+        raise KeyError(f"{date} is not a YYYY-MM-DD date")
+
+
+def _day_columns(first: np.datetime64, last: np.datetime64) -> Dict[str, np.ndarray]:
+    """Weekday, day of month, month and payday windows for every day in [first, last]"""
+    days = np.arange(first, last + np.timedelta64(1, "D"), dtype="datetime64[D]")
+    months = days.astype("datetime64[M]")
+    day_of_month = (days - months).astype(np.int64) + 1
+    days_in_month = ((months + 1).astype("datetime64[D]") - months.astype("datetime64[D]")).astype(np.int64)
+    # 1970-01-01 was a Thursday
+    weekday = ((days.astype(np.int64) + 3) % 7).astype(np.int8)
+    payday_week = day_of_month <= PAYDAY_WEEK_DAYS
+    month_end = day_of_month > days_in_month - MONTH_END_DAYS
+    return {
+        "day": days,
+        "weekday": weekday,
+        "is_weekend": np.isin(weekday, WEEKEND),
+        "day_of_month": day_of_month.astype(np.int8),
+        "month": (months.astype(np.int64) % 12 + 1).astype(np.int8),
+        "payday_week": payday_week,
+        "month_end": month_end,
+        "is_payday": payday_week | month_end
+    }
+
+
+class CalendarTable:
+    def __init__(self, start_year: int = 2020, end_year: int = 2035, festivals: Optional[Dict] = None):
+        self.start_year = start_year
+        self.end_year = end_year
+        self.festivals = festivals or DEFAULT_FESTIVALS
+        self.first = datetime.date(start_year, 1, 1)
+        self.last = datetime.date(end_year, 12, 31)
+        self._first_ordinal = self.first.toordinal()
+        self.columns = _day_columns(np.datetime64(self.first), np.datetime64(self.last))
+        self._index = {str(day): i for i, day in enumerate(self.columns["day"])}
+        self._names: Dict[Tuple[Optional[str], int], str] = {}  # (state or None for national, row)
+        self.columns["national_festival"] = self._festival_column("national")
+        self.states = sorted(set(self.festivals.get("recurring", {}).get("regional", {}))
+                             | set(self.festivals.get("dated", {}).get("regional", {})))
+        self._regional = {state: self._festival_column("regional", state) for state in self.states}
+        # Years with lunar festival dates; a lookup in any other year warns once
+        self.dated_years = {int(date[:4]) for date in self.festivals.get("dated", {}).get("national", {})}
+        self._warned_years = set()
+
+    @classmethod
+    def from_file(cls, path: str, start_year: int = 2020, end_year: int = 2035) -> "CalendarTable":
+        """Calendar with festivals from a JSON file shaped like DEFAULT_FESTIVALS"""
+        with open(path, 'r', encoding='utf-8') as f:
+            return cls(start_year, end_year, json.load(f))
+
+    def _festival_column(self, scope: str, state: Optional[str] = None) -> np.ndarray:
+        column = np.zeros(len(self._index), dtype=bool)
+        recurring = self.festivals.get("recurring", {}).get(scope, {})
+        dated = self.festivals.get("dated", {}).get(scope, {})
+        if state is not None:
+            recurring, dated = recurring.get(state, {}), dated.get(state, {})
+        entries = dict(dated)
+        for year in range(self.start_year, self.end_year + 1):
+            for month_day, name in recurring.items():
+                entries.setdefault(f"{year}-{month_day}", name)
+        for date, name in entries.items():
+            i = self._index.get(date)
+            if i is not None:
+                column[i] = True
+                self._names[(state, i)] = name
+        return column
+
+    def __len__(self) -> int:
+        return len(self._index)
+
+    # LOOKUPS
+    def row(self, date: DateLike) -> int:
+        """Row of a date in the table; KeyError outside the covered range"""
+        if isinstance(date, str):
+            i = self._index.get(date, -1)
+        else:
+            i = date.toordinal() - self._first_ordinal
+        if not 0 <= i < len(self._index):
+            raise KeyError(f"{date} is not a YYYY-MM-DD date in {self.first.isoformat()}..{self.last.isoformat()}")
+        return i
+
+    def rows(self, dates: Iterable[DateLike]) -> np.ndarray:
+        return np.fromiter((self.row(date) for date in dates), dtype=np.intp)
+
+    def span(self, start: DateLike, days: int) -> np.ndarray:
+        """Rows of `days` consecutive days from start"""
+        first = self.row(start)
+        if first + days > len(self._index):
+            raise KeyError(f"{days} days from {start} run past {self.last.isoformat()}")
+        return np.arange(first, first + days)
+
+    def festival(self, rows: Union[int, np.ndarray], state: Optional[str] = None):
+        """National festival, or one of the given state's regional festivals"""
+        national = self.columns["national_festival"][rows]
+        regional = self._regional.get(state)
+        return national if regional is None else national | regional[rows]
+
+    def festival_name(self, date: DateLike, state: Optional[str] = None) -> Optional[str]:
+        return self._name(self.row(date), state)
+
+    def _name(self, i: int, state: Optional[str]) -> Optional[str]:
+        return self._names.get((None, i)) or self._names.get((state, i))
+
+    def _check_coverage(self, year: int):
+        if self.dated_years and year not in self.dated_years and year not in self._warned_years:
+            self._warned_years.add(year)
+            warnings.warn(f"No lunar festival dates (Holi, Diwali, ...) for {year}; only fixed-date holidays are "
+                          f"flagged. Pass a festivals file to CalendarTable.from_file to add them.", stacklevel=3)
+
+    def features(self, date: DateLike, state: Optional[str] = None) -> Dict:
+        """Every calendar feature of one date; dates outside the table are computed directly"""
+        try:
+            i = self.row(date)
+        except KeyError:
+            return self._computed_features(_parse_date(date), state)
+        columns = self.columns
+        self._check_coverage(int(str(columns["day"][i])[:4]))
+        return {
+            "date": str(columns["day"][i]),
+            "day_of_week": WEEKDAYS[columns["weekday"][i]],
+            "is_weekend": bool(columns["is_weekend"][i]),
+            "is_festival": bool(self.festival(i, state)),
+            "festival_name": self._name(i, state),
+            "is_payday": bool(columns["is_payday"][i]),
+            "payday_week": bool(columns["payday_week"][i]),
+            "month_end": bool(columns["month_end"][i])
+        }
+
+    def _computed_features(self, date: datetime.date, state: Optional[str]) -> Dict:
+        """features() of a date outside the table, from the same weekday, payday and festival rules"""
+        self._check_coverage(date.year)
+        days_in_month = calendar.monthrange(date.year, date.month)[1]
+        payday_week = date.day <= PAYDAY_WEEK_DAYS
+        month_end = date.day > days_in_month - MONTH_END_DAYS
+        name = self._festival_on(date, "national", None) or (self._festival_on(date, "regional", state) if state else None)
+        return {
+            "date": date.isoformat(),
+            "day_of_week": WEEKDAYS[date.weekday()],
+            "is_weekend": date.weekday() in WEEKEND,
+            "is_festival": name is not None,
+            "festival_name": name,
+            "is_payday": payday_week or month_end,
+            "payday_week": payday_week,
+            "month_end": month_end
+        }
+
+    def _festival_on(self, date: datetime.date, scope: str, state: Optional[str]) -> Optional[str]:
+        recurring = self.festivals.get("recurring", {}).get(scope, {})
+        dated = self.festivals.get("dated", {}).get(scope, {})
+        if state is not None:
+            recurring, dated = recurring.get(state, {}), dated.get(state, {})
+        iso = date.isoformat()
+        return dated.get(iso) or recurring.get(iso[5:])
+
+    def table(self, rows: np.ndarray, state: Optional[str] = None) -> Dict[str, List]:
+        """Columns for many rows at once, as Python lists ready for DayContexts"""
+        columns = self.columns
+        return {
+            "date": columns["day"][rows].astype(str).tolist(),
+            "day_of_week": [WEEKDAYS[w] for w in columns["weekday"][rows].tolist()],
+            "is_festival": self.festival(rows, state).tolist(),
+            "is_payday": columns["is_payday"][rows].tolist()
+        }
+
+    def days(self, start: DateLike, days: int, state: Optional[str] = None) -> Dict[str, List]:
+        """table() of `days` consecutive days from start; runs leaving the table are computed day by day"""
+        try:
+            rows = self.span(start, days)
+        except KeyError:
+            first = _parse_date(start)
+            computed = [self.features(first + datetime.timedelta(days=k), state) for k in range(days)]
+            return {key: [day[key] for day in computed] for key in ("date", "day_of_week", "is_festival", "is_payday")}
+        if days:
+            years = self.columns["day"][rows[[0, -1]]].astype(str)
+            for year in range(int(years[0][:4]), int(years[1][:4]) + 1):
+                self._check_coverage(year)
+        return self.table(rows, state)
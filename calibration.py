@@ -0,0 +1,264 @@
+#!/usr/bin/env python3
+"""
+Per-vendor demand multipliers fitted from sales_history
+Every day falls in one cell of (weather, temperature band, festival,
+payday, weekend). A vendor keeps the number of days and the sum and sum
+of squares of log revenue per cell (and of log quantity per item),
+updated in O(items) per day. Those sums are sufficient statistics for a
+least squares fit of log demand on the cells' features and for the
+spread of its residuals, so a refit never rescans history.
+
+Fits are ridge regressions in log space: a vendor's coefficients are
+pulled toward the pooled fit of its location type, which is pulled
+toward the agent's hard-coded tables. Thin histories therefore start at
+the location type's factors and move toward their own as days arrive.
+Any number of targets is solved at once with one stacked
+np.linalg.solve.
+"""
+
+import math
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+from pattern_index import TEMPERATURE_BANDS, WEEKEND_DAYS, day_bucket_key
+from sales_columns import WEATHER_VALUES
+
+# Baselines (factor 1.0) are sunny weather and the mild temperature band
+BASE_WEATHER, BASE_BAND = "sunny", "mild"
+WEATHERS = [w for w in WEATHER_VALUES if w != BASE_WEATHER]
+BANDS = [b for b in TEMPERATURE_BANDS if b != BASE_BAND]
+FEATURES = ["level"] + [f"weather:{w}" for w in WEATHERS] + [f"temperature:{b}" for b in BANDS] + \
+    ["festival", "payday", "weekend"]
+
+# Ridge strength, in days of evidence the prior counts for
+VENDOR_PRIOR_DAYS = 10.0  # vendor -> location type
+LOCATION_PRIOR_DAYS = 30.0  # location type -> hard-coded tables
+
+# Residual spread (SD of log actual / fitted) assumed before any data, and how many days it counts for
+DEFAULT_LOG_SIGMA = 0.2
+SIGMA_PRIOR_DAYS = 5.0
+
+CHUNK = 50000  # Targets per stacked solve
+# Decimals the stored log sums keep: far below the noise of any fit, at under half the JSON of full floats
+SUM_DECIMALS = 4
+
+
+def _cell_features() -> np.ndarray:
+    """Feature row of every cell code"""
+    rows = []
+    for weather in WEATHER_VALUES:
+        for band in TEMPERATURE_BANDS:
+            for is_festival in (0, 1):
+                for is_payday in (0, 1):
+                    for is_weekend in (0, 1):
+                        rows.append([1.0] + [float(weather == w) for w in WEATHERS] +
+                                    [float(band == b) for b in BANDS] + [is_festival, is_payday, is_weekend])
+    return np.array(rows)
+
+
+CELL_FEATURES = _cell_features()
+# x x^T of every cell, flattened, so X'X of many targets is one matmul
+CELL_PAIRS = (CELL_FEATURES[:, :, None] * CELL_FEATURES[:, None, :]).reshape(len(CELL_FEATURES), -1)
+
+
+def cell_code(weather: str, band: str, is_festival: bool, is_payday: bool, is_weekend: bool) -> int:
+    code = WEATHER_VALUES.index(weather) * len(TEMPERATURE_BANDS) + TEMPERATURE_BANDS.index(band)
+    return ((code * 2 + bool(is_festival)) * 2 + bool(is_payday)) * 2 + bool(is_weekend)
+
+
+def day_cell(day: Dict) -> Optional[int]:
+    """Cell of a sales_history entry; None for weather outside the known conditions"""
+    weather, day_of_week, is_festival, is_payday, band = day_bucket_key(day)
+    if weather not in WEATHER_VALUES:
+        return None
+    return cell_code(weather, band, is_festival, is_payday, day_of_week in WEEKEND_DAYS)
+
+
+# SUFFICIENT STATISTICS
+def _positive(value) -> bool:
+    return type(value) in (int, float) and value > 0
+
+
+def _entry(entry: List[float]) -> List[float]:
+    """
+    [days, sum, sum of squares]; a stored [days, sum] has no spread within the cell
+    That is exact for single-day cells, which are stored that way, and
+    assumed for cells stored before squares were kept.
+    """
+    if len(entry) < 3:
+        return [entry[0], entry[1], entry[1] ** 2 / entry[0] if entry[0] else 0.0]
+    return entry
+
+
+def _add(cells: Dict, cell: int, value: float):
+    key = str(cell)
+    log_value = math.log(value)
+    if key not in cells:
+        cells[key] = [1, round(log_value, SUM_DECIMALS)]
+        return
+    entry = cells[key] = _entry(cells[key])
+    entry[0] += 1
+    entry[1] = round(entry[1] + log_value, SUM_DECIMALS)
+    entry[2] = round(entry[2] + log_value * log_value, SUM_DECIMALS)
+
+
+def update_calibration_stats(stats: Dict, day: Dict) -> Dict:
+    """Fold one sales day into per-cell [days, sum, sum of squares] of log revenue and item quantities; zeros are skipped"""
+    cell = day_cell(day)
+    if cell is None:
+        return stats
+    if _positive(day.get("actual_revenue")):
+        _add(stats.setdefault("revenue", {}), cell, day["actual_revenue"])
+    items = stats.setdefault("items", {})
+    for item, quantity in (day.get("items_sold") or {}).items():
+        if _positive(quantity):
+            _add(items.setdefault(item, {}), cell, quantity)
+    return stats
+
+
+def calibration_stats(history: Iterable[Dict]) -> Dict:
+    stats: Dict = {}
+    for day in history:
+        update_calibration_stats(stats, day)
+    return stats
+
+
+def copy_calibration_stats(stats: Dict) -> Dict:
+    """Snapshot of the cell sums (cheaper than deepcopy)"""
+    return {
+        "revenue": {code: list(entry) for code, entry in stats.get("revenue", {}).items()},
+        "items": {item: {code: list(entry) for code, entry in cells.items()} for item, cells in stats.get("items", {}).items()}
+    }
+
+
+# FITTING
+def normal_equations(targets: List[Dict], offsets: List[float]) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Stacked X'X, X'y and y'y of many targets' cell sums
+    y is log value minus the target's offset (the log of what the
+    uncalibrated model uses as its base), so the level coefficient is
+    relative to that base.
+    """
+    features = len(FEATURES)
+    offsets = np.asarray(offsets, dtype=float)
+    xtx = np.zeros((len(targets), features, features))
+    xty = np.zeros((len(targets), features))
+    yty = np.zeros(len(targets))
+    for start in range(0, len(targets), CHUNK):
+        chunk = targets[start:start + CHUNK]
+        offset = offsets[start:start + len(chunk)]
+        owners = np.repeat(np.arange(len(chunk)), [len(cells) for cells in chunk])
+        codes = np.fromiter((int(code) for cells in chunk for code in cells), dtype=np.intp, count=len(owners))
+        entries = np.array([_entry(entry) for cells in chunk for entry in cells.values()], dtype=float).reshape(-1, 3)
+        counts = np.zeros((len(chunk), len(CELL_FEATURES)))
+        log_sums = np.zeros((len(chunk), len(CELL_FEATURES)))
+        counts[owners, codes] = entries[:, 0]
+        log_sums[owners, codes] = entries[:, 1]
+        weighted = counts @ CELL_FEATURES  # X'1 per target
+        xtx[start:start + len(chunk)] = (counts @ CELL_PAIRS).reshape(len(chunk), features, features)
+        xty[start:start + len(chunk)] = log_sums @ CELL_FEATURES - offset[:, None] * weighted
+        # sum (y - offset)^2 = sum y^2 - 2 offset sum y + offset^2 n
+        squares = np.bincount(owners, weights=entries[:, 2], minlength=len(chunk))
+        yty[start:start + len(chunk)] = squares - 2 * offset * log_sums.sum(axis=1) + offset ** 2 * counts.sum(axis=1)
+    return xtx, xty, yty
+
+
+def ridge(xtx: np.ndarray, xty: np.ndarray, prior: np.ndarray, strength: float) -> np.ndarray:
+    """Coefficients minimizing |y - Xb|^2 + strength * |b - prior|^2, for every stacked target"""
+    penalty = strength * np.eye(xtx.shape[-1])
+    prior = np.broadcast_to(prior, xty.shape)
+    return np.linalg.solve(xtx + penalty, (xty + strength * prior)[..., None])[..., 0]
+
+
+def fit_priors(xtx: np.ndarray, xty: np.ndarray, groups: List[str], table_prior: np.ndarray) -> Dict[str, np.ndarray]:
+    """Coefficients per group (location type) from all its targets pooled, each shrunk toward the table"""
+    groups = np.asarray(groups)
+    return {group: ridge(xtx[groups == group].sum(axis=0), xty[groups == group].sum(axis=0), table_prior,
+                         LOCATION_PRIOR_DAYS)
+            for group in sorted(set(groups.tolist()))}
+
+
+def fit_targets(xtx: np.ndarray, xty: np.ndarray, yty: np.ndarray, groups: List[str],
+                priors: Dict[str, np.ndarray]) -> List[Optional[Dict]]:
+    """
+    Multipliers of every stacked target, each shrunk toward its group's prior; None for targets with no day
+    Each also gets `sigma`, the spread of its log residuals, shrunk toward
+    DEFAULT_LOG_SIGMA for short histories.
+    """
+    if not len(xtx):
+        return []
+    prior = np.stack([priors[group] for group in groups])
+    coefficients = ridge(xtx, xty, prior, VENDOR_PRIOR_DAYS)
+    days = xtx[:, 0, 0]
+    # |y - Xb|^2 = y'y - 2 b'X'y + b'X'Xb
+    residual = yty - 2 * np.einsum("ti,ti->t", coefficients, xty) + \
+        np.einsum("ti,tij,tj->t", coefficients, xtx, coefficients)
+    sigma = np.sqrt((np.maximum(residual, 0.0) + SIGMA_PRIOR_DAYS * DEFAULT_LOG_SIGMA ** 2) / (days + SIGMA_PRIOR_DAYS))
+    multipliers = np.round(np.exp(coefficients), 4).tolist()
+    sigma = np.round(sigma, 4).tolist()
+    return [dict(factors_from_multipliers(row, n), sigma=s) if n else None
+            for row, n, s in zip(multipliers, days.tolist(), sigma)]
+
+
+# FACTORS
+def prior_vector(weather: Dict[str, float], temperature: Dict[str, float], festival: float,
+                 payday: float, weekend: float = 1.0, level: float = 1.0) -> np.ndarray:
+    """Log-space coefficients of a table of multipliers"""
+    values = [level] + [weather.get(w, 1.0) for w in WEATHERS] + [temperature.get(b, 1.0) for b in BANDS] + \
+        [festival, payday, weekend]
+    return np.log(values)
+
+
+def factors_from_multipliers(multipliers: List[float], days: float) -> Dict:
+    """Readable factors (baselines at 1.0) from one target's exp(coefficients)"""
+    factor = dict(zip(FEATURES, multipliers))
+    return {
+        "days": int(days),
+        "level": factor["level"],
+        "weather": dict({BASE_WEATHER: 1.0}, **{w: factor[f"weather:{w}"] for w in WEATHERS}),
+        "temperature": dict({BASE_BAND: 1.0}, **{b: factor[f"temperature:{b}"] for b in BANDS}),
+        "festival": factor["festival"],
+        "payday": factor["payday"],
+        "weekend": factor["weekend"]
+    }
+
+
+def day_factor(factors: Dict, weather: str, band: str, is_festival: bool, is_payday: bool, is_weekend: bool) -> float:
+    """Fitted multiplier for one day"""
+    factor = factors["level"] * factors["weather"][weather] * factors["temperature"][band]
+    if is_festival:
+        factor *= factors["festival"]
+    if is_payday:
+        factor *= factors["payday"]
+    if is_weekend:
+        factor *= factors["weekend"]
+    return factor
+
+
+def day_factor_array(factors: Dict, weather_codes: np.ndarray, band_codes: np.ndarray, is_festival: np.ndarray,
+                     is_payday: np.ndarray, is_weekend: np.ndarray) -> np.ndarray:
+    """day_factor for many days; the same multiplications in the same order, so results match exactly"""
+    weather = np.array([factors["weather"][w] for w in WEATHER_VALUES])
+    temperature = np.array([factors["temperature"][b] for b in TEMPERATURE_BANDS])
+    factor = factors["level"] * weather[weather_codes] * temperature[band_codes]
+    factor = factor * np.where(is_festival, factors["festival"], 1.0)
+    factor = factor * np.where(is_payday, factors["payday"], 1.0)
+    return factor * np.where(is_weekend, factors["weekend"], 1.0)
+
+
+
+if __name__ == "__main__":
+    import argparse
+
+    from agent import SVDPAgent
+
+    parser = argparse.ArgumentParser(description="Refit calibrated demand multipliers for every vendor")
+    parser.add_argument("--memory", default="memory.json", help="memory file, .db or shard directory")
+    args = parser.parse_args()
+
+    agent = SVDPAgent(memory_file=args.memory)
+    summary = agent.calibrate()
+    agent.close()
+    print(f"Calibrated {summary['calibrated']} of {summary['vendors']} vendors "
+          f"(fit {summary['fit_seconds']}s, {summary['seconds']}s with saving)")
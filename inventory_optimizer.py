@@ -0,0 +1,100 @@
+#!/usr/bin/env python3
+"""
+Cash-constrained newsvendor plans across a vendor's menu
+Each item's demand is lognormal around its point forecast with the
+item's residual spread. Stocking q units earns
+    price * E[min(D, q)] + salvage * E[(q - D)+] - cost * q
+where salvage is what an unsold unit is still worth: nothing for
+same-day food, most of its cost for packaged goods that keep.
+
+Without a budget every item stocks its critical fractile
+(price - cost) / (price - salvage). With one, each rupee spent is
+charged an extra λ (Lagrangian relaxation), which moves cash to the
+items earning most per rupee; λ is bisected until the day's spend fits
+the budget. Every vendor-day of a batch is bisected at once, so a whole
+market is one set of array operations.
+"""
+
+import math
+from typing import Tuple
+
+import numpy as np
+
+BISECTION_STEPS = 40
+# Standard normal CDF on a grid; lookups interpolate (NumPy has no erf)
+_Z = np.linspace(-6.0, 6.0, 2401)
+_CDF = 0.5 * (1.0 + np.array([math.erf(z / math.sqrt(2.0)) for z in _Z]))
+
+
+def normal_cdf(z: np.ndarray) -> np.ndarray:
+    return np.interp(z, _Z, _CDF)
+
+
+def normal_ppf(u: np.ndarray) -> np.ndarray:
+    return np.interp(u, _CDF, _Z)
+
+
+def salvage_values(cost: np.ndarray, shelf_life_days: np.ndarray) -> np.ndarray:
+    """Worth of an unsold unit: a unit that keeps L days loses 1/L of its cost per day"""
+    return cost * (1.0 - 1.0 / np.maximum(shelf_life_days, 1.0))
+
+
+def order_quantities(median: np.ndarray, sigma: np.ndarray, cost: np.ndarray, price: np.ndarray,
+                     salvage: np.ndarray, shadow_price: np.ndarray) -> np.ndarray:
+    """Units per item (rows) and day (columns) at the fractile left after charging shadow_price per rupee"""
+    fractile = (price[:, None] - cost[:, None] * (1.0 + shadow_price)) / (price - salvage)[:, None]
+    z = normal_ppf(np.minimum(fractile, _CDF[-1]))
+    return np.where(fractile > 0, median * np.exp(sigma[:, None] * z), 0.0)
+
+
+def expected_margin(quantity: np.ndarray, median: np.ndarray, sigma: np.ndarray, cost: np.ndarray,
+                    price: np.ndarray, salvage: np.ndarray) -> np.ndarray:
+    """Expected rupee margin of stocking `quantity` of every item and day"""
+    sigma = sigma[:, None]
+    stocked = (quantity > 0) & (median > 0)
+    ratio = np.log(np.where(stocked, quantity, 1.0) / np.where(stocked, median, 1.0))
+    # E[min(D, q)] of a lognormal with the given median and log spread
+    sold = median * np.exp(sigma * sigma / 2) * normal_cdf((ratio - sigma * sigma) / sigma) + \
+        quantity * (1.0 - normal_cdf(ratio / sigma))
+    sold = np.where(stocked, sold, 0.0)
+    return price[:, None] * sold + salvage[:, None] * (quantity - sold) - cost[:, None] * quantity
+
+
+def plan_inventory(median: np.ndarray, sigma: np.ndarray, cost: np.ndarray, price: np.ndarray, salvage: np.ndarray,
+                   owner: np.ndarray, budget: np.ndarray) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Whole units per item and day, maximizing each owner's expected margin within its daily budget
+    median is items × days; sigma, cost, price, salvage and owner (row of
+    budget) are per item; budget is per owner, inf when unconstrained.
+    Returns (quantities, expected margin per owner and day, whether the
+    budget limited each owner-day).
+    """
+    days = median.shape[1]
+    budget = np.broadcast_to(np.asarray(budget, dtype=float)[:, None], (len(budget), days))
+
+    def spend(shadow_price: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        quantity = order_quantities(median, sigma, cost, price, salvage, shadow_price[owner])
+        total = np.zeros(budget.shape)
+        # Summed item by item in row order, so an owner's total never depends on the other owners
+        np.add.at(total, owner, cost[:, None] * quantity)
+        return quantity, total
+
+    free = np.zeros(budget.shape)
+    quantity, total = spend(free)
+    limited = total > budget
+    if limited.any():
+        # Spend is zero once every item's margin is gone: price = cost * (1 + λ)
+        low = free
+        high = np.zeros(len(budget))
+        np.maximum.at(high, owner, price / cost - 1.0)
+        high = np.where(limited, high[:, None], 0.0)
+        for _ in range(BISECTION_STEPS):
+            middle = (low + high) / 2
+            over = spend(middle)[1] > budget
+            low = np.where(limited & over, middle, low)
+            high = np.where(limited & ~over, middle, high)
+        quantity = spend(high)[0]
+    quantity = np.floor(quantity)
+    margin = np.zeros(budget.shape)
+    np.add.at(margin, owner, expected_margin(quantity, median, sigma, cost, price, salvage))
+    return quantity.astype(int), margin, limited
@@ -0,0 +1,189 @@
+#!/usr/bin/env python3
+"""
+Item taxonomy for street-food menus
+Keyword rules assign each menu item a category, a meal slot, a heat
+sensitivity, a shelf life, unit economics (cost and price, by category)
+and the location demand factors that apply to it. All
+keywords are compiled into one Aho-Corasick automaton, so an item name
+is classified in a single pass over its characters, and every distinct
+name is classified only once.
+
+Keywords match anywhere in the lowercased name ("rice" matches "Rajma
+Rice"), which is what the agent's original keyword checks did.
+"""
+
+import json
+from collections import deque
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Set, Tuple
+
+# Ordered rules: within an attribute the first matching value wins
+DEFAULT_TAXONOMY = {
+    "category": [
+        ["main", ["rice", "roti", "dal", "curry"]],
+        ["snacks", ["samosa", "pakora", "vada", "bhel"]],
+        ["beverages", ["chai", "coffee", "lassi", "juice"]]
+    ],
+    "category_default": "snacks",
+    "meal_slot": [
+        ["breakfast", ["idli", "dosa", "poha", "upma", "paratha", "omelette"]],
+        ["lunch", ["rice", "thali", "roti", "dal", "curry", "chole", "rajma", "biryani"]],
+        ["evening", ["samosa", "pakora", "bhel", "puri", "chaat", "momos", "vada", "maggi", "chips"]]
+    ],
+    "meal_slot_default": "all_day",
+    # "cold" items sell more as it gets hotter, "hot" items sell less
+    "heat_sensitivity": [
+        ["cold", ["lassi", "juice", "kulfi", "ice cream", "iced", "gola", "cold", "lime", "sugarcane", "shake", "water"]],
+        ["hot", ["chai", "coffee", "soup", "pakora", "samosa", "maggi", "bhature"]]
+    ],
+    "heat_sensitivity_default": "neutral",
+    # Location factors (LOCATION_MULTIPLIERS keys) that scale an item's base demand, applied in this order
+    "demand_factors": [
+        ["lunch_demand", ["rice"]],
+        ["evening_snacks", ["samosa", "pakora", "chai"]]
+    ],
+    # Days an unsold unit stays sellable; cooked food goes the same day
+    "shelf_life_days": [
+        [30, ["chips", "biscuit", "cold drink", "water", "namkeen"]]
+    ],
+    "shelf_life_days_default": 1,
+    # [₹ cost, ₹ price] of one unit per category
+    "unit_economics": {"main": [30, 60], "snacks": [7, 15], "beverages": [5, 12]},
+    "unit_economics_default": [10, 20]
+}
+
+ATTRIBUTES = ("category", "meal_slot", "heat_sensitivity", "shelf_life_days")
+
+
+@dataclass(frozen=True)
+class ItemProfile:
+    name: str
+    category: str
+    meal_slot: str
+    heat_sensitivity: str
+    demand_factors: Tuple[str, ...]
+    shelf_life_days: int
+    unit_cost: float
+    unit_price: float
+
+
+class KeywordMatcher:
+    """Aho-Corasick automaton over characters: every keyword contained in a text, in one pass"""
+
+    def __init__(self, keywords):
+        self._goto: List[Dict[str, int]] = [{}]
+        self._fail: List[int] = [0]
+        self._output: List[Set[str]] = [set()]
+        for keyword in keywords:
+            self._add(keyword)
+        self._link()
+
+    def _add(self, keyword: str):
+        state = 0
+        for char in keyword:
+            next_state = self._goto[state].get(char)
+            if next_state is None:
+                next_state = len(self._goto)
+                self._goto[state][char] = next_state
+                self._goto.append({})
+                self._fail.append(0)
+                self._output.append(set())
+            state = next_state
+        self._output[state].add(keyword)
+
+    def _link(self):
+        queue = deque(self._goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for char, next_state in self._goto[state].items():
+                queue.append(next_state)
+                fallback = self._fail[state]
+                while fallback and char not in self._goto[fallback]:
+                    fallback = self._fail[fallback]
+                self._fail[next_state] = self._goto[fallback].get(char, 0)
+                self._output[next_state] |= self._output[self._fail[next_state]]
+
+    def find(self, text: str) -> Set[str]:
+        found: Set[str] = set()
+        state = 0
+        goto, fail, output = self._goto, self._fail, self._output
+        for char in text:
+            while state and char not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(char, 0)
+            if output[state]:
+                found |= output[state]
+        return found
+
+
+def _check_economics(rules: Dict):
+    """
+    ValueError unless every unit cost is positive and no price is below its cost
+    The inventory optimizer divides by cost and by price - salvage
+    (salvage is under cost), so these keep its fractiles finite.
+    """
+    entries = dict(rules.get("unit_economics", {}), **{"(default)": rules.get("unit_economics_default", [10, 20])})
+    for category, economics in entries.items():
+        try:
+            cost, price = (float(value) for value in economics)
+        except (TypeError, ValueError):
+            raise ValueError(f"unit_economics for {category!r} must be [cost, price], not {economics!r}")
+        if not 0 < cost <= price < float("inf"):
+            raise ValueError(f"unit_economics for {category!r} need 0 < cost <= price, got cost {cost:g}, price {price:g}")
+    shelf_lives = [value for value, _ in rules.get("shelf_life_days", [])] + [rules.get("shelf_life_days_default", 1)]
+    for days in shelf_lives:
+        if not isinstance(days, int) or isinstance(days, bool) or days < 1:
+            raise ValueError(f"shelf_life_days must be whole days >= 1, got {days!r}")
+
+
+class ItemTaxonomy:
+    def __init__(self, rules: Optional[Dict] = None):
+        self.rules = rules or DEFAULT_TAXONOMY
+        _check_economics(self.rules)
+        keywords = set()
+        for attribute in ATTRIBUTES + ("demand_factors",):
+            for _, words in self.rules.get(attribute, []):
+                keywords.update(word.lower() for word in words)
+        self.matcher = KeywordMatcher(sorted(keywords))
+        self._profiles: Dict[str, ItemProfile] = {}
+
+    @classmethod
+    def from_file(cls, path: str) -> "ItemTaxonomy":
+        """Taxonomy from a JSON file shaped like DEFAULT_TAXONOMY; missing attributes use the defaults"""
+        with open(path, 'r', encoding='utf-8') as f:
+            return cls(dict(DEFAULT_TAXONOMY, **json.load(f)))
+
+    def _first_match(self, attribute: str, found: Set[str]) -> str:
+        for value, words in self.rules.get(attribute, []):
+            if any(word.lower() in found for word in words):
+                return value
+        return self.rules.get(f"{attribute}_default", "")
+
+    def classify(self, item: str) -> ItemProfile:
+        """Profile of a menu item; computed on first sight, then a dict lookup"""
+        profile = self._profiles.get(item)
+        if profile is None:
+            found = self.matcher.find(item.lower())
+            category = self._first_match("category", found)
+            unit_cost, unit_price = self.rules.get("unit_economics", {}).get(
+                category, self.rules.get("unit_economics_default", [10, 20]))
+            profile = ItemProfile(
+                name=item,
+                category=category,
+                meal_slot=self._first_match("meal_slot", found),
+                heat_sensitivity=self._first_match("heat_sensitivity", found),
+                demand_factors=tuple(factor for factor, words in self.rules.get("demand_factors", [])
+                                     if any(word.lower() in found for word in words)),
+                shelf_life_days=int(self._first_match("shelf_life_days", found) or 1),
+                unit_cost=float(unit_cost),
+                unit_price=float(unit_price)
+            )
+            self._profiles[item] = profile
+        return profile
+
+    def categorize(self, items: List[str]) -> Dict[str, List[str]]:
+        """Items grouped by category, every category of the rules present"""
+        categories = {value: [] for value, _ in self.rules.get("category", [])}
+        for item in items:
+            categories.setdefault(self.classify(item).category, []).append(item)
+        return categories
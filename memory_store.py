@@ -0,0 +1,1017 @@
+#!/usr/bin/env python3
+"""
+Persistent memory stores for the SVDP agent
+JSONMemoryStore (default) keeps memory.json as a snapshot plus an
+append-only journal, so a save costs O(change) instead of rewriting the
+whole vendor tree. SQLiteMemoryStore keeps profiles, sales_history and
+learned_patterns in indexed tables so history never has to sit in RAM.
+ShardedMemoryStore loads a small vendor index at startup and pulls each
+vendor's history file in on demand under an LRU budget.
+SynchronizedStore and BackgroundWriter make any of them safe to share
+between request threads with persistence off the request path.
+"""
+
+import json
+import bisect
+import datetime
+import os
+import sqlite3
+import sys
+import threading
+from collections import OrderedDict
+from enum import Enum
+from typing import Dict, Iterable, List, Optional, Tuple
+from urllib.parse import quote
+
+from sales_columns import SalesColumns
+
+
+_JSON_SCALARS = (str, int, float, bool, type(None))
+
+
+def to_jsonable(obj):
+    """Convert enums and columnar history (and containers holding them) into plain JSON values"""
+    if type(obj) in _JSON_SCALARS:
+        return obj
+    if isinstance(obj, Enum):
+        return obj.value
+    if isinstance(obj, dict):
+        return {k: to_jsonable(v) for k, v in obj.items()}
+    if isinstance(obj, (list, tuple)):
+        return [to_jsonable(i) for i in obj]
+    if isinstance(obj, SalesColumns):
+        return obj.to_records()
+    return obj
+
+
+def _json_default(obj):
+    """json.dumps hook for in-memory forms that have a plain JSON equivalent"""
+    if isinstance(obj, SalesColumns):
+        return obj.to_records()
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+
+def empty_memory() -> Dict:
+    return {"vendors": {}, "patterns": {}, "last_updated": ""}
+
+
+def empty_vendor(profile: Dict) -> Dict:
+    return {"profile": profile, "sales_history": [], "learned_patterns": {}, "performance_metrics": {}}
+
+
+def empty_rollups() -> Dict:
+    """Roll-ups of days compacted out of sales_history (retention.py); every rolled-up day is dated before `through`"""
+    return {"days": 0, "through": "", "periods": [], "buckets": []}
+
+
+def _retained(history: List[Dict], cutoff: str) -> List[Dict]:
+    """Days a compaction at `cutoff` keeps raw; undated days are never rolled up"""
+    return [day for day in history if not day.get("date") or day["date"] >= cutoff]
+
+
+class MemoryStore:
+    """
+    Interface shared by all memory backends
+    Vendor records look like the entries of memory.json["vendors"]; stores
+    that keep history out of RAM may omit "sales_history" from get_vendor(),
+    so callers should go through history_length()/get_history() instead.
+
+    Every change to a vendor's profile, sales history or learned patterns
+    bumps that vendor's in-process version, which caches key on.
+    """
+
+    def __init__(self):
+        self._versions: Dict[str, int] = {}
+
+    def vendor_version(self, vendor_id: str) -> int:
+        """Counter bumped on every prediction-relevant change to the vendor"""
+        return self._versions.get(vendor_id, 0)
+
+    def _bump(self, vendor_id: str):
+        self._versions[vendor_id] = self._versions.get(vendor_id, 0) + 1
+
+    def load(self) -> Dict:
+        """Open the store; returns the fleet-level memory (patterns, last_updated)"""
+        raise NotImplementedError
+
+    def has_vendor(self, vendor_id: str) -> bool:
+        raise NotImplementedError
+
+    def get_vendor(self, vendor_id: str) -> Optional[Dict]:
+        raise NotImplementedError
+
+    def list_profiles(self) -> Dict[str, Dict]:
+        """Vendor id -> profile, for vendor menus"""
+        raise NotImplementedError
+
+    def history_length(self, vendor_id: str) -> int:
+        raise NotImplementedError
+
+    def get_history(self, vendor_id: str) -> List[Dict]:
+        raise NotImplementedError
+
+    def find_history(self, vendor_id: str, weather: Optional[str] = None, day_of_week: Optional[str] = None) -> List[Dict]:
+        """Past days of a vendor matching the given weather and/or weekday"""
+        raise NotImplementedError
+
+    def get_rollups(self, vendor_id: str) -> Dict:
+        """Per-bucket aggregates of the days compact_history() removed from sales_history"""
+        raise NotImplementedError
+
+    def rollup_days(self, vendor_id: str) -> int:
+        """Days held in roll-ups; history_length() + rollup_days() is every day observed"""
+        return self.get_rollups(vendor_id)["days"]
+
+    def get_columns(self, vendor_id: str) -> SalesColumns:
+        """A vendor's sales_history in columnar form, for vectorized aggregates"""
+        return SalesColumns.from_records(self.get_history(vendor_id))
+
+    def put_vendor(self, vendor_id: str, vendor_record: Dict) -> Dict:
+        raise NotImplementedError
+
+    def upsert_profile(self, vendor_id: str, profile: Dict) -> Dict:
+        """Create a vendor or replace only its profile, keeping history and patterns"""
+        raise NotImplementedError
+
+    def upsert_profiles(self, profiles: Iterable[Tuple[str, Dict]]) -> int:
+        """Bulk upsert_profile(); changes become durable on the next flush()"""
+        count = 0
+        for vendor_id, profile in profiles:
+            self.upsert_profile(vendor_id, profile)
+            count += 1
+        return count
+
+    def append_sale(self, vendor_id: str, sale_record: Dict) -> Dict:
+        raise NotImplementedError
+
+    def compact_history(self, vendor_id: str, cutoff: str, rollups: Dict) -> Dict:
+        """Drop the raw days dated before cutoff and store the roll-ups that now cover them"""
+        raise NotImplementedError
+
+    def set_patterns(self, vendor_id: str, learned_patterns: Dict) -> Dict:
+        raise NotImplementedError
+
+    def set_metrics(self, vendor_id: str, performance_metrics: Dict) -> Dict:
+        raise NotImplementedError
+
+    def set_global_patterns(self, patterns: Dict) -> Dict:
+        raise NotImplementedError
+
+    def flush(self) -> int:
+        """Persist pending changes; returns bytes written where known"""
+        raise NotImplementedError
+
+    def close(self):
+        self.flush()
+
+
+class JSONMemoryStore(MemoryStore):
+    """
+    Snapshot + write-ahead journal over memory.json
+
+    Each change is appended to `<memory_file>.journal` as one JSON line
+    carrying a sequence number. Once the journal holds `compact_every`
+    records the snapshot is rewritten atomically and the journal truncated.
+    Loading replays the snapshot plus any journal records newer than the
+    snapshot's `journal_seq`, so a crash between the two steps of a
+    compaction never applies a change twice.
+
+    With columnar_history=True each vendor's sales_history is held in RAM
+    as a SalesColumns instead of a list of dicts (roughly 10x smaller);
+    the files on disk are the same either way.
+    """
+
+    def __init__(self, memory_file: str, compact_every: int = 1000, fsync: bool = False,
+                 columnar_history: bool = False):
+        super().__init__()
+        self.columnar_history = columnar_history
+        self.memory_file = memory_file
+        self.journal_file = memory_file + ".journal"
+        self.compact_every = compact_every
+        self.fsync = fsync
+        self.data = empty_memory()
+        self._seq = 0
+        self._journal_records = 0
+        self._pending: List[str] = []
+
+    # LOADING
+    def load(self) -> Dict:
+        """Load the snapshot and replay the journal on top of it"""
+        data = empty_memory()
+        if os.path.exists(self.memory_file):
+            with open(self.memory_file, 'r', encoding='utf-8') as f:
+                # Columnar: convert each vendor as soon as it is parsed, so the whole fleet's day dicts never coexist
+                data = json.load(f, object_hook=self._columns_hook if self.columnar_history else None)
+        self._seq = data.pop("journal_seq", 0)
+        self.data = data
+        self._journal_records = self._replay_journal()
+        self._pending = []
+        return self.data
+
+    def _replay_journal(self) -> int:
+        if not os.path.exists(self.journal_file):
+            return 0
+        replayed = 0
+        with open(self.journal_file, 'r', encoding='utf-8') as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except json.JSONDecodeError:
+                    break  # Torn write at the tail - everything after it is lost anyway
+                replayed += 1
+                if record["seq"] <= self._seq:
+                    continue
+                self._apply(record)
+                self._seq = record["seq"]
+        return replayed
+
+    def _apply(self, record: Dict):
+        op, vendor_id, value = record["op"], record.get("vendor_id"), record.get("data")
+        vendors = self.data["vendors"]
+        if op == "vendor":
+            vendors[vendor_id] = self._to_columns(value) if self.columnar_history else value
+        elif op == "profile":
+            vendors[vendor_id]["profile"] = value
+        elif op == "sale":
+            vendors[vendor_id]["sales_history"].append(value)
+        elif op == "compact":
+            vendor = vendors[vendor_id]
+            history = vendor["sales_history"]
+            if isinstance(history, SalesColumns):
+                vendor["sales_history"] = SalesColumns.from_records(_retained(history.to_records(), value["cutoff"]))
+            else:
+                vendor["sales_history"] = _retained(history, value["cutoff"])
+            vendor["sales_rollups"] = value["rollups"]
+        elif op == "patterns":
+            vendors[vendor_id]["learned_patterns"] = value
+        elif op == "metrics":
+            vendors[vendor_id]["performance_metrics"] = value
+        elif op == "global_patterns":
+            self.data["patterns"] = value
+        else:
+            raise ValueError(f"Unknown journal operation: {op}")
+
+    @classmethod
+    def _columns_hook(cls, obj: Dict) -> Dict:
+        return cls._to_columns(obj) if isinstance(obj.get("sales_history"), list) else obj
+
+    @staticmethod
+    def _to_columns(vendor_record: Dict) -> Dict:
+        history = vendor_record.get("sales_history", [])
+        if not isinstance(history, SalesColumns):
+            vendor_record["sales_history"] = SalesColumns.from_records(history)
+        return vendor_record
+
+    # QUERIES
+    def has_vendor(self, vendor_id: str) -> bool:
+        return vendor_id in self.data["vendors"]
+
+    def get_vendor(self, vendor_id: str) -> Optional[Dict]:
+        return self.data["vendors"].get(vendor_id)
+
+    def list_profiles(self) -> Dict[str, Dict]:
+        return {vendor_id: record["profile"] for vendor_id, record in self.data["vendors"].items()}
+
+    def history_length(self, vendor_id: str) -> int:
+        return len(self.data["vendors"].get(vendor_id, {}).get("sales_history", []))
+
+    def get_history(self, vendor_id: str) -> List[Dict]:
+        history = self.data["vendors"].get(vendor_id, {}).get("sales_history", [])
+        return history.to_records() if isinstance(history, SalesColumns) else history
+
+    def get_columns(self, vendor_id: str) -> SalesColumns:
+        history = self.data["vendors"].get(vendor_id, {}).get("sales_history", [])
+        return history if isinstance(history, SalesColumns) else SalesColumns.from_records(history)
+
+    def find_history(self, vendor_id: str, weather: Optional[str] = None, day_of_week: Optional[str] = None) -> List[Dict]:
+        history = self.data["vendors"].get(vendor_id, {}).get("sales_history", [])
+        if isinstance(history, SalesColumns):
+            return history.to_records(history.mask(weather, day_of_week))
+        return [
+            day for day in self.get_history(vendor_id)
+            if (weather is None or day.get("weather") == weather)
+            and (day_of_week is None or day.get("day_of_week") == day_of_week)
+        ]
+
+    def get_rollups(self, vendor_id: str) -> Dict:
+        return self.data["vendors"].get(vendor_id, {}).get("sales_rollups") or empty_rollups()
+
+    # CHANGES
+    def _record(self, op: str, vendor_id: Optional[str], value) -> Dict:
+        self._seq += 1
+        record = {"seq": self._seq, "op": op, "vendor_id": vendor_id, "data": value}
+        # Serialize now: the live value may be mutated again before the next flush
+        self._pending.append(json.dumps(record, ensure_ascii=False) + "\n")
+        self._apply(record)
+        return value
+
+    def put_vendor(self, vendor_id: str, vendor_record: Dict) -> Dict:
+        """Create or replace a vendor's full memory record"""
+        self._bump(vendor_id)
+        return self._record("vendor", vendor_id, to_jsonable(vendor_record))
+
+    def upsert_profile(self, vendor_id: str, profile: Dict) -> Dict:
+        if vendor_id not in self.data["vendors"]:
+            return self.put_vendor(vendor_id, empty_vendor(profile))["profile"]
+        self._bump(vendor_id)
+        return self._record("profile", vendor_id, to_jsonable(profile))
+
+    def append_sale(self, vendor_id: str, sale_record: Dict) -> Dict:
+        """Append one day to a vendor's sales_history"""
+        self._bump(vendor_id)
+        return self._record("sale", vendor_id, to_jsonable(sale_record))
+
+    def compact_history(self, vendor_id: str, cutoff: str, rollups: Dict) -> Dict:
+        self._bump(vendor_id)
+        return self._record("compact", vendor_id, {"cutoff": cutoff, "rollups": to_jsonable(rollups)})["rollups"]
+
+    def set_patterns(self, vendor_id: str, learned_patterns: Dict) -> Dict:
+        """Replace a vendor's learned_patterns"""
+        self._bump(vendor_id)
+        return self._record("patterns", vendor_id, to_jsonable(learned_patterns))
+
+    def set_metrics(self, vendor_id: str, performance_metrics: Dict) -> Dict:
+        """Replace a vendor's performance_metrics"""
+        return self._record("metrics", vendor_id, to_jsonable(performance_metrics))
+
+    def set_global_patterns(self, patterns: Dict) -> Dict:
+        """Replace the fleet-wide patterns block"""
+        return self._record("global_patterns", None, to_jsonable(patterns))
+
+    # PERSISTENCE
+    def flush(self) -> int:
+        """Append pending changes to the journal; compact when it grows too long"""
+        self.data["last_updated"] = datetime.datetime.now().isoformat()
+        written = 0
+        if self._pending:
+            lines = "".join(self._pending)
+            with open(self.journal_file, 'a', encoding='utf-8') as f:
+                f.write(lines)
+                f.flush()
+                if self.fsync:
+                    os.fsync(f.fileno())
+            written = len(lines.encode('utf-8'))
+            self._journal_records += len(self._pending)
+            self._pending = []
+        if self._journal_records >= self.compact_every:
+            written += self.compact()
+        return written
+
+    def compact(self) -> int:
+        """Rewrite the snapshot with everything applied and truncate the journal"""
+        self.data["last_updated"] = datetime.datetime.now().isoformat()
+        snapshot = dict(self.data, journal_seq=self._seq)
+        content = json.dumps(snapshot, indent=2, ensure_ascii=False, default=_json_default)
+        tmp_file = self.memory_file + ".tmp"
+        with open(tmp_file, 'w', encoding='utf-8') as f:
+            f.write(content)
+            f.flush()
+            if self.fsync:
+                os.fsync(f.fileno())
+        os.replace(tmp_file, self.memory_file)
+        # Records now folded into the snapshot are skipped on replay, so a
+        # crash before this truncate is harmless
+        if os.path.exists(self.journal_file):
+            open(self.journal_file, 'w').close()
+        self._journal_records = 0
+        return len(content.encode('utf-8'))
+
+    def close(self):
+        """Flush pending changes and fold the journal into the snapshot"""
+        self.flush()
+        if self._journal_records:
+            self.compact()
+
+
+class SQLiteMemoryStore(MemoryStore):
+    """
+    Memory in an SQLite database
+    sales_history is indexed on (vendor_id, date) and
+    (vendor_id, weather, day_of_week) so confidence and pattern lookups are
+    index scans; compacted days live on as one roll-up row per vendor.
+    Writes accumulate in one transaction committed by flush().
+    """
+
+    SCHEMA = """
+    CREATE TABLE IF NOT EXISTS profiles (
+        vendor_id TEXT PRIMARY KEY,
+        name TEXT,
+        location TEXT,
+        location_type TEXT,
+        profile TEXT NOT NULL,
+        performance_metrics TEXT NOT NULL DEFAULT '{}'
+    );
+    CREATE TABLE IF NOT EXISTS sales_history (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        vendor_id TEXT NOT NULL REFERENCES profiles(vendor_id),
+        date TEXT,
+        day_of_week TEXT,
+        weather TEXT,
+        temperature REAL,
+        actual_revenue REAL,
+        record TEXT NOT NULL
+    );
+    CREATE INDEX IF NOT EXISTS idx_sales_vendor_date
+        ON sales_history (vendor_id, date);
+    CREATE INDEX IF NOT EXISTS idx_sales_vendor_weather_day
+        ON sales_history (vendor_id, weather, day_of_week);
+    CREATE TABLE IF NOT EXISTS sales_rollups (
+        vendor_id TEXT PRIMARY KEY REFERENCES profiles(vendor_id),
+        days INTEGER NOT NULL,
+        rollups TEXT NOT NULL
+    );
+    CREATE TABLE IF NOT EXISTS learned_patterns (
+        vendor_id TEXT NOT NULL REFERENCES profiles(vendor_id),
+        pattern TEXT NOT NULL,
+        value TEXT NOT NULL,
+        PRIMARY KEY (vendor_id, pattern)
+    );
+    CREATE TABLE IF NOT EXISTS meta (
+        key TEXT PRIMARY KEY,
+        value TEXT
+    );
+    """
+
+    def __init__(self, db_file: str):
+        super().__init__()
+        self.db_file = db_file
+        self.conn: Optional[sqlite3.Connection] = None
+
+    def load(self) -> Dict:
+        if self.conn is None:
+            # Shared across request threads; SynchronizedStore serializes access
+            self.conn = sqlite3.connect(self.db_file, check_same_thread=False)
+            self.conn.executescript(self.SCHEMA)
+            self.conn.commit()
+        meta = dict(self.conn.execute("SELECT key, value FROM meta"))
+        return {
+            "patterns": json.loads(meta.get("patterns", "{}")),
+            "last_updated": meta.get("last_updated", "")
+        }
+
+    # QUERIES
+    def has_vendor(self, vendor_id: str) -> bool:
+        row = self.conn.execute("SELECT 1 FROM profiles WHERE vendor_id = ?", (vendor_id,)).fetchone()
+        return row is not None
+
+    def get_vendor(self, vendor_id: str) -> Optional[Dict]:
+        row = self.conn.execute(
+            "SELECT profile, performance_metrics FROM profiles WHERE vendor_id = ?", (vendor_id,)
+        ).fetchone()
+        if row is None:
+            return None
+        return {
+            "profile": json.loads(row[0]),
+            "learned_patterns": self._get_patterns(vendor_id),
+            "performance_metrics": json.loads(row[1])
+        }
+
+    def _get_patterns(self, vendor_id: str) -> Dict:
+        rows = self.conn.execute("SELECT pattern, value FROM learned_patterns WHERE vendor_id = ?", (vendor_id,))
+        return {pattern: json.loads(value) for pattern, value in rows}
+
+    def list_profiles(self) -> Dict[str, Dict]:
+        rows = self.conn.execute("SELECT vendor_id, profile FROM profiles ORDER BY rowid")
+        return {vendor_id: json.loads(profile) for vendor_id, profile in rows}
+
+    def history_length(self, vendor_id: str) -> int:
+        return self.conn.execute("SELECT COUNT(*) FROM sales_history WHERE vendor_id = ?", (vendor_id,)).fetchone()[0]
+
+    def get_history(self, vendor_id: str) -> List[Dict]:
+        rows = self.conn.execute("SELECT record FROM sales_history WHERE vendor_id = ? ORDER BY id", (vendor_id,))
+        return [json.loads(record) for record, in rows]
+
+    def find_history(self, vendor_id: str, weather: Optional[str] = None, day_of_week: Optional[str] = None) -> List[Dict]:
+        query = "SELECT record FROM sales_history WHERE vendor_id = ?"
+        params = [vendor_id]
+        if weather is not None:
+            query += " AND weather = ?"
+            params.append(weather)
+        if day_of_week is not None:
+            query += " AND day_of_week = ?"
+            params.append(day_of_week)
+        rows = self.conn.execute(query + " ORDER BY id", params)
+        return [json.loads(record) for record, in rows]
+
+    def get_rollups(self, vendor_id: str) -> Dict:
+        row = self.conn.execute("SELECT rollups FROM sales_rollups WHERE vendor_id = ?", (vendor_id,)).fetchone()
+        return json.loads(row[0]) if row else empty_rollups()
+
+    def rollup_days(self, vendor_id: str) -> int:
+        row = self.conn.execute("SELECT days FROM sales_rollups WHERE vendor_id = ?", (vendor_id,)).fetchone()
+        return row[0] if row else 0
+
+    # CHANGES
+    def put_vendor(self, vendor_id: str, vendor_record: Dict) -> Dict:
+        vendor_record = to_jsonable(vendor_record)
+        profile = vendor_record.get("profile", {})
+        self._bump(vendor_id)
+        self.conn.execute("DELETE FROM sales_history WHERE vendor_id = ?", (vendor_id,))
+        self.conn.execute(
+            "INSERT OR REPLACE INTO profiles (vendor_id, name, location, location_type, profile, performance_metrics) "
+            "VALUES (?, ?, ?, ?, ?, ?)",
+            (vendor_id, profile.get("name"), profile.get("location"), profile.get("location_type"),
+             json.dumps(profile, ensure_ascii=False),
+             json.dumps(vendor_record.get("performance_metrics", {}), ensure_ascii=False))
+        )
+        self.conn.executemany(
+            "INSERT INTO sales_history (vendor_id, date, day_of_week, weather, temperature, actual_revenue, record) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?)",
+            [self._sale_row(vendor_id, day) for day in vendor_record.get("sales_history", [])]
+        )
+        self.conn.execute("DELETE FROM sales_rollups WHERE vendor_id = ?", (vendor_id,))
+        if vendor_record.get("sales_rollups"):
+            self._put_rollups(vendor_id, vendor_record["sales_rollups"])
+        self.set_patterns(vendor_id, vendor_record.get("learned_patterns", {}))
+        return vendor_record
+
+    def upsert_profile(self, vendor_id: str, profile: Dict) -> Dict:
+        profile = to_jsonable(profile)
+        self.upsert_profiles([(vendor_id, profile)])
+        return profile
+
+    def upsert_profiles(self, profiles: Iterable[Tuple[str, Dict]]) -> int:
+        rows = []
+        for vendor_id, profile in profiles:
+            profile = to_jsonable(profile)
+            self._bump(vendor_id)
+            rows.append((vendor_id, profile.get("name"), profile.get("location"), profile.get("location_type"),
+                         json.dumps(profile, ensure_ascii=False)))
+        self.conn.executemany(
+            "INSERT INTO profiles (vendor_id, name, location, location_type, profile) VALUES (?, ?, ?, ?, ?) "
+            "ON CONFLICT (vendor_id) DO UPDATE SET name = excluded.name, location = excluded.location, "
+            "location_type = excluded.location_type, profile = excluded.profile",
+            rows
+        )
+        return len(rows)
+
+    def _sale_row(self, vendor_id: str, sale_record: Dict) -> tuple:
+        return (
+            vendor_id, sale_record.get("date"), sale_record.get("day_of_week"), sale_record.get("weather"),
+            sale_record.get("temperature"), sale_record.get("actual_revenue"),
+            json.dumps(sale_record, ensure_ascii=False)
+        )
+
+    def append_sale(self, vendor_id: str, sale_record: Dict) -> Dict:
+        sale_record = to_jsonable(sale_record)
+        self._bump(vendor_id)
+        self.conn.execute(
+            "INSERT INTO sales_history (vendor_id, date, day_of_week, weather, temperature, actual_revenue, record) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?)",
+            self._sale_row(vendor_id, sale_record)
+        )
+        return sale_record
+
+    def compact_history(self, vendor_id: str, cutoff: str, rollups: Dict) -> Dict:
+        rollups = to_jsonable(rollups)
+        self._bump(vendor_id)
+        self.conn.execute("DELETE FROM sales_history WHERE vendor_id = ? AND date != '' AND date < ?", (vendor_id, cutoff))
+        self._put_rollups(vendor_id, rollups)
+        return rollups
+
+    def _put_rollups(self, vendor_id: str, rollups: Dict):
+        self.conn.execute(
+            "INSERT OR REPLACE INTO sales_rollups (vendor_id, days, rollups) VALUES (?, ?, ?)",
+            (vendor_id, rollups["days"], json.dumps(rollups, ensure_ascii=False))
+        )
+
+    def set_patterns(self, vendor_id: str, learned_patterns: Dict) -> Dict:
+        learned_patterns = to_jsonable(learned_patterns)
+        self._bump(vendor_id)
+        self.conn.execute("DELETE FROM learned_patterns WHERE vendor_id = ?", (vendor_id,))
+        self.conn.executemany(
+            "INSERT INTO learned_patterns (vendor_id, pattern, value) VALUES (?, ?, ?)",
+            [(vendor_id, pattern, json.dumps(value, ensure_ascii=False)) for pattern, value in learned_patterns.items()]
+        )
+        return learned_patterns
+
+    def set_metrics(self, vendor_id: str, performance_metrics: Dict) -> Dict:
+        performance_metrics = to_jsonable(performance_metrics)
+        self.conn.execute(
+            "UPDATE profiles SET performance_metrics = ? WHERE vendor_id = ?",
+            (json.dumps(performance_metrics, ensure_ascii=False), vendor_id)
+        )
+        return performance_metrics
+
+    def set_global_patterns(self, patterns: Dict) -> Dict:
+        patterns = to_jsonable(patterns)
+        self.conn.execute(
+            "INSERT OR REPLACE INTO meta (key, value) VALUES ('patterns', ?)",
+            (json.dumps(patterns, ensure_ascii=False),)
+        )
+        return patterns
+
+    # PERSISTENCE
+    def flush(self) -> int:
+        self.conn.execute(
+            "INSERT OR REPLACE INTO meta (key, value) VALUES ('last_updated', ?)",
+            (datetime.datetime.now().isoformat(),)
+        )
+        self.conn.commit()
+        return 0
+
+    def close(self):
+        if self.conn is not None:
+            self.flush()
+            self.conn.close()
+            self.conn = None
+
+
+class ShardedMemoryStore(MemoryStore):
+    """
+    Memory split into an index plus one file per vendor
+
+    <directory>/index.json holds every vendor's profile, history length and
+    rolled-up day count (journaled like memory.json, the counts refreshed
+    when the vendor file is written rather than on every sale);
+    <directory>/vendors/<vendor_id>.json holds that vendor's sales_history,
+    sales_rollups, learned_patterns and performance_metrics.
+    Startup reads only the index. A vendor file is read the first time the
+    vendor is touched and evicted least-recently-used once the resident
+    history exceeds `max_resident_rows`.
+    """
+
+    def __init__(self, directory: str, max_resident_rows: int = 100000):
+        super().__init__()
+        self.directory = directory
+        self.vendors_dir = os.path.join(directory, "vendors")
+        self.max_resident_rows = max_resident_rows
+        self.index = JSONMemoryStore(os.path.join(directory, "index.json"))
+        self._resident: "OrderedDict[str, Dict]" = OrderedDict()
+        self._resident_rows = 0
+        self._dirty = set()
+
+    def load(self) -> Dict:
+        os.makedirs(self.vendors_dir, exist_ok=True)
+        self._resident.clear()
+        self._resident_rows = 0
+        self._dirty.clear()
+        return self.index.load()
+
+    def _shard_file(self, vendor_id: str) -> str:
+        return os.path.join(self.vendors_dir, quote(vendor_id, safe="") + ".json")
+
+    def _shard(self, vendor_id: str) -> Optional[Dict]:
+        """Resident vendor record, reading its file on first touch"""
+        if vendor_id in self._resident:
+            self._resident.move_to_end(vendor_id)
+            return self._resident[vendor_id]
+        entry = self.index.get_vendor(vendor_id)
+        if entry is None:
+            return None
+        shard = {"sales_history": [], "learned_patterns": {}, "performance_metrics": {}}
+        shard_file = self._shard_file(vendor_id)
+        if os.path.exists(shard_file):
+            with open(shard_file, 'r', encoding='utf-8') as f:
+                shard = json.load(f)
+        record = dict(shard, profile=entry["profile"])
+        self._admit(vendor_id, record)
+        return record
+
+    def _admit(self, vendor_id: str, record: Dict):
+        self._resident[vendor_id] = record
+        self._resident.move_to_end(vendor_id)
+        self._resident_rows += len(record["sales_history"]) + 1
+        self._evict(keep=vendor_id)
+
+    def _evict(self, keep: str):
+        while self._resident_rows > self.max_resident_rows and len(self._resident) > 1:
+            vendor_id, record = next(iter(self._resident.items()))
+            if vendor_id == keep:
+                self._resident.move_to_end(vendor_id)
+                continue
+            if vendor_id in self._dirty:
+                self._write_shard(vendor_id, record)
+            del self._resident[vendor_id]
+            self._resident_rows -= len(record["sales_history"]) + 1
+
+    def _write_shard(self, vendor_id: str, record: Dict) -> int:
+        shard = {key: value for key, value in record.items() if key != "profile"}
+        content = json.dumps(shard, ensure_ascii=False)
+        shard_file = self._shard_file(vendor_id)
+        with open(shard_file + ".tmp", 'w', encoding='utf-8') as f:
+            f.write(content)
+        os.replace(shard_file + ".tmp", shard_file)
+        # The index counts follow the shard, once per write instead of once per sale
+        self._update_index(vendor_id, record)
+        self._dirty.discard(vendor_id)
+        return len(content.encode('utf-8'))
+
+    # QUERIES
+    def has_vendor(self, vendor_id: str) -> bool:
+        return self.index.has_vendor(vendor_id)
+
+    def get_vendor(self, vendor_id: str) -> Optional[Dict]:
+        return self._shard(vendor_id)
+
+    def list_profiles(self) -> Dict[str, Dict]:
+        return self.index.list_profiles()
+
+    def history_length(self, vendor_id: str) -> int:
+        if vendor_id in self._resident:
+            return len(self._resident[vendor_id]["sales_history"])
+        entry = self.index.get_vendor(vendor_id)
+        return entry["history_length"] if entry else 0
+
+    def get_history(self, vendor_id: str) -> List[Dict]:
+        record = self._shard(vendor_id)
+        return record["sales_history"] if record else []
+
+    def get_rollups(self, vendor_id: str) -> Dict:
+        record = self._shard(vendor_id)
+        return (record or {}).get("sales_rollups") or empty_rollups()
+
+    def rollup_days(self, vendor_id: str) -> int:
+        if vendor_id in self._resident:
+            return (self._resident[vendor_id].get("sales_rollups") or empty_rollups())["days"]
+        entry = self.index.get_vendor(vendor_id)
+        return entry.get("rollup_days", 0) if entry else 0
+
+    def find_history(self, vendor_id: str, weather: Optional[str] = None, day_of_week: Optional[str] = None) -> List[Dict]:
+        return [
+            day for day in self.get_history(vendor_id)
+            if (weather is None or day.get("weather") == weather)
+            and (day_of_week is None or day.get("day_of_week") == day_of_week)
+        ]
+
+    # CHANGES
+    def _update_index(self, vendor_id: str, record: Dict):
+        self.index.put_vendor(vendor_id, {
+            "profile": record["profile"],
+            "history_length": len(record["sales_history"]),
+            "rollup_days": (record.get("sales_rollups") or empty_rollups())["days"]
+        })
+
+    def put_vendor(self, vendor_id: str, vendor_record: Dict) -> Dict:
+        record = to_jsonable(vendor_record)
+        self._bump(vendor_id)
+        record.setdefault("sales_history", [])
+        record.setdefault("learned_patterns", {})
+        record.setdefault("performance_metrics", {})
+        previous = self._resident.pop(vendor_id, None)
+        if previous is not None:
+            self._resident_rows -= len(previous["sales_history"]) + 1
+        self._update_index(vendor_id, record)
+        self._dirty.add(vendor_id)
+        self._admit(vendor_id, record)
+        return record
+
+    def upsert_profile(self, vendor_id: str, profile: Dict) -> Dict:
+        profile = to_jsonable(profile)
+        self._bump(vendor_id)
+        # The profile lives in the index, so the vendor file is not read
+        self.index.put_vendor(vendor_id, {"profile": profile, "history_length": self.history_length(vendor_id),
+                                          "rollup_days": self.rollup_days(vendor_id)})
+        if vendor_id in self._resident:
+            self._resident[vendor_id]["profile"] = profile
+        return profile
+
+    def append_sale(self, vendor_id: str, sale_record: Dict) -> Dict:
+        record = self._shard(vendor_id)
+        sale_record = to_jsonable(sale_record)
+        self._bump(vendor_id)
+        record["sales_history"].append(sale_record)
+        self._resident_rows += 1
+        self._dirty.add(vendor_id)
+        self._evict(keep=vendor_id)
+        return sale_record
+
+    def compact_history(self, vendor_id: str, cutoff: str, rollups: Dict) -> Dict:
+        record = self._shard(vendor_id)
+        self._bump(vendor_id)
+        kept = _retained(record["sales_history"], cutoff)
+        self._resident_rows -= len(record["sales_history"]) - len(kept)
+        record["sales_history"] = kept
+        record["sales_rollups"] = to_jsonable(rollups)
+        self._dirty.add(vendor_id)
+        return record["sales_rollups"]
+
+    def set_patterns(self, vendor_id: str, learned_patterns: Dict) -> Dict:
+        record = self._shard(vendor_id)
+        record["learned_patterns"] = to_jsonable(learned_patterns)
+        self._bump(vendor_id)
+        self._dirty.add(vendor_id)
+        return record["learned_patterns"]
+
+    def set_metrics(self, vendor_id: str, performance_metrics: Dict) -> Dict:
+        record = self._shard(vendor_id)
+        record["performance_metrics"] = to_jsonable(performance_metrics)
+        self._dirty.add(vendor_id)
+        return record["performance_metrics"]
+
+    def set_global_patterns(self, patterns: Dict) -> Dict:
+        return self.index.set_global_patterns(patterns)
+
+    # PERSISTENCE
+    def flush(self) -> int:
+        written = 0
+        for vendor_id in list(self._dirty):
+            written += self._write_shard(vendor_id, self._resident[vendor_id])
+        return written + self.index.flush()
+
+    def close(self):
+        self.flush()
+        self.index.close()
+
+
+class AsOfStore(MemoryStore):
+    """
+    Read-only view of another store as it stood before a date
+    Every vendor's history is cut to the days dated strictly before `as_of`
+    (None shows everything), and learned_patterns/performance_metrics (and
+    the fleet-level patterns) are hidden because they summarize the full
+    history, as are roll-ups that reach past `as_of`. Used to replay history
+    without letting a prediction see its own future; writes raise.
+    """
+
+    def __init__(self, store: MemoryStore):
+        super().__init__()
+        self.base = store
+        self.as_of: Optional[str] = None
+        self._dates: Dict[str, Tuple[List[str], List[int]]] = {}
+
+    def set_as_of(self, date: Optional[str]):
+        self.as_of = date
+
+    def _visible(self, vendor_id: str) -> List[int]:
+        """Indexes of the visible days in the base history, oldest first"""
+        dates = self._dates.get(vendor_id)
+        if dates is None:
+            history = self.base.get_history(vendor_id)
+            order = sorted(range(len(history)), key=lambda i: history[i].get("date") or "")
+            dates = self._dates[vendor_id] = ([history[i].get("date") or "" for i in order], order)
+        sorted_dates, order = dates
+        if self.as_of is None:
+            return order
+        return order[:bisect.bisect_left(sorted_dates, self.as_of)]
+
+    # QUERIES
+    def load(self) -> Dict:
+        return dict(self.base.load(), patterns={})
+
+    def has_vendor(self, vendor_id: str) -> bool:
+        return self.base.has_vendor(vendor_id)
+
+    def get_vendor(self, vendor_id: str) -> Optional[Dict]:
+        record = self.base.get_vendor(vendor_id)
+        if record is None:
+            return None
+        return {"profile": record["profile"], "learned_patterns": {}, "performance_metrics": {}}
+
+    def list_profiles(self) -> Dict[str, Dict]:
+        return self.base.list_profiles()
+
+    def history_length(self, vendor_id: str) -> int:
+        return len(self._visible(vendor_id))
+
+    def get_history(self, vendor_id: str) -> List[Dict]:
+        history = self.base.get_history(vendor_id)
+        return [history[i] for i in self._visible(vendor_id)]
+
+    def find_history(self, vendor_id: str, weather: Optional[str] = None, day_of_week: Optional[str] = None) -> List[Dict]:
+        return [
+            day for day in self.get_history(vendor_id)
+            if (weather is None or day.get("weather") == weather)
+            and (day_of_week is None or day.get("day_of_week") == day_of_week)
+        ]
+
+    def get_rollups(self, vendor_id: str) -> Dict:
+        rollups = self.base.get_rollups(vendor_id)
+        if self.as_of is None or rollups["through"] <= self.as_of:
+            return rollups
+        return empty_rollups()
+
+    # WRITES
+    def _read_only(self, *args, **kwargs):
+        raise PermissionError("AsOfStore is a read-only view")
+
+    put_vendor = upsert_profile = upsert_profiles = append_sale = compact_history = _read_only
+    set_patterns = set_metrics = set_global_patterns = _read_only
+
+    def flush(self) -> int:
+        return 0
+
+    def close(self):
+        pass
+
+
+class SynchronizedStore:
+    """
+    Thread-safe view of a MemoryStore
+    Every call into the wrapped store runs under one re-entrant lock, so
+    journal appends, SQLite statements, LRU bookkeeping and compaction
+    never interleave. Calls are short dict/row operations; the long part of
+    a prediction runs outside this lock under the agent's per-vendor locks.
+    """
+
+    def __init__(self, store: MemoryStore):
+        self.store = store
+        self.lock = threading.RLock()
+
+    def __getattr__(self, name):
+        attr = getattr(self.store, name)
+        if not callable(attr):
+            return attr
+
+        def locked(*args, **kwargs):
+            with self.lock:
+                return attr(*args, **kwargs)
+        return locked
+
+
+class BackgroundWriter(threading.Thread):
+    """
+    Coalescing flusher for a MemoryStore
+    Savers call mark_dirty() instead of flushing; the writer thread flushes
+    once `flush_interval` seconds after the first unsaved change or as soon
+    as `max_pending` changes accumulate, whichever comes first. stop()
+    performs a final flush, so it doubles as the shutdown hook.
+    """
+
+    def __init__(self, store, flush_interval: float = 1.0, max_pending: int = 500):
+        super().__init__(name="svdp-memory-writer", daemon=True)
+        self.store = store
+        self.flush_interval = flush_interval
+        self.max_pending = max_pending
+        self._dirty = 0
+        self._stopping = False
+        self._condition = threading.Condition()
+        self.flushes = 0
+        self.coalesced = 0
+        self.bytes_written = 0
+        self.last_error: Optional[Exception] = None
+
+    def mark_dirty(self):
+        with self._condition:
+            self._dirty += 1
+            if self._dirty == 1 or self._dirty >= self.max_pending:
+                self._condition.notify()
+
+    def run(self):
+        while True:
+            with self._condition:
+                while not self._dirty and not self._stopping:
+                    self._condition.wait()
+                # First unsaved change: give later ones flush_interval to pile up
+                self._condition.wait_for(lambda: self._stopping or self._dirty >= self.max_pending,
+                                         timeout=self.flush_interval)
+                pending, self._dirty = self._dirty, 0
+                stopping = self._stopping
+            if pending:
+                self._flush(pending)
+            if stopping:
+                return
+
+    def _flush(self, pending: int):
+        try:
+            self.bytes_written += self.store.flush() or 0
+            self.flushes += 1
+            self.coalesced += pending
+        except Exception as e:  # Keep the writer alive; the next flush retries pending changes
+            self.last_error = e
+            print(f"SVDP memory flush failed: {e}", file=sys.stderr)
+
+    def stop(self):
+        """Flush everything still pending and end the thread"""
+        with self._condition:
+            self._stopping = True
+            self._condition.notify()
+        if self.is_alive():
+            self.join()
+        elif self._dirty:
+            self._flush(self._dirty)
+            self._dirty = 0
+
+
+def open_store(memory_file: str, columnar_history: bool = False) -> MemoryStore:
+    """
+    Pick the backend from the memory path:
+    .db/.sqlite/.sqlite3 -> SQLite, a directory (or path ending in /) -> sharded,
+    anything else -> JSON (holding history in columnar form if asked)
+    """
+    if memory_file.endswith((".db", ".sqlite", ".sqlite3")):
+        return SQLiteMemoryStore(memory_file)
+    if memory_file.endswith(("/", os.sep)) or os.path.isdir(memory_file):
+        return ShardedMemoryStore(memory_file)
+    return JSONMemoryStore(memory_file, columnar_history=columnar_history)
+
+
+def migrate_memory(memory_file: str, target_file: str) -> int:
+    """One-shot copy of a memory.json (snapshot + journal) into the store at target_file"""
+    source = JSONMemoryStore(memory_file)
+    memory = source.load()
+    target = open_store(target_file)
+    target.load()
+    for vendor_id, vendor_record in memory["vendors"].items():
+        target.put_vendor(vendor_id, vendor_record)
+    target.set_global_patterns(memory.get("patterns", {}))
+    target.close()
+    return len(memory["vendors"])
+
+
+if __name__ == "__main__":
+    if len(sys.argv) != 4 or sys.argv[1] != "migrate":
+        print("Usage: python memory_store.py migrate <memory.json> <memory.db | memory_shards/>")
+        sys.exit(1)
+    migrated = migrate_memory(sys.argv[2], sys.argv[3])
+    print(f"Migrated {migrated} vendors from {sys.argv[2]} to {sys.argv[3]}")
@@ -0,0 +1,180 @@
+#!/usr/bin/env python3
+"""
+Low-overhead instrumentation for the SVDP agent
+Per-layer wall time is kept in fixed-bucket histograms (one perf_counter
+call and a bisect per layer) alongside plain counters. A prediction's
+layer timings are recorded for a `sample_rate` fraction of predictions;
+counters are always exact. Reports render as JSON, Prometheus text
+exposition format or a short human summary.
+"""
+
+import random
+import threading
+import time
+from bisect import bisect_left
+from typing import Dict, List
+
+# Upper bounds in seconds; the last bucket is +Inf
+LATENCY_BUCKETS = [0.00001, 0.000025, 0.00005, 0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 1.0]
+
+LAYERS = ["input_processing", "state_update", "task_execution", "output_generation", "predict", "predict_batch"]
+
+
+class Histogram:
+    def __init__(self, bounds: List[float] = LATENCY_BUCKETS):
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value: float):
+        self.counts[bisect_left(self.bounds, value)] += 1
+        self.count += 1
+        self.sum += value
+
+    def quantile(self, q: float) -> float:
+        """Upper bound of the bucket holding the q-th observation"""
+        if not self.count:
+            return 0.0
+        rank = q * self.count
+        seen = 0
+        for i, n in enumerate(self.counts):
+            seen += n
+            if seen >= rank:
+                return self.bounds[i] if i < len(self.bounds) else float("inf")
+        return float("inf")
+
+    def to_dict(self) -> Dict:
+        return {"count": self.count, "sum": self.sum, "buckets": list(self.counts)}
+
+    def merge(self, snapshot: Dict):
+        for i, n in enumerate(snapshot["buckets"]):
+            self.counts[i] += n
+        self.count += snapshot["count"]
+        self.sum += snapshot["sum"]
+
+
+class AgentMetrics:
+    """
+    Layer timings and counters for one agent
+    predict() calls start() before Layer 1; each _log_* hook then calls
+    lap() with its layer name, which records the time since the previous
+    mark on the same thread.
+    """
+
+    def __init__(self, sample_rate: float = 1.0):
+        self.sample_rate = sample_rate
+        self.started_at = time.time()
+        self._layers: Dict[str, Histogram] = {}
+        self._counters: Dict[str, float] = {}
+        self._lock = threading.Lock()
+        self._local = threading.local()
+
+    # TIMING
+    def start(self):
+        """Begin timing a prediction on this thread, if it is sampled"""
+        sampled = self.sample_rate >= 1.0 or random.random() < self.sample_rate
+        self._local.mark = time.perf_counter() if sampled else None
+        self._local.began = self._local.mark
+
+    def lap(self, layer: str):
+        mark = getattr(self._local, "mark", None)
+        if mark is None:
+            return
+        now = time.perf_counter()
+        self._local.mark = now
+        self.observe(layer, now - mark)
+
+    def finish(self, name: str = "predict"):
+        """Record the whole prediction and stop timing on this thread"""
+        began = getattr(self._local, "began", None)
+        self._local.mark = self._local.began = None
+        if began is not None:
+            self.observe(name, time.perf_counter() - began)
+
+    def observe(self, layer: str, seconds: float):
+        with self._lock:
+            histogram = self._layers.get(layer)
+            if histogram is None:
+                histogram = self._layers[layer] = Histogram()
+            histogram.observe(seconds)
+
+    # COUNTERS
+    def inc(self, name: str, amount: float = 1):
+        with self._lock:
+            self._counters[name] = self._counters.get(name, 0) + amount
+
+    # REPORTING
+    def snapshot(self) -> Dict:
+        with self._lock:
+            return {
+                "sample_rate": self.sample_rate,
+                "uptime_seconds": time.time() - self.started_at,
+                "layers": {name: histogram.to_dict() for name, histogram in self._layers.items()},
+                "counters": dict(self._counters)
+            }
+
+    def drain(self) -> Dict:
+        """Snapshot and reset, e.g. to ship a worker's numbers to its parent"""
+        with self._lock:
+            snapshot = {
+                "layers": {name: histogram.to_dict() for name, histogram in self._layers.items()},
+                "counters": dict(self._counters)
+            }
+            self._layers.clear()
+            self._counters.clear()
+        return snapshot
+
+    def merge(self, snapshot: Dict):
+        """Fold in another agent's drain()ed numbers"""
+        with self._lock:
+            for name, data in snapshot.get("layers", {}).items():
+                histogram = self._layers.get(name)
+                if histogram is None:
+                    histogram = self._layers[name] = Histogram()
+                histogram.merge(data)
+            for name, value in snapshot.get("counters", {}).items():
+                self._counters[name] = self._counters.get(name, 0) + value
+
+
+def render_prometheus(report: Dict, prefix: str = "svdp") -> str:
+    """Prometheus text exposition of a report from SVDPAgent.metrics_report()"""
+    lines = [
+        f"# HELP {prefix}_layer_seconds Wall time per prediction layer (sampled)",
+        f"# TYPE {prefix}_layer_seconds histogram"
+    ]
+    for layer, data in sorted(report["layers"].items()):
+        cumulative = 0
+        for bound, n in zip(LATENCY_BUCKETS + ["+Inf"], data["buckets"]):
+            cumulative += n
+            lines.append(f'{prefix}_layer_seconds_bucket{{layer="{layer}",le="{bound}"}} {cumulative}')
+        lines.append(f'{prefix}_layer_seconds_sum{{layer="{layer}"}} {data["sum"]}')
+        lines.append(f'{prefix}_layer_seconds_count{{layer="{layer}"}} {data["count"]}')
+    for name, value in sorted(report["counters"].items()):
+        lines.append(f"# TYPE {prefix}_{name} counter")
+        lines.append(f"{prefix}_{name}_total {value}")
+    for name, value in sorted(report.get("gauges", {}).items()):
+        lines.append(f"# TYPE {prefix}_{name} gauge")
+        lines.append(f"{prefix}_{name} {value}")
+    return "\n".join(lines) + "\n"
+
+
+def render_summary(report: Dict) -> str:
+    """Plain-text table for the CLI"""
+    lines = [f"{'layer':<20}{'count':>9}{'mean ms':>10}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}"]
+    for layer in LAYERS + sorted(set(report["layers"]) - set(LAYERS)):
+        data = report["layers"].get(layer)
+        if not data or not data["count"]:
+            continue
+        histogram = Histogram()
+        histogram.merge(data)
+        lines.append(
+            f"{layer:<20}{data['count']:>9}{1000 * data['sum'] / data['count']:>10.3f}"
+            f"{1000 * histogram.quantile(0.5):>9.2f}{1000 * histogram.quantile(0.95):>9.2f}"
+            f"{1000 * histogram.quantile(0.99):>9.2f}"
+        )
+    for name, value in sorted(report["counters"].items()):
+        lines.append(f"{name}: {value:,.0f}")
+    for name, value in sorted(report.get("gauges", {}).items()):
+        lines.append(f"{name}: {value:,.3f}" if isinstance(value, float) else f"{name}: {value:,}")
+    return "\n".join(lines)
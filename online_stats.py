@@ -0,0 +1,80 @@
+#!/usr/bin/env python3
+"""
+Online statistics kept inside learned_patterns
+Each accumulator is a plain dict (JSON-serializable) updated in O(1) per
+observation: Welford running mean/variance plus an EWMA for recency.
+"""
+
+import math
+from typing import Dict, Iterable, List
+
+from calibration import update_calibration_stats
+
+EWMA_ALPHA = 0.2  # Roughly a one-week memory for daily observations
+
+
+def update_accumulator(acc: Dict, value: float, alpha: float = EWMA_ALPHA) -> Dict:
+    """Fold one observation into a Welford/EWMA accumulator"""
+    n = acc.get("n", 0) + 1
+    mean = acc.get("mean", 0.0)
+    delta = value - mean
+    mean += delta / n
+    acc["m2"] = acc.get("m2", 0.0) + delta * (value - mean)
+    acc["ewma"] = value if n == 1 else alpha * value + (1 - alpha) * acc["ewma"]
+    acc["n"] = n
+    acc["mean"] = mean
+    return acc
+
+
+def accumulator_std(acc: Dict) -> float:
+    n = acc.get("n", 0)
+    return math.sqrt(acc["m2"] / (n - 1)) if n > 1 else 0.0
+
+
+def update_sales_stats(stats: Dict, day: Dict) -> Dict:
+    """
+    Fold one sales day into a vendor's online stats:
+    revenue overall and by weather / weekday, quantity per item, and the
+    per-cell sums that calibration fits from
+    """
+    revenue = day.get("actual_revenue")
+    if revenue is not None:
+        update_accumulator(stats.setdefault("revenue", {}), revenue)
+        update_accumulator(stats.setdefault("weather_revenue", {}).setdefault(day.get("weather", "sunny"), {}), revenue)
+        if day.get("day_of_week"):
+            update_accumulator(stats.setdefault("day_revenue", {}).setdefault(day["day_of_week"], {}), revenue)
+    items = stats.setdefault("items", {})
+    for item, quantity in (day.get("items_sold") or {}).items():
+        update_accumulator(items.setdefault(item, {}), quantity)
+    update_calibration_stats(stats.setdefault("calibration", {}), day)
+    if day.get("date") and day["date"] > stats.get("last_date", ""):
+        stats["last_date"] = day["date"]
+    return stats
+
+
+def stats_from_history(history: Iterable[Dict]) -> Dict:
+    """Seed online stats from days recorded before ingestion existed"""
+    stats: Dict = {}
+    for day in history:
+        update_sales_stats(stats, day)
+    return stats
+
+
+def summarize_performance(stats: Dict) -> Dict:
+    """performance_metrics fields derived from the online stats"""
+    metrics = {}
+    revenue = stats.get("revenue")
+    if revenue:
+        metrics["avg_daily_revenue"] = round(revenue["mean"])
+        metrics["revenue_std"] = round(accumulator_std(revenue), 1)
+        metrics["days_recorded"] = revenue["n"]
+    day_revenue = stats.get("day_revenue", {})
+    if day_revenue:
+        ranked: List[str] = sorted(day_revenue, key=lambda d: day_revenue[d]["mean"])
+        metrics["best_day"] = ranked[-1]
+        metrics["worst_day"] = ranked[0]
+    weather_revenue = stats.get("weather_revenue", {})
+    if len(weather_revenue) > 1:
+        means = [acc["mean"] for acc in weather_revenue.values()]
+        metrics["weather_sensitivity"] = round(min(means) / max(means), 2) if max(means) else 0.0
+    return metrics
@@ -0,0 +1,241 @@
+#!/usr/bin/env python3
+"""
+Per-vendor historical pattern index
+Past days are bucketed by (weather, day_of_week, festival, payday,
+temperature band) with running revenue and item totals per bucket, so
+finding "days like today" is a dict lookup instead of a history scan.
+"""
+
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from sales_columns import (ABSENT, HAS_DAY, HAS_FESTIVAL, HAS_PAYDAY, HAS_WEATHER, WEATHER_VALUES, WEEKDAYS,
+                           SalesColumns)
+
+WEEKEND_DAYS = ("Saturday", "Sunday")
+
+# Mismatch costs used when no past day falls in the exact bucket
+BUCKET_DISTANCE_WEIGHTS = {
+    "weather": 3.0,
+    "festival": 2.0,
+    "weekend": 1.5,
+    "day_of_week": 0.5,
+    "payday": 1.0,
+    "temperature_band": 1.0
+}
+
+TEMPERATURE_BANDS = ["cold", "mild", "warm", "hot", "extreme"]
+
+BucketKey = Tuple[str, str, bool, bool, str]
+
+
+def temperature_band(temperature: Optional[float]) -> str:
+    """Coarse band aligned with the temperature factors in _calculate_weather_impact"""
+    if temperature is None:
+        return "mild"
+    if temperature > 40:
+        return "extreme"
+    if temperature > 35:
+        return "hot"
+    if temperature >= 30:
+        return "warm"
+    if temperature >= 10:
+        return "mild"
+    return "cold"
+
+
+def temperature_band_codes(temperature: np.ndarray) -> np.ndarray:
+    """Vectorized temperature_band as indexes into TEMPERATURE_BANDS; NaN (unknown) is mild"""
+    return np.select(
+        [np.isnan(temperature), temperature > 40, temperature > 35, temperature >= 30, temperature >= 10],
+        [1, 4, 3, 2, 1],
+        0
+    )
+
+
+def bucket_key(weather: str, day_of_week: str, is_festival: bool, is_payday: bool, temperature: Optional[float]) -> BucketKey:
+    return (weather, day_of_week, bool(is_festival), bool(is_payday), temperature_band(temperature))
+
+
+def day_bucket_key(day: Dict) -> BucketKey:
+    """Bucket of a sales_history entry; older entries carry no festival/payday flags"""
+    return bucket_key(
+        day.get("weather", "sunny"),
+        day.get("day_of_week", ""),
+        day.get("is_festival", False),
+        day.get("is_payday", False),
+        day.get("temperature")
+    )
+
+
+def bucket_distance(a: BucketKey, b: BucketKey) -> float:
+    weights = BUCKET_DISTANCE_WEIGHTS
+    distance = 0.0
+    if a[0] != b[0]:
+        distance += weights["weather"]
+    if a[1] != b[1]:
+        distance += weights["day_of_week"]
+        if (a[1] in WEEKEND_DAYS) != (b[1] in WEEKEND_DAYS):
+            distance += weights["weekend"]
+    if a[2] != b[2]:
+        distance += weights["festival"]
+    if a[3] != b[3]:
+        distance += weights["payday"]
+    distance += weights["temperature_band"] * abs(TEMPERATURE_BANDS.index(a[4]) - TEMPERATURE_BANDS.index(b[4]))
+    return distance
+
+
+class VendorPatterns:
+    """Running aggregates of one vendor's history, per bucket"""
+
+    def __init__(self):
+        self.buckets: Dict[BucketKey, Dict] = {}
+        # Compacted days (retention.py) only keep weather and weekday
+        self.rolled_up: Dict[Tuple[str, str], Dict] = {}
+        self.total_days = 0
+
+    @classmethod
+    def from_columns(cls, columns: SalesColumns) -> "VendorPatterns":
+        """Same buckets as add_day() over every day, computed with array group-bys"""
+        patterns = cls()
+        # Bucket fields outside the columns' vocabularies (rare) take the dict path for the whole history
+        if columns.overridden(("weather", "day_of_week", "is_festival", "is_payday", "temperature",
+                               "actual_revenue", "items_sold")).any():
+            for i in range(len(columns)):
+                patterns.add_day(columns.record(i))
+            return patterns
+        if not len(columns):
+            return patterns
+        weather = np.where(columns.present(HAS_WEATHER), columns.column("weather"), WEATHER_VALUES.index("sunny"))
+        day = np.where(columns.present(HAS_DAY), columns.column("day_of_week"), len(WEEKDAYS))
+        festival = columns.present(HAS_FESTIVAL) & columns.column("is_festival")
+        payday = columns.present(HAS_PAYDAY) & columns.column("is_payday")
+        band = temperature_band_codes(columns.temperature())
+        codes = (((weather.astype(np.int64) * 8 + day) * 2 + festival) * 2 + payday) * 5 + band
+
+        unique, first, inverse = np.unique(codes, return_index=True, return_inverse=True)
+        revenue = np.nan_to_num(columns.revenue())
+        days = np.bincount(inverse, minlength=len(unique))
+        revenue_sums = np.bincount(inverse, weights=revenue, minlength=len(unique))
+        quantities = columns.quantities
+        recorded = quantities != ABSENT
+        quantities = np.where(recorded, quantities, 0)
+        # Buckets in first-seen order, as add_day() would have created them
+        for b in np.argsort(first, kind="stable"):
+            code = int(unique[b])
+            code, band_code = divmod(code, 5)
+            code, is_payday = divmod(code, 2)
+            code, is_festival = divmod(code, 2)
+            weather_code, day_code = divmod(code, 8)
+            key = (WEATHER_VALUES[weather_code], WEEKDAYS[day_code] if day_code < len(WEEKDAYS) else "",
+                   bool(is_festival), bool(is_payday), TEMPERATURE_BANDS[band_code])
+            in_bucket = inverse == b
+            totals = quantities[:, in_bucket].sum(axis=1)
+            seen = recorded[:, in_bucket]
+            # Items in the order the bucket first saw them
+            rows = np.flatnonzero(seen.any(axis=1))
+            rows = rows[np.argsort(seen[rows].argmax(axis=1), kind="stable")]
+            patterns.buckets[key] = {
+                "days": int(days[b]),
+                "revenue_sum": float(revenue_sums[b]),
+                "items": {columns.items[row]: int(totals[row]) for row in rows}
+            }
+        patterns.total_days = len(columns)
+        return patterns
+
+    def add_day(self, day: Dict):
+        key = day_bucket_key(day)
+        bucket = self.buckets.get(key)
+        if bucket is None:
+            bucket = self.buckets[key] = {"days": 0, "revenue_sum": 0.0, "items": {}}
+        bucket["days"] += 1
+        bucket["revenue_sum"] += day.get("actual_revenue", 0) or 0
+        items = bucket["items"]
+        for item, quantity in (day.get("items_sold") or {}).items():
+            items[item] = items.get(item, 0) + quantity
+        self.total_days += 1
+
+    def add_rollups(self, rollups: Dict):
+        """Fold in the roll-ups of compacted days, per (weather, weekday)"""
+        for rollup in rollups["buckets"]:
+            key = (rollup["weather"], rollup["day_of_week"])
+            bucket = self.rolled_up.get(key)
+            if bucket is None:
+                bucket = self.rolled_up[key] = {"days": 0, "revenue_sum": 0.0, "items": {}}
+            bucket["days"] += rollup["days"]
+            bucket["revenue_sum"] += rollup["revenue_sum"]
+            items = bucket["items"]
+            for item, quantity in rollup["items"].items():
+                items[item] = items.get(item, 0) + quantity
+        self.total_days += rollups["days"]
+
+    def match(self, key: BucketKey) -> List[Dict]:
+        """
+        Exact bucket if seen before, otherwise every bucket at the smallest distance
+        Rolled-up days match on weather and weekday alone, next to the raw
+        days' buckets.
+        """
+        if key in self.buckets:
+            matches = [self._summary(key, 0.0)]
+            if key[:2] in self.rolled_up:
+                matches.append(self._summary(key[:2], 0.0))
+            return matches
+        distances = {other: bucket_distance(key, other) for other in self.buckets}
+        distances.update({other: bucket_distance(key, other + key[2:]) for other in self.rolled_up})
+        if not distances:
+            return []
+        nearest = min(distances.values())
+        return [self._summary(other, d) for other, d in distances.items() if d == nearest]
+
+    def _summary(self, key: Tuple, distance: float) -> Dict:
+        """Summary of a raw bucket, or of a rolled-up (weather, weekday) one with the other fields None"""
+        bucket = self.buckets[key] if len(key) == 5 else self.rolled_up[key]
+        days = bucket["days"]
+        key = tuple(key) + (None,) * (5 - len(key))
+        return {
+            "bucket": {
+                "weather": key[0],
+                "day_of_week": key[1],
+                "is_festival": key[2],
+                "is_payday": key[3],
+                "temperature_band": key[4]
+            },
+            "days": days,
+            "distance": distance,
+            "avg_revenue": bucket["revenue_sum"] / days,
+            "avg_items": {item: total / days for item, total in bucket["items"].items()}
+        }
+
+
+class PatternIndex:
+    """
+    Pattern buckets for every vendor the agent has touched
+    A vendor's buckets are built from its stored history on first use and
+    then kept current through add_day() as new days are recorded.
+    """
+
+    def __init__(self, store):
+        self.store = store
+        self._vendors: Dict[str, VendorPatterns] = {}
+
+    def vendor(self, vendor_id: str) -> VendorPatterns:
+        patterns = self._vendors.get(vendor_id)
+        if patterns is None:
+            patterns = self._vendors[vendor_id] = VendorPatterns.from_columns(self.store.get_columns(vendor_id))
+            if self.store.rollup_days(vendor_id):
+                patterns.add_rollups(self.store.get_rollups(vendor_id))
+        return patterns
+
+    def add_day(self, vendor_id: str, day: Dict):
+        """Fold a newly stored day into an already built vendor index"""
+        patterns = self._vendors.get(vendor_id)
+        if patterns is not None:
+            patterns.add_day(day)
+
+    def forget(self, vendor_id: str):
+        """Drop a vendor's buckets, e.g. after its history was replaced wholesale"""
+        self._vendors.pop(vendor_id, None)
+
+    def match(self, vendor_id: str, key: BucketKey) -> List[Dict]:
+        return self.vendor(vendor_id).match(key)
@@ -0,0 +1,197 @@
+#!/usr/bin/env python3
+"""
+Buffered, day-rotated prediction journal
+Predictions are buffered in memory and appended to
+logs/predictions-YYYY-MM-DD.csv once `flush_rows` rows are waiting or
+`flush_interval` seconds have passed. A day's file is gzip-compressed
+by the background flusher once the day is over and nothing has written
+to it since. Each recommended item is its
+own row (prediction_id ties them together), so quantities can be read
+back without string parsing.
+"""
+
+import csv
+import datetime
+import glob
+import gzip
+import itertools
+import os
+import shutil
+import threading
+import time
+from typing import Dict, Iterator, List, Optional
+
+COLUMNS = ["prediction_id", "logged_at", "date", "vendor_id", "vendor_name", "location",
+           "item", "quantity", "revenue_min", "revenue_max", "peak_hours", "confidence"]
+FILE_PREFIX = "predictions-"
+
+
+class PredictionJournal:
+    def __init__(self, directory: str = "logs", flush_rows: int = 1000, flush_interval: float = 5.0,
+                 compress: bool = True):
+        self.directory = directory
+        self.flush_rows = flush_rows
+        self.flush_interval = flush_interval
+        self.compress = compress
+        self._buffer: List[List] = []
+        self._buffer_day: Optional[str] = None
+        self._lock = threading.Lock()
+        self._ids = itertools.count(int(time.time() * 1000) * 1000)
+        self._last_flush = time.monotonic()
+        self._flusher: Optional[threading.Thread] = None
+        self._stopping = threading.Event()
+        os.makedirs(directory, exist_ok=True)
+        self._swept_day = datetime.date.today().isoformat()
+        self._compress_closed_days()
+
+    def path_for(self, day: str) -> str:
+        return os.path.join(self.directory, f"{FILE_PREFIX}{day}.csv")
+
+    # WRITING
+    def record(self, vendor_id: str, vendor_name: str, location: str, date: str, items: Dict[str, int],
+               revenue: tuple, peak_hours: List[int], confidence: float):
+        """Buffer one prediction; rows reach disk on the next size or time based flush"""
+        now = datetime.datetime.now()
+        day = now.date().isoformat()
+        logged_at = now.isoformat(timespec="seconds")
+        prediction_id = next(self._ids)
+        shared = [revenue[0], revenue[1], " ".join(map(str, peak_hours)), f"{confidence:.4f}"]
+        head = [prediction_id, logged_at, date, vendor_id, vendor_name, location]
+        # A prediction without items still gets one (empty) row
+        rows = [head + [item, quantity] + shared for item, quantity in items.items()] or [head + ["", 0] + shared]
+        with self._lock:
+            if self._buffer_day is not None and day != self._buffer_day:
+                self._flush_locked()  # Day rolled over: close out yesterday's file first
+            self._buffer_day = day
+            self._buffer.extend(rows)
+            if len(self._buffer) >= self.flush_rows or time.monotonic() - self._last_flush >= self.flush_interval:
+                self._flush_locked()
+        if self._flusher is None and self.flush_interval > 0:
+            self._start_flusher()
+
+    def flush(self):
+        with self._lock:
+            self._flush_locked()
+
+    def _flush_locked(self):
+        self._last_flush = time.monotonic()
+        if not self._buffer:
+            return
+        path = self.path_for(self._buffer_day)
+        is_new_file = not os.path.exists(path)
+        with open(path, 'a', newline='', encoding='utf-8') as f:
+            writer = csv.writer(f)
+            if is_new_file:
+                writer.writerow(COLUMNS)
+            writer.writerows(self._buffer)
+        self._buffer = []
+
+    def _start_flusher(self):
+        # Lets quiet periods still reach disk within flush_interval
+        with self._lock:
+            if self._flusher is not None:
+                return
+            self._flusher = threading.Thread(target=self._run_flusher, name="svdp-prediction-journal", daemon=True)
+            self._flusher.start()
+
+    def _run_flusher(self):
+        while not self._stopping.wait(self.flush_interval):
+            today = datetime.date.today().isoformat()
+            rolled_over = today != self._swept_day
+            with self._lock:
+                if rolled_over or time.monotonic() - self._last_flush >= self.flush_interval:
+                    self._flush_locked()
+            if rolled_over:
+                # Off the record() path: compressing a busy day's file can take a while
+                self._swept_day = today
+                self._compress_closed_days()
+
+    def _compress_closed_days(self):
+        """
+        gzip every journal file from before today that was last written before today
+        Other processes (web UI, CLI) may share the directory: a file is
+        first renamed to a name private to this process, so only one of them
+        compresses it, and a day that already has a .gz gets its rows added
+        as another gzip member instead of replacing the earlier ones.
+        """
+        if not self.compress:
+            return
+        today = datetime.date.today()
+        for path in glob.glob(os.path.join(self.directory, f"{FILE_PREFIX}*.csv")):
+            if path == self.path_for(today.isoformat()):
+                continue
+            claimed = f"{path}.{os.getpid()}.compressing"
+            try:
+                if datetime.date.fromtimestamp(os.path.getmtime(path)) >= today:
+                    continue  # Still being written (late rows for that day)
+                os.replace(path, claimed)
+            except FileNotFoundError:
+                continue  # Another process got to it first
+            with open(claimed, 'rb') as source:
+                if os.path.exists(path + ".gz"):
+                    source.readline()  # The existing member already starts with the header
+                with gzip.open(path + ".gz", 'ab') as target:
+                    shutil.copyfileobj(source, target)
+            os.remove(claimed)
+
+    def close(self):
+        self._stopping.set()
+        if self._flusher is not None:
+            self._flusher.join()
+            self._flusher = None
+        self.flush()
+
+    # READING
+    def files(self, start: Optional[str] = None, end: Optional[str] = None) -> List[str]:
+        """Journal files logged between start and end (YYYY-MM-DD, inclusive), oldest first"""
+        paths = glob.glob(os.path.join(self.directory, f"{FILE_PREFIX}*.csv")) + \
+            glob.glob(os.path.join(self.directory, f"{FILE_PREFIX}*.csv.gz"))
+        selected = []
+        for path in paths:
+            day = os.path.basename(path)[len(FILE_PREFIX):len(FILE_PREFIX) + 10]
+            if (start is None or day >= start) and (end is None or day <= end):
+                selected.append((day, path))
+        return [path for _, path in sorted(selected)]
+
+    def read(self, vendor_id: Optional[str] = None, start: Optional[str] = None, end: Optional[str] = None,
+             logged_start: Optional[str] = None, logged_end: Optional[str] = None) -> Iterator[Dict]:
+        """
+        Stream predictions one at a time
+        start/end filter on the predicted date, logged_start/logged_end pick
+        which daily files are opened at all. Buffered rows are flushed first
+        so the stream includes everything recorded so far.
+        """
+        self.flush()
+        for path in self.files(logged_start, logged_end):
+            opener = gzip.open if path.endswith(".gz") else open
+            with opener(path, 'rt', newline='', encoding='utf-8') as f:
+                yield from _records(csv.DictReader(f), vendor_id, start, end)
+
+
+def _records(rows: Iterator[Dict], vendor_id: Optional[str], start: Optional[str],
+             end: Optional[str]) -> Iterator[Dict]:
+    """Regroup item rows into one dict per prediction, applying the filters"""
+    current = None
+    for row in rows:
+        if (vendor_id is not None and row["vendor_id"] != vendor_id) or \
+                (start is not None and row["date"] < start) or (end is not None and row["date"] > end):
+            continue
+        if current is None or row["prediction_id"] != current["prediction_id"]:
+            if current is not None:
+                yield current
+            current = {
+                "prediction_id": row["prediction_id"],
+                "logged_at": row["logged_at"],
+                "date": row["date"],
+                "vendor_id": row["vendor_id"],
+                "vendor_name": row["vendor_name"],
+                "location": row["location"],
+                "recommended_items": {},
+                "expected_revenue": (int(row["revenue_min"]), int(row["revenue_max"])),
+                "peak_hours": [int(hour) for hour in row["peak_hours"].split()],
+                "confidence_level": float(row["confidence"])
+            }
+        if row["item"]:
+            current["recommended_items"][row["item"]] = int(row["quantity"])
+    if current is not None:
+        yield current
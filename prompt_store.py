@@ -0,0 +1,173 @@
+#!/usr/bin/env python3
+"""
+Sectioned prompt template store
+prompts/prompt_templates.txt is a sequence of "### Section" headings
+holding "KEY: |" blocks (indented text until the next key or heading);
+"## " headings without keys hold free text. The file is parsed once into
+a (section, key) index and re-parsed only when its mtime changes, checked
+at most every `check_interval` seconds, so requests never re-read the
+file; after a reload `changed_keys` lists the blocks an edit touched.
+"""
+
+import datetime
+import os
+import re
+import threading
+import time
+from typing import Dict, List, Optional, Tuple
+
+KEY_LINE = re.compile(r"^([A-Z][A-Z0-9_]*):\s*\|\s*$")
+
+# Template keys per context value, in the order they should be read
+WEATHER_KEYS = {"sunny": "SUNNY_DAY", "rainy": "RAINY_DAY", "cloudy": "CLOUDY_DAY", "hot": "HOT_DAY"}
+LOCATION_KEYS = {
+    "office_area": "OFFICE_AREA",
+    "college": "COLLEGE_AREA",
+    "residential": "RESIDENTIAL_AREA",
+    "transport_hub": "TRANSPORT_HUB",
+    "market": "MARKET_AREA"
+}
+SEASON_KEYS = {
+    3: "SUMMER_STRATEGY", 4: "SUMMER_STRATEGY", 5: "SUMMER_STRATEGY",
+    6: "MONSOON_STRATEGY", 7: "MONSOON_STRATEGY", 8: "MONSOON_STRATEGY", 9: "MONSOON_STRATEGY",
+    10: "POST_MONSOON", 11: "POST_MONSOON",
+    12: "WINTER_STRATEGY", 1: "WINTER_STRATEGY", 2: "WINTER_STRATEGY"
+}
+HOT_DAY_ABOVE = 38  # HOT_DAY is written for >38°C, whatever the sky looks like
+MONTH_END_FROM_DAY = 25
+
+
+def _slug(heading: str) -> str:
+    return re.sub(r"[^A-Z0-9]+", "_", heading.upper()).strip("_")
+
+
+def parse_templates(text: str) -> Dict[Tuple[str, str], str]:
+    """(section, key) -> block text, in file order"""
+    index: Dict[Tuple[str, str], str] = {}
+    section = ""
+    key: Optional[str] = None
+    lines: List[str] = []
+
+    def close_block():
+        if key is not None:
+            body = "\n".join(lines).strip("\n")
+            if body.strip():
+                index[(section, key)] = body
+
+    for line in text.splitlines():
+        stripped = line.strip()
+        match = KEY_LINE.match(stripped)
+        if line.startswith("#") or stripped == "---":
+            if line.startswith("## ") or line.startswith("### "):
+                close_block()
+                section = line.lstrip("#").strip()
+                # Prose directly under a heading is kept under the heading's own slug
+                key, lines = _slug(section), []
+            continue
+        if match and not line.startswith(" "):
+            close_block()
+            key, lines = match.group(1), []
+            continue
+        if key is not None:
+            lines.append(line[2:] if line.startswith("  ") else line)
+    close_block()
+    return index
+
+
+class PromptStore:
+    def __init__(self, path: str, defaults: Optional[Dict[str, str]] = None, check_interval: float = 1.0):
+        self.path = path
+        self.defaults = defaults or {}
+        self.check_interval = check_interval
+        self.version = 0
+        self.changed_keys: List[str] = []
+        self._blocks: Dict[Tuple[str, str], str] = {}
+        self._by_key: Dict[str, str] = {}
+        self._text = ""
+        self._mtime: Optional[int] = None
+        self._checked_at = 0.0
+        self._lock = threading.Lock()
+        self._refresh(force=True)
+
+    # RELOAD
+    def _refresh(self, force: bool = False):
+        now = time.monotonic()
+        if not force and now - self._checked_at < self.check_interval:
+            return
+        with self._lock:
+            self._checked_at = now
+            try:
+                mtime = os.stat(self.path).st_mtime_ns
+            except FileNotFoundError:
+                mtime = None
+            if mtime == self._mtime and not force:
+                return
+            self._reload(mtime)
+
+    def _reload(self, mtime: Optional[int]):
+        text = ""
+        if mtime is not None:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                text = f.read()
+        blocks = parse_templates(text)
+        changed = [name[1] for name, body in blocks.items() if self._blocks.get(name) != body]
+        changed += [name[1] for name in self._blocks if name not in blocks]
+        self._blocks = blocks
+        self._by_key = {key: body for (_, key), body in self._blocks.items()}
+        self._text = text
+        self._mtime = mtime
+        self.changed_keys = changed
+        self.version += 1
+
+    # LOOKUPS
+    @property
+    def exists(self) -> bool:
+        self._refresh()
+        return self._mtime is not None
+
+    @property
+    def text(self) -> str:
+        """Whole file, for callers that still want everything"""
+        self._refresh()
+        return self._text
+
+    def get(self, key: str, default: Optional[str] = None) -> Optional[str]:
+        self._refresh()
+        return self._by_key.get(key, self.defaults.get(key, default))
+
+    def sections(self) -> List[str]:
+        self._refresh()
+        return list(dict.fromkeys(section for section, _ in self._blocks))
+
+    def section(self, name: str) -> Dict[str, str]:
+        """Every block under one heading, e.g. section("Weather-Based Analysis")"""
+        self._refresh()
+        return {key: body for (section, key), body in self._blocks.items() if section == name}
+
+    def keys_for_context(self, location_type: str, weather: str, temperature: Optional[float], date: str,
+                         is_festival: bool = False, is_payday: bool = False) -> List[str]:
+        """Template keys that apply to one vendor-day: weather, location, economy, season"""
+        keys = [WEATHER_KEYS.get(weather)]
+        if temperature is not None and temperature > HOT_DAY_ABOVE and weather != "hot":
+            keys.append("HOT_DAY")
+        keys.append(LOCATION_KEYS.get(location_type))
+        if is_festival:
+            keys.append("MAJOR_FESTIVALS")
+        if is_payday:
+            keys.append("SALARY_WEEK")
+        try:
+            day = datetime.datetime.strptime(date, "%Y-%m-%d").date()
+        except (TypeError, ValueError):
+            day = None
+        if day is not None:
+            if day.day >= MONTH_END_FROM_DAY:
+                keys.append("MONTH_END")
+            keys.append(SEASON_KEYS[day.month])
+        return [key for key in keys if key]
+
+    def for_context(self, location_type: str, weather: str, temperature: Optional[float], date: str,
+                    is_festival: bool = False, is_payday: bool = False) -> Dict[str, str]:
+        """Only the blocks relevant to one vendor-day, keyed by template key"""
+        self._refresh()
+        keys = self.keys_for_context(location_type, weather, temperature, date, is_festival, is_payday)
+        return {key: self._by_key[key] for key in keys if key in self._by_key}
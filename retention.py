@@ -0,0 +1,169 @@
+#!/usr/bin/env python3
+"""
+Tiered retention for sales_history
+A vendor keeps raw days for a recent window (`raw_days` back from its
+latest day). Older days are rolled up per period and (weather, weekday)
+bucket into day counts, revenue sums and item totals, by month (or week)
+for `rollup_days`, then into one all-time roll-up per bucket. Each
+period also keeps small festival, payday and temperature-band totals. A
+vendor's storage is therefore bounded by the window, the periods within
+the horizon times at most 4 × 7 buckets, and 4 × 7 all-time buckets.
+
+Roll-ups keep what the agent still reads from old days: observed-day
+counts (the 30-day confidence and 90-day seasonal thresholds, cold
+start) and weather/weekday patterns. Online stats and calibration sums
+are kept incrementally in learned_patterns, so they do not need the raw
+days.
+"""
+
+import datetime
+from dataclasses import dataclass
+from typing import Dict, Iterable, Optional, Tuple
+
+from memory_store import empty_rollups
+from pattern_index import temperature_band
+
+RAW_DAYS = 120
+ROLLUP_DAYS = 90
+# Raw days allowed past the window before a vendor is compacted, so each compaction rolls up a batch
+SLACK_DAYS = 30
+PERIODS = ("week", "month")
+ALL_TIME = "all"
+
+
+@dataclass(frozen=True)
+class RetentionPolicy:
+    raw_days: int = RAW_DAYS
+    rollup_period: str = "month"
+    rollup_days: int = ROLLUP_DAYS
+    slack_days: int = SLACK_DAYS
+
+    def __post_init__(self):
+        if self.rollup_period not in PERIODS:
+            raise ValueError(f"rollup_period must be one of {PERIODS}, not {self.rollup_period!r}")
+
+
+def period_start(date: datetime.date, period: str) -> datetime.date:
+    if period == "week":
+        return date - datetime.timedelta(days=date.weekday())
+    return date.replace(day=1)
+
+
+def period_label(date: datetime.date, period: str) -> str:
+    if period == "week":
+        year, week, _ = date.isocalendar()
+        return f"{year}-W{week:02d}"
+    return date.strftime("%Y-%m")
+
+
+def _label_start(label: str) -> Optional[datetime.date]:
+    """First day of a roll-up period label (either kind, so a policy can change period); None for all-time"""
+    if label == ALL_TIME:
+        return None
+    if "-W" in label:
+        year, week = label.split("-W")
+        return datetime.date.fromisocalendar(int(year), int(week), 1)
+    return datetime.date.fromisoformat(label + "-01")
+
+
+def _empty_period(period: str) -> Dict:
+    return {"period": period, "days": 0, "revenue_sum": 0.0, "festival": [0, 0.0], "payday": [0, 0.0],
+            "temperature_bands": {}}
+
+
+def _fold_period(periods: Dict[str, Dict], source: Dict, period: str):
+    """Add one period's totals (or a day's, shaped the same) into periods[period]"""
+    target = periods.get(period)
+    if target is None:
+        target = periods[period] = _empty_period(period)
+    target["days"] += source["days"]
+    target["revenue_sum"] += source["revenue_sum"]
+    for flag in ("festival", "payday"):
+        target[flag][0] += source[flag][0]
+        target[flag][1] += source[flag][1]
+    bands = target["temperature_bands"]
+    for band, days in source["temperature_bands"].items():
+        bands[band] = bands.get(band, 0) + days
+
+
+def _fold_bucket(buckets: Dict[Tuple, Dict], source: Dict, period: str, weather: str, day_of_week: str):
+    key = (period, weather, day_of_week)
+    target = buckets.get(key)
+    if target is None:
+        target = buckets[key] = {"period": period, "weather": weather, "day_of_week": day_of_week, "days": 0,
+                                 "revenue_sum": 0.0, "items": {}}
+    target["days"] += source["days"]
+    target["revenue_sum"] += source["revenue_sum"]
+    totals = target["items"]
+    for item, quantity in source["items"].items():
+        totals[item] = totals.get(item, 0) + quantity
+
+
+def plan_compaction(history: Iterable[Dict], rollups: Optional[Dict],
+                    policy: RetentionPolicy) -> Optional[Tuple[str, Dict]]:
+    """
+    (cutoff date, new roll-ups) for one vendor, or None while its raw days fit the window plus slack
+    Every dated day before the cutoff moves into the roll-ups; roll-up
+    periods that started before the horizon merge into the all-time ones.
+    Undated days stay raw.
+    """
+    dated = [day for day in history if day.get("date")]
+    if len(dated) <= policy.raw_days + policy.slack_days:
+        return None
+    latest = datetime.date.fromisoformat(max(day["date"] for day in dated))
+    cutoff = latest - datetime.timedelta(days=policy.raw_days)
+    horizon = period_start(cutoff - datetime.timedelta(days=policy.rollup_days), policy.rollup_period)
+    old = [day for day in dated if day["date"] < cutoff.isoformat()]
+    if not old:
+        return None
+
+    def tier(start: Optional[datetime.date], label: str) -> str:
+        return ALL_TIME if start is None or start < horizon else label
+
+    rollups = rollups or empty_rollups()
+    periods: Dict[str, Dict] = {}
+    buckets: Dict[Tuple, Dict] = {}
+    for stored in rollups.get("periods", []):
+        _fold_period(periods, stored, tier(_label_start(stored["period"]), stored["period"]))
+    for stored in rollups["buckets"]:
+        period = tier(_label_start(stored["period"]), stored["period"])
+        _fold_bucket(buckets, stored, period, stored["weather"], stored["day_of_week"])
+    for day in old:
+        date = datetime.date.fromisoformat(day["date"])
+        period = tier(period_start(date, policy.rollup_period), period_label(date, policy.rollup_period))
+        revenue = day.get("actual_revenue", 0) or 0
+        _fold_period(periods, {
+            "days": 1,
+            "revenue_sum": revenue,
+            "festival": [1, revenue] if day.get("is_festival") else [0, 0.0],
+            "payday": [1, revenue] if day.get("is_payday") else [0, 0.0],
+            "temperature_bands": {temperature_band(day.get("temperature")): 1}
+        }, period)
+        _fold_bucket(buckets, {"days": 1, "revenue_sum": revenue, "items": day.get("items_sold") or {}}, period,
+                     day.get("weather", "sunny"), day.get("day_of_week", ""))
+    return cutoff.isoformat(), {
+        "days": rollups["days"] + len(old),
+        "through": max(rollups["through"], cutoff.isoformat()),
+        "periods": list(periods.values()),
+        "buckets": list(buckets.values())
+    }
+
+
+if __name__ == "__main__":
+    import argparse
+
+    from agent import SVDPAgent
+
+    parser = argparse.ArgumentParser(description="Roll old sales_history days up into per-bucket aggregates")
+    parser.add_argument("--memory", default="memory.json", help="memory file, .db or shard directory")
+    parser.add_argument("--raw-days", type=int, default=RAW_DAYS, help="days of raw history kept per vendor")
+    parser.add_argument("--period", choices=PERIODS, default="month", help="roll-up period within the horizon")
+    parser.add_argument("--rollup-days", type=int, default=ROLLUP_DAYS,
+                        help="days of per-period roll-ups before they merge into all-time buckets")
+    args = parser.parse_args()
+
+    agent = SVDPAgent(memory_file=args.memory)
+    summary = agent.compact_history(policy=RetentionPolicy(args.raw_days, args.period, args.rollup_days))
+    agent.close()
+    print(f"Compacted {summary['compacted']} of {summary['vendors']} vendors: "
+          f"{summary['days_rolled_up']} days rolled up in {summary['seconds']}s")
@@ -0,0 +1,198 @@
+#!/usr/bin/env python3
+"""
+Streaming vendor roster importer
+Reads roster CSVs shaped like data/sample_vendors.csv row by row,
+validates and normalizes each vendor, and upserts profiles into the
+agent's memory store in batches with a single commit at the end.
+
+Usage: python roster.py data/sample_vendors.csv [--memory memory.json] [--batch-size 5000]
+"""
+
+import argparse
+import csv
+import time
+from dataclasses import dataclass, field
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from agent import SVDPAgent, LocationType, make_vendor_id
+
+# Roster location types that LocationType does not model, mapped to the
+# closest demand profile
+LOCATION_TYPE_ALIASES = {
+    "tourist_area": LocationType.MARKET,
+    "tourist_spot": LocationType.MARKET,
+    "temple": LocationType.MARKET,
+    "beach": LocationType.MARKET,
+    "bazaar": LocationType.MARKET,
+    "office": LocationType.OFFICE_AREA,
+    "business_district": LocationType.OFFICE_AREA,
+    "it_park": LocationType.OFFICE_AREA,
+    "railway_station": LocationType.TRANSPORT_HUB,
+    "station": LocationType.TRANSPORT_HUB,
+    "bus_stand": LocationType.TRANSPORT_HUB,
+    "metro_station": LocationType.TRANSPORT_HUB,
+    "university": LocationType.COLLEGE,
+    "campus": LocationType.COLLEGE,
+    "school": LocationType.COLLEGE,
+    "housing_society": LocationType.RESIDENTIAL,
+    "colony": LocationType.RESIDENTIAL
+}
+
+WEEKDAYS = ["Monday", "Tuesday", "Wednesday", "Thursday", "Friday", "Saturday", "Sunday"]
+LEVELS = {"low": "Low", "medium": "Medium", "high": "High", "very high": "Very High"}
+MAX_REJECT_SAMPLES = 20
+
+
+@dataclass
+class RosterImportReport:
+    rows: int = 0
+    imported: int = 0
+    rejected: int = 0
+    seconds: float = 0.0
+    reject_samples: List[Tuple[int, str]] = field(default_factory=list)
+
+    @property
+    def rows_per_second(self) -> float:
+        return self.rows / self.seconds if self.seconds else 0.0
+
+    def summary(self) -> str:
+        lines = [
+            f"Rows read: {self.rows}",
+            f"Imported: {self.imported}",
+            f"Rejected: {self.rejected}",
+            f"Throughput: {self.rows_per_second:,.0f} rows/s ({self.seconds:.2f}s)"
+        ]
+        for line_number, reason in self.reject_samples:
+            lines.append(f"  line {line_number}: {reason}")
+        return "\n".join(lines)
+
+
+def normalize_location_type(raw: str) -> Tuple[LocationType, Optional[str]]:
+    """LocationType for a roster value; the raw value is returned when it had to be mapped"""
+    key = raw.strip().lower().replace(" ", "_").replace("-", "_")
+    try:
+        return LocationType(key), None
+    except ValueError:
+        pass
+    if key in LOCATION_TYPE_ALIASES:
+        return LOCATION_TYPE_ALIASES[key], key
+    raise ValueError(f"unknown location_type '{raw}'")
+
+
+def parse_operating_days(raw: str) -> List[str]:
+    """'Monday-Saturday' or 'Tuesday-Sunday' (ranges wrap) or 'Monday,Wednesday'"""
+    raw = raw.strip()
+    if not raw:
+        return list(WEEKDAYS)
+    if "-" in raw:
+        start, end = (part.strip().title() for part in raw.split("-", 1))
+        if start not in WEEKDAYS or end not in WEEKDAYS:
+            raise ValueError(f"bad operating_days '{raw}'")
+        i, j = WEEKDAYS.index(start), WEEKDAYS.index(end)
+        span = (j - i) % 7
+        return [WEEKDAYS[(i + k) % 7] for k in range(span + 1)]
+    days = [part.strip().title() for part in raw.split(",") if part.strip()]
+    if any(day not in WEEKDAYS for day in days):
+        raise ValueError(f"bad operating_days '{raw}'")
+    return days
+
+
+def _optional_number(row: Dict, column: str, cast):
+    value = (row.get(column) or "").strip()
+    if not value:
+        return None
+    number = cast(value)
+    if number < 0:
+        raise ValueError(f"negative {column}")
+    return number
+
+
+def _optional_level(row: Dict, column: str) -> Optional[str]:
+    value = (row.get(column) or "").strip()
+    if not value:
+        return None
+    if value.lower() not in LEVELS:
+        raise ValueError(f"bad {column} '{value}'")
+    return LEVELS[value.lower()]
+
+
+def normalize_row(row: Dict) -> Tuple[str, Dict]:
+    """Vendor id and stored profile for one roster row; raises ValueError when invalid"""
+    name = (row.get("vendor_name") or row.get("name") or "").strip()
+    location = (row.get("location") or "").strip()
+    if not name or not location:
+        raise ValueError("missing vendor_name or location")
+    location_type, raw_location_type = normalize_location_type(row.get("location_type") or "")
+    items = [item.strip() for item in (row.get("items_sold") or "").split(",") if item.strip()]
+    if not items:
+        raise ValueError("no items_sold")
+    avg_daily_revenue = float(row.get("avg_daily_revenue") or "nan")
+    if not avg_daily_revenue > 0:
+        raise ValueError("avg_daily_revenue must be positive")
+    peak_hours = [int(hour) for hour in (row.get("peak_hours") or "").split(",") if hour.strip()]
+    if any(hour < 0 or hour > 23 for hour in peak_hours):
+        raise ValueError("peak_hours outside 0-23")
+
+    profile = {
+        "name": name,
+        "location": location,
+        "location_type": location_type.value,
+        "items_sold": items,
+        "avg_daily_revenue": avg_daily_revenue,
+        "peak_hours": peak_hours or [12, 13, 18, 19],
+        "operating_days": parse_operating_days(row.get("operating_days") or ""),
+        "investment_capacity": _optional_number(row, "investment_capacity", float),
+        "years_experience": _optional_number(row, "years_experience", int),
+        "customer_base_size": _optional_number(row, "customer_base_size", int),
+        "seasonal_variation": _optional_level(row, "seasonal_variation"),
+        "competition_level": _optional_level(row, "competition_level")
+    }
+    if raw_location_type:
+        profile["location_type_raw"] = raw_location_type
+    return make_vendor_id(name, location), profile
+
+
+def iter_roster(path: str, report: RosterImportReport) -> Iterator[Tuple[str, Dict]]:
+    """Valid (vendor_id, profile) pairs, one row at a time; rejects are tallied in the report"""
+    with open(path, 'r', encoding='utf-8', newline='') as f:
+        reader = csv.DictReader(f)
+        for row in reader:
+            report.rows += 1
+            try:
+                yield normalize_row(row)
+            except (ValueError, TypeError) as e:
+                report.rejected += 1
+                if len(report.reject_samples) < MAX_REJECT_SAMPLES:
+                    report.reject_samples.append((reader.line_num, str(e)))
+
+
+def import_roster(agent: SVDPAgent, path: str, batch_size: int = 5000) -> RosterImportReport:
+    """Upsert every valid roster row into the agent's store; one flush at the end"""
+    report = RosterImportReport()
+    started = time.perf_counter()
+    batch: List[Tuple[str, Dict]] = []
+    for entry in iter_roster(path, report):
+        batch.append(entry)
+        if len(batch) >= batch_size:
+            report.imported += agent.store.upsert_profiles(batch)
+            batch = []
+    if batch:
+        report.imported += agent.store.upsert_profiles(batch)
+    agent.save()
+    # Imported vendors are cold-start neighbour candidates from now on
+    agent.profiles_changed()
+    report.seconds = time.perf_counter() - started
+    return report
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Import a vendor roster CSV into SVDP memory")
+    parser.add_argument("roster", help="CSV with the columns of data/sample_vendors.csv")
+    parser.add_argument("--memory", default="memory.json", help="memory file, .db or shard directory")
+    parser.add_argument("--batch-size", type=int, default=5000)
+    args = parser.parse_args()
+
+    agent = SVDPAgent(memory_file=args.memory)
+    result = import_roster(agent, args.roster, args.batch_size)
+    agent.close()
+    print(result.summary())
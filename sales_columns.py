@@ -0,0 +1,252 @@
+#!/usr/bin/env python3
+"""
+Columnar sales_history for one vendor
+Days are held as NumPy columns (date ordinal, weekday, weather code,
+temperature, festival/payday flags, revenue, peak-hour bitmask) plus a
+dense item × day quantity matrix over an item vocabulary. That costs tens
+of bytes per day instead of the ~1 KB of a dict row, and aggregates are
+array reductions.
+
+Conversion is lossless: anything a column cannot represent exactly (an
+unknown weather string, a float quantity, notes, extra keys) is kept per
+day in `extras` and restored by to_records().
+"""
+
+import datetime
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+# Same order as agent.WeatherCondition / WEATHER_CODES
+WEATHER_VALUES = ["sunny", "rainy", "cloudy", "hot"]
+WEEKDAYS = ["Monday", "Tuesday", "Wednesday", "Thursday", "Friday", "Saturday", "Sunday"]
+
+# Bits of the per-day presence/type flags
+HAS_DATE, HAS_DAY, HAS_WEATHER, HAS_TEMPERATURE, TEMPERATURE_INT, HAS_FESTIVAL, HAS_PAYDAY, \
+    HAS_REVENUE, REVENUE_INT, HAS_ITEMS, HAS_PEAK_HOURS = (1 << bit for bit in range(11))
+
+ABSENT = -1  # Quantity of an item the day did not record
+INITIAL_CAPACITY = 8
+_INT32_MAX = np.iinfo(np.int32).max
+
+
+def _is_int(value) -> bool:
+    return type(value) is int
+
+
+def _is_number(value) -> bool:
+    return type(value) in (int, float)
+
+
+def _peak_mask(hours) -> Optional[int]:
+    """Bitmask for a sorted list of distinct hours 0-23, or None if the list is anything else"""
+    if type(hours) is not list or any(not _is_int(h) or h < 0 or h > 23 for h in hours) or hours != sorted(set(hours)):
+        return None
+    mask = 0
+    for hour in hours:
+        mask |= 1 << hour
+    return mask
+
+
+class SalesColumns:
+    COLUMNS = ("date", "day_of_week", "weather", "temperature", "is_festival", "is_payday", "revenue",
+               "peak_hours", "flags")
+    DTYPES = (np.int32, np.int8, np.int8, np.float64, np.bool_, np.bool_, np.float64, np.uint32, np.uint16)
+
+    def __init__(self, capacity: int = INITIAL_CAPACITY):
+        self._size = 0
+        self._capacity = max(capacity, 1)
+        self._columns = {name: np.zeros(self._capacity, dtype=dtype) for name, dtype in zip(self.COLUMNS, self.DTYPES)}
+        self.items: List[str] = []
+        self._item_index: Dict[str, int] = {}
+        self._quantities = np.full((0, self._capacity), ABSENT, dtype=np.int32)
+        self.extras: Dict[int, Dict] = {}
+
+    # CONSTRUCTION
+    @classmethod
+    def from_records(cls, records: Iterable[Dict]) -> "SalesColumns":
+        records = list(records)
+        columns = cls(len(records) or INITIAL_CAPACITY)
+        for record in records:
+            columns.append(record)
+        return columns
+
+    def __len__(self) -> int:
+        return self._size
+
+    def _grow(self):
+        self._capacity *= 2
+        for name, column in self._columns.items():
+            grown = np.zeros(self._capacity, dtype=column.dtype)
+            grown[:self._size] = column[:self._size]
+            self._columns[name] = grown
+        quantities = np.full((len(self.items), self._capacity), ABSENT, dtype=np.int32)
+        quantities[:, :self._size] = self._quantities[:, :self._size]
+        self._quantities = quantities
+
+    def _item_row(self, item: str) -> int:
+        row = self._item_index.get(item)
+        if row is None:
+            row = self._item_index[item] = len(self.items)
+            self.items.append(item)
+            self._quantities = np.vstack([self._quantities, np.full((1, self._capacity), ABSENT, dtype=np.int32)])
+        return row
+
+    def append(self, record: Dict):
+        """Add one sales_history day (same shape as the JSON form)"""
+        if self._size == self._capacity:
+            self._grow()
+        i = self._size
+        columns = self._columns
+        flags = 0
+        extras = {}
+        for key, value in record.items():
+            if key == "date":
+                try:
+                    date = datetime.date.fromisoformat(value)
+                    if date.isoformat() != value:
+                        raise ValueError(value)
+                    columns["date"][i] = date.toordinal()
+                    flags |= HAS_DATE
+                except (TypeError, ValueError):
+                    extras[key] = value
+            elif key == "day_of_week" and value in WEEKDAYS:
+                columns["day_of_week"][i] = WEEKDAYS.index(value)
+                flags |= HAS_DAY
+            elif key == "weather" and value in WEATHER_VALUES:
+                columns["weather"][i] = WEATHER_VALUES.index(value)
+                flags |= HAS_WEATHER
+            elif key == "temperature" and _is_number(value):
+                columns["temperature"][i] = value
+                flags |= HAS_TEMPERATURE | (TEMPERATURE_INT if _is_int(value) else 0)
+            elif key == "is_festival" and type(value) is bool:
+                columns["is_festival"][i] = value
+                flags |= HAS_FESTIVAL
+            elif key == "is_payday" and type(value) is bool:
+                columns["is_payday"][i] = value
+                flags |= HAS_PAYDAY
+            elif key == "actual_revenue" and _is_number(value):
+                columns["revenue"][i] = value
+                flags |= HAS_REVENUE | (REVENUE_INT if _is_int(value) else 0)
+            elif key == "items_sold" and type(value) is dict and all(
+                    type(item) is str and _is_int(quantity) and 0 <= quantity <= _INT32_MAX
+                    for item, quantity in value.items()):
+                for item, quantity in value.items():
+                    row = self._item_row(item)  # May reallocate the matrix
+                    self._quantities[row, i] = quantity
+                flags |= HAS_ITEMS
+            elif key == "peak_hours_actual" and _peak_mask(value) is not None:
+                columns["peak_hours"][i] = _peak_mask(value)
+                flags |= HAS_PEAK_HOURS
+            else:
+                extras[key] = value
+        columns["flags"][i] = flags
+        if extras:
+            self.extras[i] = extras
+        self._size += 1
+
+    # JSON FORM
+    def record(self, i: int) -> Dict:
+        """Day i as a sales_history dict"""
+        columns = self._columns
+        flags = int(columns["flags"][i])
+        record = {}
+        if flags & HAS_DATE:
+            record["date"] = datetime.date.fromordinal(int(columns["date"][i])).isoformat()
+        if flags & HAS_DAY:
+            record["day_of_week"] = WEEKDAYS[columns["day_of_week"][i]]
+        if flags & HAS_WEATHER:
+            record["weather"] = WEATHER_VALUES[columns["weather"][i]]
+        if flags & HAS_TEMPERATURE:
+            temperature = float(columns["temperature"][i])
+            record["temperature"] = int(temperature) if flags & TEMPERATURE_INT else temperature
+        if flags & HAS_FESTIVAL:
+            record["is_festival"] = bool(columns["is_festival"][i])
+        if flags & HAS_PAYDAY:
+            record["is_payday"] = bool(columns["is_payday"][i])
+        if flags & HAS_REVENUE:
+            revenue = float(columns["revenue"][i])
+            record["actual_revenue"] = int(revenue) if flags & REVENUE_INT else revenue
+        if flags & HAS_ITEMS:
+            quantities = self._quantities[:, i]
+            record["items_sold"] = {item: int(quantities[row]) for row, item in enumerate(self.items)
+                                    if quantities[row] != ABSENT}
+        if flags & HAS_PEAK_HOURS:
+            mask = int(columns["peak_hours"][i])
+            record["peak_hours_actual"] = [hour for hour in range(24) if mask >> hour & 1]
+        record.update(self.extras.get(i, {}))
+        return record
+
+    def to_records(self, mask: Optional[np.ndarray] = None) -> List[Dict]:
+        """The JSON form; with a boolean mask, only the selected days"""
+        indices = range(self._size) if mask is None else np.flatnonzero(mask)
+        return [self.record(int(i)) for i in indices]
+
+    # COLUMNS
+    def column(self, name: str) -> np.ndarray:
+        """Read-only view of one column over the stored days"""
+        view = self._columns[name][:self._size]
+        view.flags.writeable = False
+        return view
+
+    def present(self, flag: int) -> np.ndarray:
+        return (self.column("flags") & flag) != 0
+
+    @property
+    def quantities(self) -> np.ndarray:
+        """items × days quantities with ABSENT where a day did not record the item"""
+        return self._quantities[:, :self._size]
+
+    def revenue(self) -> np.ndarray:
+        """Revenue per day, NaN where none was recorded"""
+        return np.where(self.present(HAS_REVENUE), self.column("revenue"), np.nan)
+
+    def temperature(self) -> np.ndarray:
+        return np.where(self.present(HAS_TEMPERATURE), self.column("temperature"), np.nan)
+
+    def overridden(self, keys: Tuple[str, ...]) -> np.ndarray:
+        """Days whose value for any of `keys` lives in extras rather than the columns"""
+        mask = np.zeros(self._size, dtype=bool)
+        for i, extra in self.extras.items():
+            if any(key in extra for key in keys):
+                mask[i] = True
+        return mask
+
+    # REDUCTIONS
+    def mask(self, weather: Optional[str] = None, day_of_week: Optional[str] = None) -> np.ndarray:
+        """Days recorded with the given weather and/or weekday"""
+        return self._match("weather", weather, WEATHER_VALUES, HAS_WEATHER) & \
+            self._match("day_of_week", day_of_week, WEEKDAYS, HAS_DAY)
+
+    def _match(self, name: str, value: Optional[str], labels: List[str], flag: int) -> np.ndarray:
+        if value is None:
+            return np.ones(self._size, dtype=bool)
+        if value in labels:
+            return self.present(flag) & (self.column(name) == labels.index(value))
+        # Values outside the vocabulary can only live in extras
+        mask = np.zeros(self._size, dtype=bool)
+        for i, extra in self.extras.items():
+            if extra.get(name) == value:
+                mask[i] = True
+        return mask
+
+    def mean_revenue_by(self, column: str) -> Dict[str, float]:
+        """Mean recorded revenue per weather or day_of_week value"""
+        labels, flag = (WEATHER_VALUES, HAS_WEATHER) if column == "weather" else (WEEKDAYS, HAS_DAY)
+        selected = self.present(flag) & self.present(HAS_REVENUE)
+        codes = self.column(column)[selected].astype(np.intp)
+        totals = np.bincount(codes, weights=self.column("revenue")[selected], minlength=len(labels))
+        counts = np.bincount(codes, minlength=len(labels))
+        return {labels[code]: float(totals[code] / counts[code]) for code in np.flatnonzero(counts)}
+
+    def item_totals(self, mask: Optional[np.ndarray] = None) -> Dict[str, int]:
+        """Total quantity per item over all (or the masked) days"""
+        quantities = self.quantities if mask is None else self.quantities[:, mask]
+        recorded = quantities != ABSENT
+        totals = np.where(recorded, quantities, 0).sum(axis=1)
+        return {item: int(totals[row]) for row, item in enumerate(self.items) if recorded[row].any()}
+
+    @property
+    def nbytes(self) -> int:
+        """Approximate memory held by the columns (extras excluded)"""
+        return sum(column.nbytes for column in self._columns.values()) + self._quantities.nbytes
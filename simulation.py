@@ -0,0 +1,45 @@
+#!/usr/bin/env python3
+"""
+Monte Carlo scenarios for quantile revenue and stock ranges
+A vendor-day is replayed under thousands of scenarios at once: each
+draws whether the weather forecast holds (if not, another condition is
+picked), a temperature error, and a lognormal residual per target
+(revenue and every item) with the spread calibration measured for it.
+The agent evaluates its demand model on the scenario arrays and the
+quantiles are read off the scenario axis.
+
+Draws are seeded from vendor id and date, so a vendor-day gets the same
+quantiles from predict() and predict_batch(), run after run.
+"""
+
+import zlib
+from typing import Dict, List, Tuple
+
+import numpy as np
+
+DEFAULT_SCENARIOS = 1000
+QUANTILES = {"p10": 10, "p50": 50, "p90": 90}
+WEATHER_FORECAST_ACCURACY = 0.7  # Share of days the forecast condition holds
+TEMPERATURE_FORECAST_SD = 2.0  # °C
+
+
+def scenario_rng(vendor_id: str, date: str) -> np.random.Generator:
+    return np.random.default_rng(zlib.crc32(f"{vendor_id}|{date}".encode("utf-8")))
+
+
+def scenario_draws(vendor_id: str, date: str, weather_code: int, temperature: int, conditions: int,
+                   targets: int, scenarios: int) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Weather codes, whole-degree temperatures and standard normal residuals (targets × scenarios) of one day"""
+    rng = scenario_rng(vendor_id, date)
+    missed = rng.random(scenarios) >= WEATHER_FORECAST_ACCURACY
+    # A missed forecast is any of the other conditions, equally likely
+    other = (weather_code + rng.integers(1, conditions, scenarios)) % conditions
+    weather_codes = np.where(missed, other, weather_code)
+    temperatures = np.rint(temperature + rng.normal(0.0, TEMPERATURE_FORECAST_SD, scenarios))
+    return weather_codes, temperatures, rng.standard_normal((targets, scenarios))
+
+
+def quantiles(samples: np.ndarray) -> List[Dict[str, int]]:
+    """QUANTILES of each row of a targets × scenarios array, truncated to whole rupees/units"""
+    values = np.trunc(np.percentile(samples, list(QUANTILES.values()), axis=-1)).astype(int).T.tolist()
+    return [dict(zip(QUANTILES, row)) for row in values]
@@ -0,0 +1,102 @@
+#!/usr/bin/env python3
+"""
+Calibration must recover the multipliers that generated the sales
+Synthetic days are drawn from known weather, temperature, festival,
+payday and weekend multipliers with a little log-normal noise, folded
+into cell sums, and fitted; the fit has to land on the known factors and
+noise, whether a vendor is solved alone or stacked with others.
+"""
+
+import datetime
+import math
+import os
+import random
+import sys
+
+import pytest
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.append(ROOT)
+
+from calibration import (calibration_stats, fit_priors, fit_targets, normal_equations, prior_vector,
+                         update_calibration_stats)
+
+BASE_REVENUE = 1000.0
+NOISE = 0.05
+KNOWN = {
+    "level": 1.3,
+    "weather": {"sunny": 1.0, "rainy": 0.6, "cloudy": 0.9, "hot": 1.1},
+    "temperature": {"cold": 0.8, "mild": 1.0, "warm": 1.05, "hot": 1.2, "extreme": 0.7},
+    "festival": 1.5,
+    "payday": 1.2,
+    "weekend": 1.25
+}
+BAND_TEMPERATURES = {"cold": 5, "mild": 20, "warm": 32, "hot": 38, "extreme": 42}
+
+
+def synthetic_days(count: int, rng: random.Random):
+    start = datetime.date(2024, 1, 1)
+    for k in range(count):
+        date = start + datetime.timedelta(days=k)
+        weather = rng.choice(list(KNOWN["weather"]))
+        band = rng.choice(list(KNOWN["temperature"]))
+        is_festival, is_payday = rng.random() < 0.15, rng.random() < 0.25
+        factor = KNOWN["level"] * KNOWN["weather"][weather] * KNOWN["temperature"][band]
+        factor *= (KNOWN["festival"] if is_festival else 1.0) * (KNOWN["payday"] if is_payday else 1.0)
+        factor *= KNOWN["weekend"] if date.weekday() >= 5 else 1.0
+        yield {
+            "date": date.isoformat(), "day_of_week": date.strftime("%A"), "weather": weather,
+            "temperature": BAND_TEMPERATURES[band], "is_festival": is_festival, "is_payday": is_payday,
+            "actual_revenue": round(BASE_REVENUE * factor * math.exp(rng.gauss(0.0, NOISE)), 2),
+            "items_sold": {"Masala Chai": max(1, round(40 * factor))}
+        }
+
+
+def fit(cells_per_target, groups):
+    xtx, xty, yty = normal_equations(cells_per_target, [math.log(BASE_REVENUE)] * len(cells_per_target))
+    table = prior_vector({}, {}, 1.0, 1.0)
+    return fit_targets(xtx, xty, yty, groups, fit_priors(xtx, xty, groups, table))
+
+
+def assert_known(factors, tolerance):
+    assert factors["level"] == pytest.approx(KNOWN["level"], rel=tolerance)
+    for kind in ("weather", "temperature"):
+        for key, value in KNOWN[kind].items():
+            assert factors[kind][key] == pytest.approx(value, rel=tolerance), (kind, key)
+    for key in ("festival", "payday", "weekend"):
+        assert factors[key] == pytest.approx(KNOWN[key], rel=tolerance), key
+
+
+def test_recovers_known_multipliers():
+    stats = calibration_stats(synthetic_days(3000, random.Random(11)))
+    factors = fit([stats["revenue"]], ["market"])[0]
+    assert factors["days"] == 3000
+    assert_known(factors, tolerance=0.03)
+    assert factors["sigma"] == pytest.approx(NOISE, abs=0.01)
+
+
+def test_item_quantities_fold_day_by_day():
+    stats = {}
+    for day in synthetic_days(3000, random.Random(3)):
+        update_calibration_stats(stats, day)
+    cells = stats["items"]["Masala Chai"]
+    xtx, xty, yty = normal_equations([cells], [math.log(40)])
+    factors = fit_targets(xtx, xty, yty, ["market"], fit_priors(xtx, xty, ["market"], prior_vector({}, {}, 1.0, 1.0)))[0]
+    # Whole units round the smaller cells, so quantities land a little wider than revenue
+    assert_known(factors, tolerance=0.05)
+
+
+def test_stacked_targets_match_solo_and_thin_history_stays_near_prior():
+    rich = calibration_stats(synthetic_days(3000, random.Random(5)))["revenue"]
+    thin = calibration_stats(synthetic_days(3, random.Random(6)))["revenue"]
+    stacked = fit([rich, thin, {}], ["market", "market", "market"])
+    assert stacked[2] is None  # No days, no fit
+    assert_known(stacked[0], tolerance=0.03)
+    # Three days can't move rainy weather far from its location type's pooled fit
+    assert stacked[1]["days"] == 3
+    assert abs(math.log(stacked[1]["weather"]["rainy"] / stacked[0]["weather"]["rainy"])) < 0.2
+
+    xtx, xty, yty = normal_equations([rich, thin], [math.log(BASE_REVENUE)] * 2)
+    priors = fit_priors(xtx, xty, ["market", "market"], prior_vector({}, {}, 1.0, 1.0))
+    solo = fit_targets(xtx[:1], xty[:1], yty[:1], ["market"], priors)[0]
+    assert solo == fit_targets(xtx, xty, yty, ["market", "market"], priors)[0]
@@ -0,0 +1,91 @@
+#!/usr/bin/env python3
+"""
+ingest_sales() must keep the good records of a dirty stream
+Bad records (unknown vendor, bad date, weather or quantities) are skipped
+and reported; the good ones are stored and counted in online_stats, also
+when the stream itself raises part-way, and survive a reload.
+"""
+
+import os
+import shutil
+import sys
+
+import pytest
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.append(ROOT)
+
+from agent import SVDPAgent
+
+BAD = [
+    {"vendor_id": "nobody", "date": "2027-01-05"},
+    {"date": "2027-01-05"},
+    {"vendor_id": "{vendor}", "date": "2027-13-01"},
+    {"vendor_id": "{vendor}", "date": "2027-01-06", "weather": "foggy"},
+    {"vendor_id": "{vendor}", "date": "2027-01-07", "actual_revenue": "lots"},
+    {"vendor_id": "{vendor}", "date": "2027-01-08", "items_sold": {"Tea": "many"}},
+]
+
+
+def good(vendor_id: str, day: int) -> dict:
+    return {"vendor_id": vendor_id, "date": f"2027-01-{day:02d}", "weather": "rainy", "temperature": 26,
+            "actual_revenue": 400 + day, "items_sold": {"Masala Chai": 10 + day}}
+
+
+@pytest.fixture
+def memory_file(tmp_path):
+    memory_file = str(tmp_path / "memory.json")
+    shutil.copy(os.path.join(ROOT, "memory.json"), memory_file)
+    return memory_file
+
+
+def open_agent(memory_file: str) -> SVDPAgent:
+    return SVDPAgent(memory_file=memory_file, prompts_file=os.path.join(ROOT, "prompts", "prompt_templates.txt"))
+
+
+def revenue_days(agent: SVDPAgent, vendor_id: str) -> int:
+    return sum(day.get("actual_revenue") is not None for day in agent.store.get_history(vendor_id))
+
+
+def test_bad_records_skipped_good_ones_committed(memory_file):
+    agent = open_agent(memory_file)
+    vendor_id = next(iter(agent.list_vendors()))
+    before = agent.store.history_length(vendor_id)
+    bad = [{key: value.format(vendor=vendor_id) if key == "vendor_id" else value for key, value in record.items()}
+           for record in BAD]
+    records = [good(vendor_id, 1), *bad[:3], good(vendor_id, 2), *bad[3:], good(vendor_id, 3)]
+
+    result = agent.ingest_sales(iter(records))
+    assert result["ingested"] == 3 and result["skipped"] == len(BAD)
+    assert len(result["errors"]) == 5  # Sample of reasons, capped
+    agent.close()
+
+    agent = open_agent(memory_file)
+    history = agent.store.get_history(vendor_id)
+    assert len(history) == before + 3
+    assert [day["date"] for day in history[-3:]] == ["2027-01-01", "2027-01-02", "2027-01-03"]
+    assert history[-1]["day_of_week"] == "Sunday"
+    stats = agent.store.get_vendor(vendor_id)["learned_patterns"]["online_stats"]
+    assert stats["revenue"]["n"] == revenue_days(agent, vendor_id)
+    agent.close()
+
+
+def test_stream_that_raises_keeps_what_was_read(memory_file):
+    agent = open_agent(memory_file)
+    vendor_id = next(iter(agent.list_vendors()))
+    before = agent.store.history_length(vendor_id)
+
+    def export():
+        yield good(vendor_id, 1)
+        yield good(vendor_id, 2)
+        raise RuntimeError("export died")
+
+    with pytest.raises(RuntimeError):
+        agent.ingest_sales(export())
+    agent.close()
+
+    agent = open_agent(memory_file)
+    assert agent.store.history_length(vendor_id) == before + 2
+    stats = agent.store.get_vendor(vendor_id)["learned_patterns"]["online_stats"]
+    assert stats["revenue"]["n"] == revenue_days(agent, vendor_id)
+    agent.close()
@@ -0,0 +1,80 @@
+#!/usr/bin/env python3
+"""
+memory.json plus its journal must come back exactly as it was written
+Covers replaying the journal over the snapshot, a torn last line left by
+a crash mid-append, and a crash between rewriting the snapshot and
+truncating the journal.
+"""
+
+import os
+import sys
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.append(ROOT)
+
+from memory_store import JSONMemoryStore, empty_vendor
+
+PROFILE = {"name": "Journal Chai", "location": "Karol Bagh", "location_type": "market"}
+
+
+def sale(day: int) -> dict:
+    return {"date": f"2025-05-{day:02d}", "weather": "sunny", "actual_revenue": 100 * day}
+
+
+def write_store(memory_file: str, days: int, compact_every: int = 1000) -> JSONMemoryStore:
+    store = JSONMemoryStore(memory_file, compact_every=compact_every)
+    store.load()
+    store.put_vendor("chai", empty_vendor(PROFILE))
+    for day in range(1, days + 1):
+        store.append_sale("chai", sale(day))
+    store.set_patterns("chai", {"best_weather": "sunny"})
+    store.flush()
+    return store
+
+
+def reload(memory_file: str) -> JSONMemoryStore:
+    store = JSONMemoryStore(memory_file)
+    store.load()
+    return store
+
+
+def test_journal_replays_over_snapshot(tmp_path):
+    memory_file = str(tmp_path / "memory.json")
+    write_store(memory_file, days=5)
+    assert not os.path.exists(memory_file)  # Everything is still in the journal
+    store = reload(memory_file)
+    assert store.get_history("chai") == [sale(day) for day in range(1, 6)]
+    assert store.get_vendor("chai")["learned_patterns"] == {"best_weather": "sunny"}
+    assert store.list_profiles()["chai"] == PROFILE
+
+
+def test_torn_last_line_is_dropped(tmp_path):
+    memory_file = str(tmp_path / "memory.json")
+    write_store(memory_file, days=3)
+    with open(memory_file + ".journal", 'a', encoding='utf-8') as f:
+        f.write('{"seq": 99, "op": "sale", "vendor_id": "chai", "data": {"date": "2025-05-0')
+    store = reload(memory_file)
+    assert store.get_history("chai") == [sale(day) for day in range(1, 4)]
+    # New writes continue after the last complete record and survive a reload
+    store.append_sale("chai", sale(4))
+    store.close()
+    assert reload(memory_file).get_history("chai") == [sale(day) for day in range(1, 5)]
+
+
+def test_records_already_in_snapshot_are_not_applied_twice(tmp_path):
+    memory_file = str(tmp_path / "memory.json")
+    store = write_store(memory_file, days=4)
+    with open(memory_file + ".journal", encoding='utf-8') as f:
+        journal = f.read()
+    store.compact()
+    # Crash after the snapshot was replaced but before the journal was truncated
+    with open(memory_file + ".journal", 'w', encoding='utf-8') as f:
+        f.write(journal)
+    assert reload(memory_file).get_history("chai") == [sale(day) for day in range(1, 5)]
+
+
+def test_compaction_folds_journal_into_snapshot(tmp_path):
+    memory_file = str(tmp_path / "memory.json")
+    write_store(memory_file, days=10, compact_every=5)
+    assert os.path.getsize(memory_file + ".journal") == 0
+    assert reload(memory_file).history_length("chai") == 10
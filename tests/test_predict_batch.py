@@ -0,0 +1,96 @@
+#!/usr/bin/env python3
+"""
+predict_batch() must return exactly what predict() returns for every vendor-day
+Checked over a grid of weather × temperature × festival × payday ×
+weekend days, for the stored vendors, ad hoc (cold-start) vendors of
+every location type and vendors with calibrated multipliers, with and
+without simulation and the inventory optimizer.
+"""
+
+import datetime
+import itertools
+import os
+import random
+import shutil
+import sys
+
+import pytest
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.append(ROOT)
+
+from agent import DayContext, LocationType, SVDPAgent, VendorProfile, WeatherCondition
+
+TEMPERATURES = [5, 24, 33, 37, 43]  # cold, mild, warm, hot (>35), extreme (>40)
+DAYS = [("2025-06-16", "Monday"), ("2025-06-21", "Saturday")]
+MENU = ["Rajma Rice", "Samosa", "Masala Chai", "Lassi", "Cold Drink"]
+
+
+def day_grid():
+    return [
+        DayContext(date, day_of_week, weather, is_festival, is_payday, temperature)
+        for weather, temperature, is_festival, is_payday, (date, day_of_week)
+        in itertools.product(WeatherCondition, TEMPERATURES, (False, True), (False, True), DAYS)
+    ]
+
+
+def calibrated_vendors(agent: SVDPAgent, rng: random.Random):
+    """Two vendors with 60 ingested days each, then a fleet calibration"""
+    vendors = [
+        VendorProfile("Calibrated Chai", "Lajpat Nagar", LocationType.MARKET, MENU, 900, [8, 18], investment_capacity=400),
+        VendorProfile("Calibrated Thali", "Sector 62", LocationType.OFFICE_AREA, MENU[:3], 1500, [13, 19])
+    ]
+    start = datetime.date(2025, 3, 1)
+    for vendor in vendors:
+        agent.predict(vendor, day_grid()[0])  # Creates the vendor record
+        agent.ingest_sales(
+            {
+                "vendor_id": vendor.vendor_id,
+                "date": (start + datetime.timedelta(days=k)).isoformat(),
+                "weather": rng.choice(list(WeatherCondition)).value,
+                "temperature": rng.randint(8, 44),
+                "is_festival": rng.random() < 0.1,
+                "is_payday": rng.random() < 0.25,
+                "actual_revenue": rng.randint(300, 2000),
+                "items_sold": {item: rng.randint(2, 40) for item in vendor.items_sold}
+            }
+            for k in range(60)
+        )
+    agent.calibrate()
+    for vendor in vendors:
+        assert agent.store.get_vendor(vendor.vendor_id)["learned_patterns"]["calibration"]["revenue"] is not None
+    return vendors
+
+
+@pytest.fixture(scope="module", params=[{}, {"simulations": 200, "optimize_inventory": True}],
+                ids=["plain", "simulated_optimized"])
+def agent_and_vendors(request, tmp_path_factory):
+    directory = tmp_path_factory.mktemp("memory")
+    memory_file = str(directory / "memory.json")
+    shutil.copy(os.path.join(ROOT, "memory.json"), memory_file)
+    agent = SVDPAgent(memory_file=memory_file, prompts_file=os.path.join(ROOT, "prompts", "prompt_templates.txt"),
+                      **request.param)
+    rng = random.Random(7)
+    vendors = [agent.get_vendor_profile(vendor_id) for vendor_id in agent.list_vendors()]
+    vendors += [
+        VendorProfile(f"Ad Hoc {location_type.value}", "Somewhere", location_type, MENU, rng.randint(200, 2000),
+                      [12, 18], investment_capacity=rng.choice([None, 250, 5000]))
+        for location_type in LocationType
+    ]
+    vendors += calibrated_vendors(agent, rng)
+    yield agent, vendors
+    agent.close()
+
+
+def test_predict_batch_matches_predict(agent_and_vendors):
+    agent, vendors = agent_and_vendors
+    days = day_grid()
+    batch = agent.predict_batch(vendors, days)
+    assert len(batch) == len(vendors) and all(len(row) == len(days) for row in batch)
+    mismatches = [
+        (vendor.vendor_id, day)
+        for vendor, outputs in zip(vendors, batch)
+        for day, output in zip(days, outputs)
+        if agent.predict(vendor, day) != output
+    ]
+    assert not mismatches, f"{len(mismatches)} of {len(vendors) * len(days)} differ, first: {mismatches[0]}"
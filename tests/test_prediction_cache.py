@@ -0,0 +1,75 @@
+#!/usr/bin/env python3
+"""
+Cached predictions must go stale exactly when the vendor's memory changes
+A repeated request is a hit; an ingested sale or a profile edit bumps the
+vendor's version and the next request misses, while other vendors keep
+their entries. Also covers the cache's own LRU, TTL and copy semantics.
+"""
+
+import os
+import shutil
+import sys
+
+import pytest
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.append(ROOT)
+
+from agent import DayContext, SVDPAgent, WeatherCondition
+from prediction_cache import PredictionCache
+
+DAY = DayContext("2025-06-21", "Saturday", WeatherCondition.SUNNY, False, True, 34)
+
+
+@pytest.fixture
+def agent(tmp_path):
+    memory_file = str(tmp_path / "memory.json")
+    shutil.copy(os.path.join(ROOT, "memory.json"), memory_file)
+    agent = SVDPAgent(memory_file=memory_file, prompts_file=os.path.join(ROOT, "prompts", "prompt_templates.txt"))
+    yield agent
+    agent.close()
+
+
+def test_repeat_request_hits(agent):
+    vendor = agent.get_vendor_profile(next(iter(agent.list_vendors())))
+    first = agent.predict(vendor, DAY)
+    assert agent.predict(vendor, DAY) == first
+    assert agent.prediction_cache.stats()["hits"] == 1
+
+
+def test_version_bump_misses(agent):
+    vendor_id, other_id = list(agent.list_vendors())[:2]
+    vendor, other = agent.get_vendor_profile(vendor_id), agent.get_vendor_profile(other_id)
+    agent.predict(vendor, DAY)
+    agent.predict(other, DAY)
+    version = agent.store.vendor_version(vendor_id)
+    agent.ingest_sales({
+        "vendor_id": vendor_id, "date": "2025-06-14", "weather": "sunny", "temperature": 34,
+        "is_festival": False, "is_payday": True, "actual_revenue": 5000,
+        "items_sold": {item: 60 for item in vendor.items_sold}
+    })
+    assert agent.store.vendor_version(vendor_id) > version
+
+    misses = agent.prediction_cache.stats()["misses"]
+    agent.predict(vendor, DAY)
+    assert agent.prediction_cache.stats()["misses"] == misses + 1
+    # The untouched vendor's entry is still good
+    hits = agent.prediction_cache.stats()["hits"]
+    agent.predict(other, DAY)
+    assert agent.prediction_cache.stats()["hits"] == hits + 1
+
+
+def test_lru_ttl_and_copies():
+    cache = PredictionCache(max_entries=2, ttl_seconds=300.0)
+    keys = [PredictionCache.make_key(f"v{k}", 0, {"weather": "sunny"}) for k in range(3)]
+    for key in keys:
+        cache.put(key, {"items": [1]})
+    assert cache.get(keys[0]) is None and cache.stats()["evictions"] == 1
+    cached = cache.get(keys[2])
+    cached["items"].append(2)
+    assert cache.get(keys[2]) == {"items": [1]}
+    assert cache.get(PredictionCache.make_key("v2", 1, {"weather": "sunny"})) is None
+
+    expiring = PredictionCache(ttl_seconds=-1.0)  # Already expired when stored
+    expiring.put(keys[0], "value")
+    assert expiring.get(keys[0]) is None and expiring.stats()["expirations"] == 1
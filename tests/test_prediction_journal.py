@@ -0,0 +1,102 @@
+#!/usr/bin/env python3
+"""
+The prediction journal must not lose rows across a day rollover
+Two journals share one directory (as the web UI and CLI share logs/);
+when the day turns over, yesterday's file is compressed and every row
+written by either of them can still be read back.
+"""
+
+import datetime
+import os
+import sys
+import time
+
+import pytest
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.append(ROOT)
+
+import prediction_journal
+from prediction_journal import PredictionJournal
+
+DAY_ONE = datetime.date(2025, 6, 1)
+
+
+class Clock:
+    """Stands in for prediction_journal's datetime module, with a settable today"""
+    today = DAY_ONE
+
+    class date(datetime.date):
+        @classmethod
+        def today(cls):
+            return Clock.today
+
+    class datetime(datetime.datetime):
+        @classmethod
+        def now(cls, tz=None):
+            return datetime.datetime.combine(Clock.today, datetime.time(12))
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    Clock.today = DAY_ONE
+    monkeypatch.setattr(prediction_journal, "datetime", Clock)
+    return Clock
+
+
+def record(journal: PredictionJournal, vendor_id: str, quantity: int):
+    journal.record(vendor_id, vendor_id.title(), "Sadar Bazaar", "2025-06-02", {"Masala Chai": quantity, "Samosa": 1},
+                   (400, 600), [8, 17], 0.5)
+
+
+def backdate(path: str, day: datetime.date):
+    stamp = datetime.datetime.combine(day, datetime.time(23)).timestamp()
+    os.utime(path, (stamp, stamp))
+
+
+def test_rollover_compresses_without_losing_rows(tmp_path, clock):
+    directory = str(tmp_path / "logs")
+    web = PredictionJournal(directory, flush_interval=0.05)
+    cli = PredictionJournal(directory, flush_interval=0.05)
+    for quantity in range(1, 6):
+        record(web, "web", quantity)
+        record(cli, "cli", quantity)
+    web.flush()
+    cli.flush()
+    day_one_file = web.path_for(DAY_ONE.isoformat())
+    backdate(day_one_file, DAY_ONE)
+
+    clock.today = DAY_ONE + datetime.timedelta(days=1)
+    for _ in range(100):  # The flushers sweep on their next tick
+        if not os.path.exists(day_one_file):
+            break
+        time.sleep(0.02)
+    assert sorted(os.listdir(directory)) == [os.path.basename(day_one_file) + ".gz"]
+    assert len(list(web.read())) == 10
+
+    # Late rows for the compressed day are added to the archive, not swapped in for it
+    clock.today = DAY_ONE
+    record(cli, "cli", 9)
+    cli.flush()
+    backdate(day_one_file, DAY_ONE)
+    clock.today = DAY_ONE + datetime.timedelta(days=1)
+    web._compress_closed_days()
+    predictions = list(web.read())
+    assert len(predictions) == 11
+    assert sorted(p["recommended_items"]["Masala Chai"] for p in predictions if p["vendor_id"] == "cli") == \
+        [1, 2, 3, 4, 5, 9]
+    web.close()
+    cli.close()
+
+
+def test_file_written_today_is_not_compressed(tmp_path, clock):
+    directory = str(tmp_path / "logs")
+    journal = PredictionJournal(directory, flush_interval=0)
+    record(journal, "web", 1)
+    journal.flush()
+    # Still being written to when the next day's sweep runs
+    clock.today = DAY_ONE + datetime.timedelta(days=1)
+    os.utime(journal.path_for(DAY_ONE.isoformat()))
+    journal._compress_closed_days()
+    assert os.path.exists(journal.path_for(DAY_ONE.isoformat()))
+    journal.close()
@@ -0,0 +1,96 @@
+#!/usr/bin/env python3
+"""
+compact_history() must not change a single prediction
+The repo's vendors get long synthetic histories; predictions over a grid
+of days are taken before compaction, after it and after reopening the
+store, on every backend, with and without calibration.
+"""
+
+import copy
+import datetime
+import itertools
+import json
+import os
+import random
+import sys
+
+import pytest
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.append(ROOT)
+
+from agent import DayContext, SVDPAgent, WeatherCondition
+from memory_store import migrate_memory, open_store
+from retention import RetentionPolicy
+
+POLICY = RetentionPolicy(raw_days=120)
+BACKENDS = {"json": "memory.json", "columnar": "memory.json", "sqlite": "memory.db", "sharded": "shards/"}
+
+
+def long_history_memory(path: str, days: int = 500):
+    """The repo's memory.json with each recorded vendor's days resampled into `days` consecutive dates"""
+    with open(os.path.join(ROOT, "memory.json"), encoding='utf-8') as f:
+        memory = json.load(f)
+    rng = random.Random(5)
+    start = datetime.date(2023, 1, 1)
+    for vendor in memory["vendors"].values():
+        if not vendor["sales_history"]:
+            continue  # Stays a vendor without history
+        history = []
+        for k in range(days):
+            date = start + datetime.timedelta(days=k)
+            day = copy.deepcopy(rng.choice(vendor["sales_history"]))
+            day.update(date=date.isoformat(), day_of_week=date.strftime("%A"), is_payday=date.day == 1)
+            history.append(day)
+        vendor.update(sales_history=history, learned_patterns={}, performance_metrics={})
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(memory, f)
+
+
+def day_grid():
+    return [
+        DayContext(date, day_of_week, weather, is_festival, False, temperature)
+        for weather, temperature, is_festival, (date, day_of_week)
+        in itertools.product(WeatherCondition, (8, 33, 42), (False, True),
+                             [("2025-06-16", "Monday"), ("2025-06-21", "Saturday")])
+    ]
+
+
+def open_agent(path: str, backend: str) -> SVDPAgent:
+    store = open_store(path, columnar_history=backend == "columnar")
+    return SVDPAgent(memory_file=path, store=store, cache_size=0,
+                     prompts_file=os.path.join(ROOT, "prompts", "prompt_templates.txt"))
+
+
+def predictions(agent: SVDPAgent, vendor_ids):
+    return agent.predict_batch([agent.get_vendor_profile(vendor_id) for vendor_id in vendor_ids], day_grid())
+
+
+@pytest.mark.parametrize("calibrated", [False, True], ids=["tables", "calibrated"])
+@pytest.mark.parametrize("backend", list(BACKENDS))
+def test_predictions_survive_compaction(tmp_path, backend, calibrated):
+    seed = str(tmp_path / "seed.json")
+    long_history_memory(seed)
+    path = str(tmp_path / BACKENDS[backend])
+    if backend in ("json", "columnar"):
+        os.replace(seed, path)
+    else:
+        migrate_memory(seed, path)
+
+    agent = open_agent(path, backend)
+    if calibrated:
+        agent.calibrate()
+    vendor_ids = list(agent.list_vendors())
+    before = predictions(agent, vendor_ids)
+    summary = agent.compact_history(policy=POLICY)
+    assert summary["compacted"] > 0 and summary["days_rolled_up"] > 0
+    for vendor_id in vendor_ids:
+        assert agent.store.history_length(vendor_id) <= POLICY.raw_days + POLICY.slack_days
+    assert predictions(agent, vendor_ids) == before
+    agent.close()
+
+    agent = open_agent(path, backend)
+    assert predictions(agent, vendor_ids) == before
+    # Nothing left to roll up straight after a compaction
+    assert agent.compact_history(policy=POLICY)["compacted"] == 0
+    agent.close()
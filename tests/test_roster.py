@@ -0,0 +1,87 @@
+#!/usr/bin/env python3
+"""
+Roster import must normalize what it can and reject what it can't
+Covers the per-row normalization (location type aliases, wrapping
+operating-day ranges, levels), the reject tally, and importing
+data/sample_vendors.csv plus a dirty roster into a fresh memory.
+"""
+
+import csv
+import os
+import sys
+
+import pytest
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.append(ROOT)
+
+from agent import SVDPAgent, make_vendor_id
+from roster import RosterImportReport, import_roster, iter_roster, normalize_row
+
+SAMPLE = os.path.join(ROOT, "data", "sample_vendors.csv")
+
+
+def row(**overrides) -> dict:
+    base = {
+        "vendor_name": " Gupta Chaat ", "location": "Chandni Chowk", "location_type": "Tourist Area",
+        "items_sold": "Aloo Tikki, Pani Puri,,", "avg_daily_revenue": "1200", "peak_hours": "17,18,19",
+        "operating_days": "Friday-Tuesday", "investment_capacity": "", "years_experience": "6",
+        "customer_base_size": "", "seasonal_variation": "very high", "competition_level": "low"
+    }
+    return dict(base, **overrides)
+
+
+def test_normalize_row():
+    vendor_id, profile = normalize_row(row())
+    assert vendor_id == make_vendor_id("Gupta Chaat", "Chandni Chowk")
+    assert profile["name"] == "Gupta Chaat"
+    assert profile["location_type"] == "market" and profile["location_type_raw"] == "tourist_area"
+    assert profile["items_sold"] == ["Aloo Tikki", "Pani Puri"]
+    assert profile["operating_days"] == ["Friday", "Saturday", "Sunday", "Monday", "Tuesday"]
+    assert profile["investment_capacity"] is None and profile["years_experience"] == 6
+    assert profile["seasonal_variation"] == "Very High" and profile["competition_level"] == "Low"
+    assert normalize_row(row(peak_hours="", location_type="college"))[1]["peak_hours"] == [12, 13, 18, 19]
+
+
+@pytest.mark.parametrize("overrides", [
+    {"vendor_name": "  "},
+    {"location_type": "spaceport"},
+    {"items_sold": " , "},
+    {"avg_daily_revenue": "0"},
+    {"avg_daily_revenue": "lots"},
+    {"peak_hours": "9,25"},
+    {"operating_days": "Monday-Someday"},
+    {"years_experience": "-2"},
+    {"competition_level": "fierce"},
+])
+def test_normalize_row_rejects(overrides):
+    with pytest.raises(ValueError):
+        normalize_row(row(**overrides))
+
+
+def test_import_sample_and_dirty_roster(tmp_path):
+    roster_file = str(tmp_path / "roster.csv")
+    with open(SAMPLE, encoding='utf-8', newline='') as f:
+        sample_rows = list(csv.DictReader(f))
+    dirty = [row(), row(avg_daily_revenue="-5"), row(vendor_name="Nameless", location_type="moon")]
+    with open(roster_file, 'w', encoding='utf-8', newline='') as f:
+        writer = csv.DictWriter(f, fieldnames=list(sample_rows[0]))
+        writer.writeheader()
+        writer.writerows(sample_rows + dirty)
+
+    report = RosterImportReport()
+    assert len(list(iter_roster(roster_file, report))) == len(sample_rows) + 1
+    assert report.rejected == 2 and [line for line, _ in report.reject_samples] == \
+        [len(sample_rows) + 3, len(sample_rows) + 4]
+
+    memory_file = str(tmp_path / "memory.json")
+    agent = SVDPAgent(memory_file=memory_file, prompts_file=os.path.join(ROOT, "prompts", "prompt_templates.txt"))
+    report = import_roster(agent, roster_file, batch_size=2)
+    assert (report.rows, report.imported, report.rejected) == (len(sample_rows) + 3, len(sample_rows) + 1, 2)
+    agent.close()
+
+    agent = SVDPAgent(memory_file=memory_file, prompts_file=os.path.join(ROOT, "prompts", "prompt_templates.txt"))
+    vendors = agent.list_vendors()
+    assert len(vendors) == len(sample_rows) + 1
+    assert vendors[make_vendor_id("Gupta Chaat", "Chandni Chowk")]["location_type"] == "market"
+    agent.close()
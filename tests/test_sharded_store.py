@@ -0,0 +1,72 @@
+#!/usr/bin/env python3
+"""
+The sharded store must never lose a change to eviction
+With a small resident-row budget, vendors are evicted least recently used
+while sales keep arriving; dirty vendors have to be written before they
+are dropped, and a fresh store has to see every sale.
+"""
+
+import os
+import sys
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.append(ROOT)
+
+from memory_store import ShardedMemoryStore, empty_vendor
+
+VENDORS = [f"vendor_{k}" for k in range(6)]
+
+
+def sale(vendor_id: str, day: int) -> dict:
+    return {"date": f"2025-04-{day:02d}", "weather": "cloudy", "actual_revenue": 10 * day, "vendor": vendor_id}
+
+
+def filled_store(directory: str, days: int) -> ShardedMemoryStore:
+    store = ShardedMemoryStore(directory, max_resident_rows=25)
+    store.load()
+    for vendor_id in VENDORS:
+        store.put_vendor(vendor_id, empty_vendor({"name": vendor_id}))
+    for day in range(1, days + 1):
+        for vendor_id in VENDORS:
+            store.append_sale(vendor_id, sale(vendor_id, day))
+    return store
+
+
+def test_eviction_writes_dirty_vendors(tmp_path):
+    directory = str(tmp_path / "shards")
+    store = filled_store(directory, days=10)
+    # 6 vendors x 11 rows cannot all stay resident under a 25-row budget
+    assert store._resident_rows <= 25
+    evicted = [vendor_id for vendor_id in VENDORS if vendor_id not in store._resident]
+    assert evicted
+    for vendor_id in evicted:
+        assert os.path.exists(store._shard_file(vendor_id))
+        # Read back from its file on the next touch
+        assert store.get_history(vendor_id) == [sale(vendor_id, day) for day in range(1, 11)]
+
+
+def test_reopened_store_sees_every_sale(tmp_path):
+    directory = str(tmp_path / "shards")
+    filled_store(directory, days=12).close()
+    store = ShardedMemoryStore(directory, max_resident_rows=25)
+    store.load()
+    for vendor_id in VENDORS:
+        assert store.history_length(vendor_id) == 12
+        assert store.get_history(vendor_id) == [sale(vendor_id, day) for day in range(1, 13)]
+        assert store.list_profiles()[vendor_id] == {"name": vendor_id}
+
+
+def test_sales_leave_index_profile_alone(tmp_path):
+    directory = str(tmp_path / "shards")
+    store = filled_store(directory, days=1)
+    store.flush()
+    # A resident vendor's counts only reach the index when its file is written
+    store.append_sale(VENDORS[-1], sale(VENDORS[-1], 2))
+    assert not store.index._pending
+    assert store.history_length(VENDORS[-1]) == 2
+    store.upsert_profile(VENDORS[-1], {"name": "renamed"})
+    store.close()
+    store = ShardedMemoryStore(directory)
+    store.load()
+    assert store.list_profiles()[VENDORS[-1]] == {"name": "renamed"}
+    assert store.history_length(VENDORS[-1]) == 2
@@ -0,0 +1,81 @@
+#!/usr/bin/env python3
+"""
+memory.db must hold exactly what memory.json does
+Migrates the repo's memory.json into SQLite and checks every vendor
+record, the indexed history lookups, writes surviving a reopen, and that
+the agent predicts the same from either backend.
+"""
+
+import os
+import shutil
+import sys
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.append(ROOT)
+
+from agent import DayContext, SVDPAgent, WeatherCondition
+from memory_store import JSONMemoryStore, SQLiteMemoryStore, migrate_memory, open_store
+
+
+def migrated(tmp_path):
+    memory_file = str(tmp_path / "memory.json")
+    shutil.copy(os.path.join(ROOT, "memory.json"), memory_file)
+    db_file = str(tmp_path / "memory.db")
+    migrate_memory(memory_file, db_file)
+    source = JSONMemoryStore(memory_file)
+    source.load()
+    return memory_file, source, db_file
+
+
+def test_migrate_round_trip(tmp_path):
+    _, source, db_file = migrated(tmp_path)
+    target = open_store(db_file)
+    assert isinstance(target, SQLiteMemoryStore)
+    memory = target.load()
+    assert memory["patterns"] == source.data.get("patterns", {})
+    assert target.list_profiles() == source.list_profiles()
+    for vendor_id in source.list_profiles():
+        expected = source.get_vendor(vendor_id)
+        record = target.get_vendor(vendor_id)
+        assert record["profile"] == expected["profile"]
+        assert record["learned_patterns"] == expected["learned_patterns"]
+        assert record["performance_metrics"] == expected.get("performance_metrics", {})
+        assert target.get_history(vendor_id) == source.get_history(vendor_id)
+        assert target.history_length(vendor_id) == source.history_length(vendor_id)
+        for weather in WeatherCondition:
+            assert target.find_history(vendor_id, weather=weather.value, day_of_week="Saturday") == \
+                source.find_history(vendor_id, weather=weather.value, day_of_week="Saturday")
+    target.close()
+
+
+def test_writes_survive_reopen(tmp_path):
+    _, source, db_file = migrated(tmp_path)
+    vendor_id = next(iter(source.list_profiles()))
+    store = SQLiteMemoryStore(db_file)
+    store.load()
+    day = {"date": "2025-08-01", "day_of_week": "Friday", "weather": "rainy", "temperature": 27,
+           "actual_revenue": 640, "items_sold": {"Masala Chai": 30}}
+    store.append_sale(vendor_id, day)
+    store.set_patterns(vendor_id, {"best_weather": "rainy"})
+    store.close()
+
+    reopened = SQLiteMemoryStore(db_file)
+    reopened.load()
+    assert reopened.get_history(vendor_id)[-1] == day
+    assert reopened.history_length(vendor_id) == source.history_length(vendor_id) + 1
+    assert reopened.get_vendor(vendor_id)["learned_patterns"] == {"best_weather": "rainy"}
+    reopened.close()
+
+
+def test_predictions_match_json_backend(tmp_path):
+    memory_file, _, db_file = migrated(tmp_path)
+    prompts_file = os.path.join(ROOT, "prompts", "prompt_templates.txt")
+    from_json = SVDPAgent(memory_file=memory_file, prompts_file=prompts_file, read_only=True)
+    from_db = SVDPAgent(memory_file=db_file, prompts_file=prompts_file, read_only=True)
+    days = [DayContext("2025-06-21", "Saturday", weather, True, False, 36) for weather in WeatherCondition]
+    for vendor_id in from_json.list_vendors():
+        vendor = from_json.get_vendor_profile(vendor_id)
+        assert from_db.get_vendor_profile(vendor_id) == vendor
+        assert from_db.predict_batch([vendor], days) == from_json.predict_batch([vendor], days)
+    from_json.close()
+    from_db.close()
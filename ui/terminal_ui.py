@@ -2,99 +2,298 @@
 """
 Terminal UI for Street Vendor Demand Predictor (SVDP)
 Author: Kumar Kshitij
+
+Interactive:  python ui/terminal_ui.py
+Batch:        python ui/terminal_ui.py --batch contexts.csv --output predictions.jsonl --workers 8
 """
 
 import sys
 import os
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 
-from agent import SVDPAgent, WeatherCondition, LocationType
+from agent import SVDPAgent, WeatherCondition
 from agent import VendorProfile, DayContext
+from metrics import AgentMetrics, render_summary
+from calendar_table import CalendarTable
 from datetime import datetime
-import sys
+from dataclasses import asdict
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+import argparse
+import csv
+import json
+import time
+
+
+def run_interactive(agent: SVDPAgent):
+    # Welcome banner
+    print("\n" + "=" * 70)
+    print("🍛 STREET VENDOR DEMAND PREDICTOR (SVDP)")
+    print("AI for India's Informal Economy")
+    print("Thinks in Rupees, Not Just Data Points")
+    print("=" * 70 + "\n")
+
+    # Step 1: Vendor selection
+    print("👤 Select Vendor")
+    vendors = list(agent.list_vendors().keys())
+    for i, key in enumerate(vendors, 1):
+        print(f"{i}. {key.replace('_', ' ')}")
+
+    try:
+        choice = int(input("\nEnter vendor number: ")) - 1
+        vendor_id = vendors[choice]
+        vendor = agent.get_vendor_profile(vendor_id)
+    except (ValueError, IndexError, KeyError) as e:
+        print("❌ Invalid selection.")
+        sys.exit(1)
+
+    # Step 2: Day context
+    print("\n📅 Enter Day Context")
+    date_str = input("Date (YYYY-MM-DD) [leave blank for today]: ").strip()
+    if not date_str:
+        date_str = datetime.now().strftime("%Y-%m-%d")
+    calendar_day = agent.calendar.features(date_str)
+
+    print("\nWeather:")
+    for i, condition in enumerate(WeatherCondition, 1):
+        print(f"{i}. {condition.value.title()}")
+    try:
+        weather_choice = int(input("Choose weather (1-4): "))
+        weather = list(WeatherCondition)[weather_choice - 1]
+    except:
+        weather = WeatherCondition.SUNNY
+
+    temp = int(input("Temperature (°C): ") or "32")
+    # Blank answers keep what the calendar says about the date
+    festival_hint = f" - calendar: {calendar_day['festival_name']}" if calendar_day["festival_name"] else ""
+    is_festival = _yes_no(f"Is today a festival?{festival_hint}", calendar_day["is_festival"])
+    is_payday = _yes_no("Is it payday week?", calendar_day["is_payday"])
+
+    context = agent.day_context(date_str, weather, temp, is_festival, is_payday)
+
+    # Step 3: Predict
+    print("\n🔮 Generating prediction...")
+    pred = agent.predict(vendor, context)
+
+    # Step 4: Output
+    print("\n" + "=" * 70)
+    print(f"Prediction for {vendor.name.upper()} ({vendor.location})")
+    print("=" * 70)
+    print(f"📅 Date: {context.date} ({context.day_of_week})")
+    print(f"🌤️  Weather: {context.weather.value.title()} | Temp: {context.temperature}°C")
+    print(f"💰 Expected Revenue: ₹{pred.expected_revenue[0]} – ₹{pred.expected_revenue[1]}")
+    if pred.revenue_quantiles:
+        q = pred.revenue_quantiles
+        print(f"🎲 Simulated Revenue: P10 ₹{q['p10']} | P50 ₹{q['p50']} | P90 ₹{q['p90']}")
+    print(f"📈 Confidence: {pred.confidence_level:.1%}")
+    if pred.expected_margin is not None:
+        print(f"🧮 Expected Margin: ₹{pred.expected_margin}")
+    print("\n📦 Inventory Recommendation:")
+    for item, qty in pred.recommended_items.items():
+        if pred.item_quantiles:
+            q = pred.item_quantiles[item]
+            print(f" - {item}: {qty} units (P10–P90: {q['p10']}–{q['p90']})")
+        else:
+            print(f" - {item}: {qty} units")
+
+    print("\n⏰ Peak Hours:", ", ".join(map(str, pred.peak_hours)))
+
+    if pred.special_notes:
+        print("\n📝 Notes:")
+        for note in pred.special_notes:
+            print(" -", note)
+
+    print("\n✅ Prediction complete. Memory updated.")
+
+
+def _yes_no(question: str, default: bool) -> bool:
+    answer = input(f"{question} ({'Y/n' if default else 'y/N'}): ").strip().lower()
+    return default if not answer else answer == 'y'
+
+
+# BATCH MODE
+def read_contexts(path: str):
+    """Rows of vendor_id, date, weather, temperature and optionally is_festival, is_payday, state from CSV or JSONL"""
+    with open(path, 'r', encoding='utf-8', newline='') as f:
+        if path.endswith((".jsonl", ".ndjson")):
+            for line in f:
+                if line.strip():
+                    yield json.loads(line)
+        else:
+            yield from csv.DictReader(f)
+
+
+def _flag(value) -> bool:
+    if isinstance(value, str):
+        return value.strip().lower() in ("1", "y", "yes", "true")
+    return bool(value)
+
 
-# Initialize agent
-agent = SVDPAgent()
-
-# Welcome banner
-print("\n" + "=" * 70)
-print("🍛 STREET VENDOR DEMAND PREDICTOR (SVDP)")
-print("AI for India's Informal Economy")
-print("Thinks in Rupees, Not Just Data Points")
-print("=" * 70 + "\n")
-
-# Step 1: Vendor selection
-print("👤 Select Vendor")
-vendors = list(agent.memory['vendors'].keys())
-for i, key in enumerate(vendors, 1):
-    print(f"{i}. {key.replace('_', ' ')}")
-
-try:
-    choice = int(input("\nEnter vendor number: ")) - 1
-    vendor_id = vendors[choice]
-    profile_data = agent.memory['vendors'][vendor_id]['profile']
-    vendor = VendorProfile(
-        name=profile_data['name'],
-        location=profile_data['location'],
-        location_type=LocationType(profile_data['location_type']),
-        items_sold=profile_data['items_sold'],
-        avg_daily_revenue=profile_data['avg_daily_revenue'],
-        peak_hours=profile_data['peak_hours']
+def context_from_row(row: dict, calendar: CalendarTable) -> DayContext:
+    """
+    Flags the row leaves blank are read from the calendar (regional festivals if it names a state)
+    Raises ValueError/KeyError for a row without a usable date, weather or temperature
+    """
+    if not row.get("date"):
+        raise ValueError("no date")
+    features = calendar.features(row["date"], row.get("state") or None)
+    return DayContext(
+        date=features["date"],
+        day_of_week=row.get("day_of_week") or features["day_of_week"],
+        weather=WeatherCondition(row.get("weather") or "sunny"),
+        is_festival=_flag(row["is_festival"]) if row.get("is_festival") not in (None, "") else features["is_festival"],
+        is_payday=_flag(row["is_payday"]) if row.get("is_payday") not in (None, "") else features["is_payday"],
+        temperature=int(row.get("temperature") or 32)
     )
-except (ValueError, IndexError, KeyError) as e:
-    print("❌ Invalid selection.")
-    sys.exit(1)
-
-# Step 2: Day context
-print("\n📅 Enter Day Context")
-date_str = input("Date (YYYY-MM-DD) [leave blank for today]: ").strip()
-if not date_str:
-    date_str = datetime.now().strftime("%Y-%m-%d")
-day_of_week = datetime.strptime(date_str, "%Y-%m-%d").strftime("%A")
-
-print("\nWeather:")
-for i, condition in enumerate(WeatherCondition, 1):
-    print(f"{i}. {condition.value.title()}")
-try:
-    weather_choice = int(input("Choose weather (1-4): "))
-    weather = list(WeatherCondition)[weather_choice - 1]
-except:
-    weather = WeatherCondition.SUNNY
-
-temp = int(input("Temperature (°C): ") or "32")
-is_festival = input("Is today a festival? (y/n): ").lower() == 'y'
-is_payday = input("Is it payday week? (y/n): ").lower() == 'y'
-
-context = DayContext(
-    date=date_str,
-    day_of_week=day_of_week,
-    weather=weather,
-    is_festival=is_festival,
-    is_payday=is_payday,
-    temperature=temp
-)
-
-# Step 3: Predict
-print("\n🔮 Generating prediction...")
-pred = agent.predict(vendor, context)
-
-# Step 4: Output
-print("\n" + "=" * 70)
-print(f"Prediction for {vendor.name.upper()} ({vendor.location})")
-print("=" * 70)
-print(f"📅 Date: {context.date} ({context.day_of_week})")
-print(f"🌤️  Weather: {context.weather.value.title()} | Temp: {context.temperature}°C")
-print(f"💰 Expected Revenue: ₹{pred.expected_revenue[0]} – ₹{pred.expected_revenue[1]}")
-print(f"📈 Confidence: {pred.confidence_level:.1%}")
-print("\n📦 Inventory Recommendation:")
-for item, qty in pred.recommended_items.items():
-    print(f" - {item}: {qty} units")
-
-print("\n⏰ Peak Hours:", ", ".join(map(str, pred.peak_hours)))
-
-if pred.special_notes:
-    print("\n📝 Notes:")
-    for note in pred.special_notes:
-        print(" -", note)
-
-print("\n✅ Prediction complete. Memory updated.")
+
+
+_worker_agent = None
+
+
+def _init_worker(memory_file: str, simulations: int = 0, optimize_inventory: bool = False):
+    # Each worker reads the store once; only the parent process writes to it
+    global _worker_agent
+    _worker_agent = SVDPAgent(memory_file=memory_file, cache_size=0, read_only=True, simulations=simulations,
+                              optimize_inventory=optimize_inventory)
+
+
+def _predict_shard(vendor_id: str, rows: list) -> tuple:
+    """Predictions for one vendor's (row index, DayContext) pairs, plus the worker's metrics since the last shard"""
+    vendor = _worker_agent.get_vendor_profile(vendor_id)
+    contexts = [context for _, context in rows]
+    predictions = _worker_agent.predict_batch([vendor], contexts)[0]
+    results = [
+        (index, dict(asdict(pred), vendor_id=vendor_id, date=context.date, day_of_week=context.day_of_week))
+        for (index, context), pred in zip(rows, predictions)
+    ]
+    return results, _worker_agent.metrics.drain()
+
+
+def run_batch(memory_file: str, input_path: str, output_path: str, workers: int, shard_size: int,
+              simulations: int = 0, optimize_inventory: bool = False, unordered: bool = False) -> AgentMetrics:
+    """
+    Predict every row of input_path; returns the workers' merged metrics
+    Batch predictions are not learned from: memory only changes for vendors
+    created up front. Rows are written in input order unless `unordered`,
+    in which case each shard is written as soon as it finishes.
+    """
+    metrics = AgentMetrics()
+    agent = SVDPAgent(memory_file=memory_file)
+    known = agent.list_vendors()
+
+    # Shard by vendor, remembering each row's input position; rows are
+    # parsed here so a malformed one becomes a reject line, not a failed run
+    shards = {}
+    rejected = []
+    for index, row in enumerate(read_contexts(input_path)):
+        vendor_id = row.get("vendor_id")
+        if vendor_id not in known:
+            rejected.append((index, {"vendor_id": vendor_id, "error": "unknown vendor_id"}))
+            continue
+        try:
+            context = context_from_row(row, agent.calendar)
+        except (KeyError, TypeError, ValueError) as error:
+            reason = error.args[0] if error.args else repr(error)
+            rejected.append((index, {"vendor_id": vendor_id, "error": f"invalid row: {reason}"}))
+            continue
+        shards.setdefault(vendor_id, []).append((index, context))
+    total_rows = sum(len(rows) for rows in shards.values()) + len(rejected)
+
+    # State writes happen here, in the only process that writes the store:
+    # vendors whose stored profile maps to a new memory key are created up
+    # front so workers stay read-only and no update is lost between them
+    for vendor_id in shards:
+        profile = VendorProfile.from_dict(known[vendor_id])
+        if not agent.store.has_vendor(profile.vendor_id):
+            agent.update_state(agent.process_input(profile, shards[vendor_id][0][1]), profile)
+    agent.close()
+
+    tasks = []
+    for vendor_id, rows in shards.items():
+        for start in range(0, len(rows), shard_size):
+            tasks.append((vendor_id, rows[start:start + shard_size]))
+
+    started = time.perf_counter()
+    out = open(output_path, 'w', encoding='utf-8') if output_path != "-" else sys.stdout
+    try:
+        # In input order, finished shards wait in `ready` until every earlier
+        # row has been written, so a slow shard holds back everything after it
+        ready = dict(rejected)
+        next_index = 0
+
+        def drain():
+            nonlocal next_index
+            if unordered:
+                for index in list(ready):
+                    out.write(json.dumps(ready.pop(index), ensure_ascii=False) + "\n")
+                return
+            while next_index in ready:
+                out.write(json.dumps(ready.pop(next_index), ensure_ascii=False) + "\n")
+                next_index += 1
+
+        def collect(results, worker_metrics):
+            ready.update(results)
+            metrics.merge(worker_metrics)
+            drain()
+
+        if workers <= 1:
+            _init_worker(memory_file, simulations, optimize_inventory)
+            for vendor_id, rows in tasks:
+                collect(*_predict_shard(vendor_id, rows))
+        else:
+            with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                                     initargs=(memory_file, simulations, optimize_inventory)) as pool:
+                # Only a couple of shards per worker are in flight, so finished
+                # results never pile up in the pool faster than they are written
+                pending = set()
+                for vendor_id, rows in tasks:
+                    if len(pending) >= 2 * workers:
+                        done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                        for future in done:
+                            collect(*future.result())
+                    pending.add(pool.submit(_predict_shard, vendor_id, rows))
+                for future in pending:
+                    collect(*future.result())
+        drain()
+    finally:
+        if out is not sys.stdout:
+            out.close()
+
+    elapsed = time.perf_counter() - started
+    print(f"✅ {total_rows} rows ({len(rejected)} rejected) in {elapsed:.2f}s "
+          f"with {max(workers, 1)} worker(s) - {total_rows / elapsed if elapsed else 0:,.0f} rows/s", file=sys.stderr)
+    return metrics
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Street Vendor Demand Predictor")
+    parser.add_argument("--memory", default="memory.json", help="memory file, .db or shard directory")
+    parser.add_argument("--batch", metavar="INPUT", help="CSV/JSONL of vendor-day contexts; runs non-interactively")
+    parser.add_argument("--output", default="-", help="JSONL output for --batch (default: stdout)")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="worker processes for --batch")
+    parser.add_argument("--shard-size", type=int, default=500, help="max vendor-days per worker task")
+    parser.add_argument("--unordered", action="store_true",
+                        help="write --batch results as shards finish instead of in input order")
+    parser.add_argument("--metrics", action="store_true", help="print per-layer timings and counters when done")
+    parser.add_argument("--simulations", type=int, default=0, metavar="N",
+                        help="Monte Carlo scenarios per vendor-day for P10/P50/P90 ranges (0: off)")
+    parser.add_argument("--optimize-inventory", action="store_true",
+                        help="plan stock for the best expected margin within each vendor's investment_capacity")
+    args = parser.parse_args()
+
+    if args.batch:
+        metrics = run_batch(args.memory, args.batch, args.output, args.workers, args.shard_size, args.simulations,
+                            args.optimize_inventory, args.unordered)
+        report = dict(metrics.snapshot(), gauges={})
+    else:
+        agent = SVDPAgent(memory_file=args.memory, journal_dir="logs", simulations=args.simulations,
+                          optimize_inventory=args.optimize_inventory)
+        run_interactive(agent)
+        report = agent.metrics_report()
+        agent.close()
+    if args.metrics:
+        print("\n📊 Metrics", file=sys.stderr)
+        print(render_summary(report), file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,13 +1,27 @@
 
+import atexit
+import json
 import sys
 import os
+from dataclasses import asdict
+from datetime import datetime
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 
-from flask import Flask, render_template_string, request
-from agent import SVDPAgent, VendorProfile, DayContext, WeatherCondition, LocationType
+from flask import Flask, Response, jsonify, render_template_string, request
+from agent import SVDPAgent, VendorProfile, DayContext, WeatherCondition
+from metrics import render_prometheus
 
 app = Flask(__name__)
-agent = SVDPAgent()
+# Shared by all request threads: memory writes are coalesced by a background
+# writer, and pending changes are flushed when the process exits
+# SVDP_METRICS_SAMPLE_RATE < 1 times only that fraction of predictions;
+# SVDP_SIMULATIONS > 0 adds P10/P50/P90 ranges from that many scenarios;
+# SVDP_OPTIMIZE_INVENTORY=1 plans stock within each vendor's investment_capacity
+agent = SVDPAgent(background_writer=True, journal_dir="logs",
+                  metrics_sample_rate=float(os.environ.get("SVDP_METRICS_SAMPLE_RATE", "1.0")),
+                  simulations=int(os.environ.get("SVDP_SIMULATIONS", "0")),
+                  optimize_inventory=os.environ.get("SVDP_OPTIMIZE_INVENTORY", "0") == "1")
+atexit.register(agent.close)
 
 TEMPLATE = """
 <!doctype html>
@@ -131,7 +145,7 @@ TEMPLATE = """
     <label for="vendor_id">Select Vendor:</label>
     <select name="vendor_id" id="vendor_id">
       {% for vid, v in vendors.items() %}
-      <option value="{{ vid }}">{{ v['profile']['name'] }} ({{ v['profile']['location'] }})</option>
+      <option value="{{ vid }}">{{ v['name'] }} ({{ v['location'] }})</option>
       {% endfor %}
     </select>
 
@@ -148,8 +162,8 @@ TEMPLATE = """
     <label for="temperature">Temperature (°C):</label>
     <input type="number" name="temperature" value="32">
 
-    <label><input type="checkbox" name="is_festival"> Festival Day</label>
-    <label><input type="checkbox" name="is_payday"> Payday Week</label>
+    <label><input type="checkbox" name="is_festival"> Festival Day (unticked: from the calendar)</label>
+    <label><input type="checkbox" name="is_payday"> Payday Week (unticked: from the calendar)</label>
 
     <input type="submit" value="Predict Demand">
   </form>
@@ -160,6 +174,12 @@ TEMPLATE = """
     <p><strong>Date:</strong> {{ result['date'] }}</p>
     <p><strong>Weather:</strong> {{ result['weather'] }}, {{ result['temperature'] }}°C</p>
     <p><strong>Expected Revenue:</strong> ₹{{ result['revenue'][0] }} - ₹{{ result['revenue'][1] }}</p>
+    {% if result['revenue_quantiles'] %}
+    <p><strong>Simulated Revenue:</strong> P10 ₹{{ result['revenue_quantiles']['p10'] }} · P50 ₹{{ result['revenue_quantiles']['p50'] }} · P90 ₹{{ result['revenue_quantiles']['p90'] }}</p>
+    {% endif %}
+    {% if result['margin'] is not none %}
+    <p><strong>Expected Margin:</strong> ₹{{ result['margin'] }}</p>
+    {% endif %}
     <p><strong>Peak Hours:</strong> {{ result['peak_hours'] }}</p>
     <p class="section-title">🔍 Confidence: {{ result['confidence'] }}</p>
 <div class="confidence-bar">
@@ -169,7 +189,7 @@ TEMPLATE = """
     <h4>📦 Inventory Recommendation:</h4>
     <ul>
       {% for item, qty in result['inventory'].items() %}
-      <li>{{ item }}: {{ qty }} units</li>
+      <li>{{ item }}: {{ qty }} units{% if result['item_quantiles'] %} (P10–P90: {{ result['item_quantiles'][item]['p10'] }}–{{ result['item_quantiles'][item]['p90'] }}){% endif %}</li>
       {% endfor %}
     </ul>
 
@@ -190,29 +210,20 @@ TEMPLATE = """
 @app.route("/", methods=["GET", "POST"])
 def index():
     result = None
-    vendors = agent.memory["vendors"]
+    vendors = agent.list_vendors()
     weather_options = [w.value for w in WeatherCondition]
 
     if request.method == "POST":
         vendor_id = request.form["vendor_id"]
-        v = vendors[vendor_id]["profile"]
-        vendor = VendorProfile(
-            name=v["name"],
-            location=v["location"],
-            location_type=LocationType(v["location_type"]),
-            items_sold=v["items_sold"],
-            avg_daily_revenue=v["avg_daily_revenue"],
-            peak_hours=v["peak_hours"]
-        )
+        vendor = VendorProfile.from_dict(vendors[vendor_id])
         date = request.form.get("date") or "2025-06-17"
-        day_of_week = "Tuesday"  # fallback default, can add logic if needed
-        context = DayContext(
-            date=date,
-            day_of_week=day_of_week,
-            weather=WeatherCondition(request.form["weather"]),
-            is_festival=bool(request.form.get("is_festival")),
-            is_payday=bool(request.form.get("is_payday")),
-            temperature=int(request.form["temperature"])
+        context = agent.day_context(
+            date,
+            WeatherCondition(request.form["weather"]),
+            int(request.form["temperature"]),
+            # Unticked boxes leave the flag to the calendar
+            is_festival=True if request.form.get("is_festival") else None,
+            is_payday=True if request.form.get("is_payday") else None
         )
         pred = agent.predict(vendor, context)
         result = {
@@ -224,10 +235,162 @@ def index():
             "peak_hours": pred.peak_hours,
             "confidence": f"{pred.confidence_level:.2f}",
             "inventory": pred.recommended_items,
+            "revenue_quantiles": pred.revenue_quantiles,
+            "item_quantiles": pred.item_quantiles,
+            "margin": pred.expected_margin,
             "notes": pred.special_notes
         }
 
     return render_template_string(TEMPLATE, vendors=vendors, result=result, weather_options=weather_options)
 
+# JSON API
+BATCH_VENDOR_CHUNK = 50  # Vendors per predict_batch call while streaming
+
+
+def context_from_json(payload: dict) -> DayContext:
+    """
+    DayContext from an API payload; raises ValueError/KeyError on bad input
+    Omitted is_festival/is_payday come from the calendar (with "state", its regional festivals too).
+    """
+    context = agent.day_context(
+        payload.get("date") or datetime.now().strftime("%Y-%m-%d"),
+        WeatherCondition(payload.get("weather", "sunny")),
+        int(payload.get("temperature", 32)),
+        is_festival=bool(payload["is_festival"]) if "is_festival" in payload else None,
+        is_payday=bool(payload["is_payday"]) if "is_payday" in payload else None,
+        state=payload.get("state")
+    )
+    if payload.get("day_of_week"):
+        context.day_of_week = payload["day_of_week"]
+    return context
+
+
+def prediction_json(vendor_id: str, context: DayContext, pred) -> dict:
+    return dict(asdict(pred), vendor_id=vendor_id, date=context.date, day_of_week=context.day_of_week)
+
+
+@app.route("/api/predict", methods=["POST"])
+def api_predict():
+    payload = request.get_json(silent=True) or {}
+    vendors = agent.list_vendors()
+    vendor_id = payload.get("vendor_id")
+    if vendor_id not in vendors:
+        return jsonify({"error": f"unknown vendor_id: {vendor_id}"}), 404
+    try:
+        context = context_from_json(payload)
+    except (ValueError, KeyError, TypeError) as e:
+        return jsonify({"error": str(e)}), 400
+    pred = agent.predict(VendorProfile.from_dict(vendors[vendor_id]), context)
+    return jsonify(prediction_json(vendor_id, context, pred))
+
+
+@app.route("/api/prompts", methods=["POST"])
+def api_prompts():
+    """Prompt blocks for one vendor-day; edits to the template file show up without a restart"""
+    payload = request.get_json(silent=True) or {}
+    vendors = agent.list_vendors()
+    vendor_id = payload.get("vendor_id")
+    if vendor_id not in vendors:
+        return jsonify({"error": f"unknown vendor_id: {vendor_id}"}), 404
+    try:
+        context = context_from_json(payload)
+    except (ValueError, KeyError, TypeError) as e:
+        return jsonify({"error": str(e)}), 400
+    templates = agent.prompts_for(VendorProfile.from_dict(vendors[vendor_id]), context)
+    return jsonify({"vendor_id": vendor_id, "date": context.date, "version": agent.prompts.version,
+                    "templates": templates})
+
+
+@app.route("/api/predict/batch", methods=["POST"])
+def api_predict_batch():
+    """
+    Body: {"vendor_ids": [...], "days": [{"date", "weather", "temperature", "is_festival", "is_payday"}, ...]}
+    ("dates": [...] may replace "days" when sunny/32°C defaults are fine; festival and payday
+    flags left out come from the calendar).
+    Streams one NDJSON line per vendor × day as each chunk of vendors is computed; a chunk that
+    fails mid-stream becomes one {"vendor_ids", "error"} line.
+    """
+    payload = request.get_json(silent=True)
+    if not isinstance(payload, dict):
+        return jsonify({"error": "body must be a JSON object"}), 400
+    days = payload.get("days") or [{"date": date} for date in payload.get("dates") or []]
+    vendor_ids = payload.get("vendor_ids") or []
+    if not isinstance(vendor_ids, list) or not all(isinstance(vendor_id, str) for vendor_id in vendor_ids):
+        return jsonify({"error": "vendor_ids must be a list of strings"}), 400
+    if not isinstance(days, list) or not all(isinstance(day, dict) for day in days):
+        return jsonify({"error": "days must be a list of objects (or dates a list of YYYY-MM-DD strings)"}), 400
+    try:
+        contexts = [context_from_json(day) for day in days]
+    except (ValueError, KeyError, TypeError) as e:
+        return jsonify({"error": str(e)}), 400
+    if not contexts or not vendor_ids:
+        return jsonify({"error": "vendor_ids and days (or dates) are required"}), 400
+
+    def generate():
+        vendors = agent.list_vendors()
+        for start in range(0, len(vendor_ids), BATCH_VENDOR_CHUNK):
+            chunk = vendor_ids[start:start + BATCH_VENDOR_CHUNK]
+            known = [vendor_id for vendor_id in chunk if vendor_id in vendors]
+            try:
+                results = agent.predict_batch([VendorProfile.from_dict(vendors[v]) for v in known], contexts)
+            except Exception as e:
+                # The 200 status is already sent: report the chunk in-band and carry on with the next one
+                yield json.dumps({"vendor_ids": chunk, "error": f"prediction failed: {e}"}, ensure_ascii=False) + "\n"
+                continue
+            by_vendor = dict(zip(known, results))
+            for vendor_id in chunk:
+                if vendor_id not in by_vendor:
+                    yield json.dumps({"vendor_id": vendor_id, "error": "unknown vendor_id"}) + "\n"
+                    continue
+                for context, pred in zip(contexts, by_vendor[vendor_id]):
+                    yield json.dumps(prediction_json(vendor_id, context, pred), ensure_ascii=False) + "\n"
+
+    return Response(generate(), mimetype="application/x-ndjson")
+
+
+@app.route("/api/forecast", methods=["POST"])
+def api_forecast():
+    """
+    Body: {"vendor_id", "start_date", "days": 7, "weather_forecast": [{"weather", "temperature"}, ...],
+           "festivals": ["YYYY-MM-DD", ...], "state": "MH"}
+    Returns the per-day predictions plus the whole-horizon item totals and revenue range.
+    """
+    payload = request.get_json(silent=True) or {}
+    vendors = agent.list_vendors()
+    vendor_id = payload.get("vendor_id")
+    if vendor_id not in vendors:
+        return jsonify({"error": f"unknown vendor_id: {vendor_id}"}), 404
+    try:
+        forecast = agent.forecast_horizon(
+            VendorProfile.from_dict(vendors[vendor_id]),
+            payload.get("start_date") or datetime.now().strftime("%Y-%m-%d"),
+            int(payload.get("days", 7)),
+            payload.get("weather_forecast"),
+            payload.get("festivals", []),
+            payload.get("state")
+        )
+    except (ValueError, KeyError, TypeError) as e:
+        return jsonify({"error": str(e)}), 400
+    return jsonify({
+        "vendor_id": vendor_id,
+        "days": [prediction_json(vendor_id, context, pred) for context, pred in zip(forecast.days, forecast.daily)],
+        "total_items": forecast.total_items,
+        "expected_revenue": forecast.expected_revenue,
+        "confidence_level": forecast.confidence_level
+    })
+
+
+# METRICS
+@app.route("/metrics")
+def metrics_prometheus():
+    """Prometheus scrape endpoint"""
+    return Response(render_prometheus(agent.metrics_report()), mimetype="text/plain; version=0.0.4")
+
+
+@app.route("/api/metrics")
+def metrics_json():
+    return jsonify(agent.metrics_report())
+
+
 if __name__ == "__main__":
     app.run(debug=True)